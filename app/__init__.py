@@ -12,6 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from app.agents.clinical_agent.agent import root_agent
-
 __all__ = ["root_agent"]
+
+
+def __getattr__(name: str):
+    # Loaded on first access (ADK agent loader), not when importing app.utils or app.server
+    if name == "root_agent":
+        from app.agents.clinical_agent.agent import root_agent
+
+        return root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
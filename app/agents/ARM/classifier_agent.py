@@ -1,11 +1,15 @@
 """
 Agent de classification des transcripts ARM
 """
-from typing import Dict, Any, List
-import vertexai
-from vertexai.generative_models import GenerativeModel
+from typing import Dict, Any, List, Optional, AsyncIterator
+import asyncio
+import json
 import os
-from agents.base_agent import BaseAgent
+from google.api_core.exceptions import GoogleAPICallError
+from app.agents.base_agent import BaseAgent
+from app.agents.ARM.local_classifier import ClassifieurLocal, charger_classifieur_local
+from app.agents.ARM.streaming import ClassificationEnContinu
+from app.utils.llm import LlmQueueTimeout, generate_content_async, get_model
 
 
 class ARMClassifierAgent(BaseAgent):
@@ -23,12 +27,81 @@ class ARMClassifierAgent(BaseAgent):
     
     def __init__(self, name: str = "ARM Classifier", config: Dict[str, Any] = None):
         super().__init__(name, config)
-        vertexai.init(project=os.getenv("GCP_PROJECT_ID"), location=os.getenv("GCP_REGION", "europe-west1"))
-        self.model = GenerativeModel("gemini-2.0-flash")
+        config = config or {}
+        self.model = get_model("gemini-2.0-flash", project_id=os.getenv("GCP_PROJECT_ID"))
+        # Transcripts regroupés dans une même requête, et requêtes en vol simultanément
+        self.taille_lot = int(config.get("taille_lot", os.getenv("ARM_BATCH_SIZE", "10")))
+        self.lots_simultanes = int(
+            config.get("lots_simultanes", os.getenv("ARM_MAX_CONCURRENT_BATCHES", "4"))
+        )
+        # Voie rapide : classifieur local, le LLM n'est appelé que sous le seuil de confiance
+        self.classifieur_local = charger_classifieur_local(config.get("modele_local"))
+        self.seuil_local = float(config.get("seuil_local", os.getenv("ARM_LOCAL_THRESHOLD", "0.8")))
+        self._classifieur_amorce: Optional[ClassifieurLocal] = None
+    
+    def _schema_lot(self) -> Dict:
+        """Schéma de la réponse structurée : un résultat par transcript, identifié par son id"""
+        return {
+            "type": "OBJECT",
+            "properties": {
+                "resultats": {
+                    "type": "ARRAY",
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {
+                            "id": {"type": "STRING"},
+                            "classifications": {
+                                "type": "ARRAY",
+                                "items": {"type": "STRING", "enum": self.PATHOLOGIES},
+                            },
+                            "confidence": {"type": "NUMBER"},
+                        },
+                        "required": ["id", "classifications"],
+                    },
+                },
+            },
+            "required": ["resultats"],
+        }
+    
+    def _resultat(self, classifications: List[str], confidence: Any) -> Dict[str, Any]:
+        """Ne garde que les pathologies connues, avec repli sur MALAISE"""
+        valides = [c for c in classifications if c in self.PATHOLOGIES]
+        if not valides:
+            return {"classifications": ["MALAISE"], "confidence": 0.5, "source": "llm"}
+        try:
+            confidence = min(1.0, max(0.0, float(confidence)))
+        except (TypeError, ValueError):
+            confidence = 0.5
+        return {"classifications": valides, "confidence": confidence, "source": "llm"}
+    
+    def _resultat_erreur(self, erreur: Exception) -> Dict[str, Any]:
+        """Résultat d'un transcript que le LLM n'a pas pu classifier (quota, file d'attente, API)"""
+        return {"classifications": ["MALAISE"], "confidence": 0.0, "source": "erreur", "erreur": str(erreur)}
+    
+    def classifier_localement(self, transcript: str) -> Optional[Dict[str, Any]]:
+        """Résultat du classifieur local s'il est assez confiant, sinon None (escalade vers le LLM)"""
+        if self.classifieur_local is None:
+            return None
+        prediction = self.classifieur_local.predire(transcript)
+        if prediction["confidence"] < self.seuil_local:
+            return None
+        return {
+            "classifications": prediction["classifications"],
+            "confidence": prediction["confidence"],
+            "source": "local",
+        }
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         transcript = input_data.get("transcript", "")
         
+        local = self.classifier_localement(transcript)
+        if local is not None:
+            return local
+        
+        return await self.classifier_avec_llm(transcript)
+    
+    async def classifier_avec_llm(self, transcript: str) -> Dict[str, Any]:
+        """Classification d'un transcript par le LLM"""
         pathologies_list = "\n".join(self.PATHOLOGIES)
         
         prompt = f"""Classifie ce transcript parmi ces pathologies (tu peux en choisir plusieurs si pertinent):
@@ -39,7 +112,7 @@ Transcript: {transcript}
 
 Réponds avec les noms EXACTS des pathologies, une par ligne."""
         
-        response = self.model.generate_content(prompt)
+        response = await generate_content_async(self.model, prompt, stage="arm.classification")
         
         # Parser les lignes de réponse
         classifications = []
@@ -54,12 +127,142 @@ Réponds avec les noms EXACTS des pathologies, une par ligne."""
         
         return {
             "classifications": classifications,
-            "confidence": 0.5
+            "confidence": 0.5,
+            "source": "llm"
         }
+    
+    async def _classifier_lot(self, transcripts: List[str], semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+        """Classifie un lot de transcripts en une seule requête structurée"""
+        pathologies_list = "\n".join(self.PATHOLOGIES)
+        blocs = "\n\n".join(f"[T{i}]\n{transcript}" for i, transcript in enumerate(transcripts))
+        
+        prompt = f"""Classifie chacun des {len(transcripts)} transcripts ci-dessous parmi ces pathologies (tu peux en choisir plusieurs si pertinent):
+
+{pathologies_list}
+
+Transcripts (chacun précédé de son identifiant entre crochets):
+
+{blocs}
+
+Réponds en JSON avec "resultats" : un élément par transcript, avec son "id" (ex: "T0"),
+ses "classifications" (noms EXACTS des pathologies) et ta "confidence" entre 0 et 1."""
+        
+        async with semaphore:
+            try:
+                response = await generate_content_async(
+                    self.model,
+                    prompt,
+                    stage="arm.classification_lot",
+                    generation_config={
+                        "response_mime_type": "application/json",
+                        "response_schema": self._schema_lot(),
+                    }
+                )
+                elements = json.loads(response.text)["resultats"]
+                par_id = {
+                    str(e.get("id", "")).strip("[] "): e for e in elements if isinstance(e, dict)
+                }
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"⚠️ Réponse du lot inexploitable ({e}), classification individuelle")
+                par_id = {}
+            except (GoogleAPICallError, LlmQueueTimeout) as e:
+                # Seul ce lot est perdu : les autres lots et les résultats locaux sont conservés
+                print(f"❌ Lot non classifié ({e}), transcripts marqués en erreur")
+                return [self._resultat_erreur(e) for _ in transcripts]
+        
+        resultats = []
+        manquants = []
+        for i in range(len(transcripts)):
+            element = par_id.get(f"T{i}")
+            if element is None:
+                manquants.append(i)
+                resultats.append(None)
+            else:
+                resultats.append(self._resultat(element.get("classifications") or [], element.get("confidence", 0.5)))
+        
+        # Transcripts absents de la réponse : une requête individuelle chacun
+        if manquants:
+            async def individuel(i: int) -> Dict[str, Any]:
+                async with semaphore:
+                    try:
+                        return await self.classifier_avec_llm(transcripts[i])
+                    except (GoogleAPICallError, LlmQueueTimeout) as e:
+                        return self._resultat_erreur(e)
+            for i, resultat in zip(manquants, await asyncio.gather(*(individuel(i) for i in manquants))):
+                resultats[i] = resultat
+        return resultats
+    
+    async def process_batch(self, inputs: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Classifie plusieurs transcripts (ex: afflux d'appels)
+
+        Les transcripts que le classifieur local ne tranche pas sont regroupés par lots de
+        `taille_lot` dans une requête structurée chacun, au plus `lots_simultanes` requêtes
+        étant en vol en même temps.
+        Renvoie un résultat {classifications, confidence, source} par transcript, dans l'ordre ;
+        les transcripts d'un lot en échec (erreur d'API) ont la source "erreur".
+        """
+        transcripts = [
+            entree.get("transcript", "") if isinstance(entree, dict) else str(entree)
+            for entree in inputs
+        ]
+        if not transcripts:
+            return []
+        
+        resultats = [self.classifier_localement(t) for t in transcripts]
+        a_escalader = [i for i, resultat in enumerate(resultats) if resultat is None]
+        if not a_escalader:
+            return resultats
+        
+        semaphore = asyncio.Semaphore(max(1, self.lots_simultanes))
+        taille = max(1, self.taille_lot)
+        lots = [a_escalader[i:i + taille] for i in range(0, len(a_escalader), taille)]
+        resultats_lots = await asyncio.gather(
+            *(self._classifier_lot([transcripts[i] for i in lot], semaphore) for lot in lots)
+        )
+        for lot, resultats_lot in zip(lots, resultats_lots):
+            for i, resultat in zip(lot, resultats_lot):
+                resultats[i] = resultat
+        return resultats
+    
+    async def classifier_en_continu(self, fragments: AsyncIterator[Dict[str, Any]],
+                                    seuil: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Classifie un appel pendant qu'il se déroule
+
+        Args:
+            fragments: Source asynchrone de fragments {texte, final} (voir app/agents/ARM/streaming.py)
+            seuil: Confiance à partir de laquelle une classification est proposée (défaut : seuil_local)
+
+        Yields:
+            Un événement par fragment, de type "proposition" quand une classification est proposée
+            au régulateur et "mise_a_jour" sinon, puis un événement "finale" en fin d'appel ;
+            la classification finale passe par le LLM si la confiance locale reste sous le seuil
+        """
+        if self.classifieur_local is None and self._classifieur_amorce is None:
+            # Sans modèle entraîné, un classifieur construit sur les seuls mots-clés
+            self._classifieur_amorce = ClassifieurLocal.entrainer([], [], self.PATHOLOGIES)
+        classifieur = self.classifieur_local or self._classifieur_amorce
+        seuil = self.seuil_local if seuil is None else seuil
+        session = ClassificationEnContinu(classifieur, seuil)
+        
+        etat = None
+        async for fragment in fragments:
+            etat = session.ajouter_fragment(fragment.get("texte", ""), fragment.get("final", True))
+            yield {
+                "type": "proposition" if etat["proposee"] else "mise_a_jour",
+                "fragment": session.nb_fragments,
+                **etat,
+            }
+        
+        if etat is not None and etat["confidence"] >= seuil:
+            finale = {"classifications": etat["classifications"], "confidence": etat["confidence"], "source": "local"}
+        else:
+            finale = await self.classifier_avec_llm(session.transcript)
+        yield {"type": "finale", "fragment": session.nb_fragments, **finale}
 
 
 if __name__ == "__main__":
-    import asyncio
     from dotenv import load_dotenv
     
     load_dotenv()
@@ -69,5 +272,13 @@ if __name__ == "__main__":
         transcript = "Mon mari ne respire plus, il est inconscient et saigne beaucoup"
         result = await agent.process({"transcript": transcript})
         print(result)
+        
+        results = await agent.process_batch([
+            transcript,
+            "Ma fille a avalé toute la boîte de somnifères",
+            "Il a bu toute la soirée et ne se réveille plus",
+        ])
+        for r in results:
+            print(r)
     
-    asyncio.run(test_simple())
\ No newline at end of file
+    asyncio.run(test_simple())
@@ -0,0 +1,202 @@
+"""
+Classifieur local des transcripts ARM (voie rapide avant le LLM)
+
+TF-IDF (unigrammes + bigrammes) et régression logistique un-contre-tous, entraînée
+en numpy sur des transcripts étiquetés (ex: par le LLM, voir scripts/benchmark_arm_classifier.py).
+Une prédiction prend quelques dizaines de microsecondes : seuls les transcripts
+dont la confiance est sous le seuil sont envoyés au LLM.
+"""
+from typing import Dict, Any, List, Optional
+import os
+import numpy as np
+
+from app.utils.guideline_index import tokenize
+
+# Mots-clés de chaque pathologie, ajoutés comme documents d'amorçage à l'entraînement
+# pour qu'aucune classe ne soit sans exemple
+MOTS_CLES = {
+    "ARRÊT CARDIAQUE": "ne respire plus inconscient arrêt cardiaque massage cardiaque pas de pouls réanimation",
+    "ARRÊT CARDIAQUE ADULTE": "adulte effondré ne respire plus arrêt cardiaque défibrillateur massage",
+    "HÉMORAGIE INTERNE": "ventre dur douleur abdominale pâle malaise sang dans les selles vomit du sang",
+    "HÉMORRAGIE EXTÉRIORISÉE": "saigne beaucoup coupure plaie sang partout saignement abondant hémorragie",
+    "INTOXICATION ÉTHYLIQUE": "bu alcool ivre soirée ne se réveille pas vomi bouteilles",
+    "INTOXICATION MÉDICAMENTEUSE": "avalé médicaments boîte comprimés somnifères surdosage tentative",
+    "MALAISE": "malaise perte de connaissance s'est senti mal vertige étourdi tombé",
+    "PROBLÈME RESPIRATOIRE": "respire mal essoufflé asthme étouffe difficulté respiratoire sifflement",
+}
+
+
+def texte_transcript(transcript: Any) -> str:
+    """Texte d'un transcript : chaîne, ou liste de tours de parole {speaker, text}"""
+    if isinstance(transcript, str):
+        return transcript
+    if isinstance(transcript, dict):
+        return texte_transcript(transcript.get("transcript", ""))
+    return "\n".join(
+        tour.get("text", "") if isinstance(tour, dict) else str(tour) for tour in transcript or []
+    )
+
+
+def termes(texte: str) -> List[str]:
+    """Unigrammes et bigrammes normalisés (sans accents ni mots vides)"""
+    tokens = tokenize(texte)
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _sigmoide(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+class ClassifieurLocal:
+    """TF-IDF + régression logistique un-contre-tous (multi-étiquettes)"""
+
+    def __init__(self, classes: List[str], vocabulaire: Dict[str, int], idf: np.ndarray,
+                 poids: np.ndarray, biais: np.ndarray):
+        self.classes = list(classes)
+        self.vocabulaire = vocabulaire
+        self.idf = idf
+        # poids : (nombre de termes, nombre de classes), une ligne lue par terme présent
+        self.poids = poids
+        self.biais = biais
+
+    @classmethod
+    def entrainer(cls, textes: List[str], etiquettes: List[List[str]], classes: List[str],
+                  min_df: int = 1, epoques: int = 300, pas: float = 1.0, l2: float = 1e-3,
+                  amorcage: bool = True) -> "ClassifieurLocal":
+        """
+        Entraîne le classifieur (descente de gradient sur la perte logistique)
+
+        Args:
+            textes: Transcripts d'entraînement
+            etiquettes: Pathologies de chaque transcript (plusieurs possibles)
+            classes: Toutes les pathologies possibles
+            min_df: Nombre minimal de documents contenant un terme pour le garder
+            epoques: Itérations de descente de gradient
+            pas: Pas d'apprentissage
+            l2: Régularisation des poids
+            amorcage: Ajouter les documents de MOTS_CLES
+
+        Returns:
+            Le classifieur entraîné
+        """
+        textes = list(textes)
+        etiquettes = [list(e) for e in etiquettes]
+        if amorcage:
+            for classe in classes:
+                if classe in MOTS_CLES:
+                    textes.append(MOTS_CLES[classe])
+                    etiquettes.append([classe])
+
+        documents = [termes(t) for t in textes]
+        df: Dict[str, int] = {}
+        for doc in documents:
+            for terme in set(doc):
+                df[terme] = df.get(terme, 0) + 1
+        vocabulaire = {t: i for i, t in enumerate(sorted(t for t, n in df.items() if n >= min_df))}
+        n = len(documents)
+        idf = np.zeros(len(vocabulaire), dtype=np.float32)
+        for terme, i in vocabulaire.items():
+            idf[i] = np.log((1 + n) / (1 + df[terme])) + 1
+
+        X = np.zeros((n, len(vocabulaire)), dtype=np.float32)
+        for ligne, doc in enumerate(documents):
+            for terme in doc:
+                i = vocabulaire.get(terme)
+                if i is not None:
+                    X[ligne, i] += 1
+        X *= idf
+        X /= np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+
+        index_classe = {c: i for i, c in enumerate(classes)}
+        Y = np.zeros((n, len(classes)), dtype=np.float32)
+        for ligne, labels in enumerate(etiquettes):
+            for label in labels:
+                if label in index_classe:
+                    Y[ligne, index_classe[label]] = 1
+
+        poids = np.zeros((len(vocabulaire), len(classes)), dtype=np.float32)
+        biais = np.zeros(len(classes), dtype=np.float32)
+        for _ in range(epoques):
+            erreur = _sigmoide(X @ poids + biais) - Y
+            poids -= pas * (X.T @ erreur / n + l2 * poids)
+            biais -= pas * erreur.mean(axis=0)
+
+        return cls(classes, vocabulaire, idf, poids, biais)
+
+    def comptes(self, texte: str) -> Dict[int, int]:
+        """Nombre d'occurrences de chaque terme connu du texte, par indice de terme"""
+        comptes: Dict[int, int] = {}
+        for terme in termes(texte):
+            i = self.vocabulaire.get(terme)
+            if i is not None:
+                comptes[i] = comptes.get(i, 0) + 1
+        return comptes
+
+    def probabilites_depuis_comptes(self, comptes: Dict[int, int]) -> np.ndarray:
+        """Probabilité de chaque classe à partir des comptes de termes (permet la mise à jour incrémentale)"""
+        comptes = {i: n for i, n in comptes.items() if n > 0}
+        if not comptes:
+            return _sigmoide(self.biais)
+        indices = np.fromiter(comptes, dtype=np.int64, count=len(comptes))
+        valeurs = np.fromiter(comptes.values(), dtype=np.float32, count=len(comptes)) * self.idf[indices]
+        valeurs /= max(float(np.linalg.norm(valeurs)), 1e-12)
+        return _sigmoide(valeurs @ self.poids[indices] + self.biais)
+
+    def probabilites(self, texte: str) -> np.ndarray:
+        """Probabilité de chaque classe pour un transcript"""
+        return self.probabilites_depuis_comptes(self.comptes(texte))
+
+    def resultat(self, p: np.ndarray) -> Dict[str, Any]:
+        """
+        Résultat de classification à partir des probabilités
+
+        Returns:
+            {classifications, confidence, probabilites} ; classifications contient les classes
+            de probabilité >= 0.5 (au moins la plus probable), confidence la probabilité maximale
+        """
+        ordre = np.argsort(-p)
+        retenues = [self.classes[i] for i in ordre if p[i] >= 0.5] or [self.classes[ordre[0]]]
+        return {
+            "classifications": retenues,
+            "confidence": float(p[ordre[0]]),
+            "probabilites": {self.classes[i]: float(p[i]) for i in ordre},
+        }
+
+    def predire(self, transcript: Any) -> Dict[str, Any]:
+        """Classifie un transcript (voir resultat)"""
+        return self.resultat(self.probabilites(texte_transcript(transcript)))
+
+    def sauvegarder(self, chemin: str) -> None:
+        """Enregistre le modèle dans un fichier .npz"""
+        termes_ordonnes = sorted(self.vocabulaire, key=self.vocabulaire.__getitem__)
+        np.savez(
+            chemin,
+            classes=np.array(self.classes),
+            vocabulaire=np.array(termes_ordonnes),
+            idf=self.idf,
+            poids=self.poids,
+            biais=self.biais,
+        )
+
+    @classmethod
+    def charger(cls, chemin: str) -> "ClassifieurLocal":
+        with np.load(chemin, allow_pickle=False) as donnees:
+            return cls(
+                classes=[str(c) for c in donnees["classes"]],
+                vocabulaire={str(t): i for i, t in enumerate(donnees["vocabulaire"])},
+                idf=donnees["idf"],
+                poids=donnees["poids"],
+                biais=donnees["biais"],
+            )
+
+
+def charger_classifieur_local(chemin: Optional[str] = None) -> Optional[ClassifieurLocal]:
+    """Classifieur local d'ARM_LOCAL_MODEL, ou None s'il n'a pas été entraîné"""
+    chemin = chemin or os.getenv("ARM_LOCAL_MODEL", "arm_local_model.npz")
+    if not os.path.exists(chemin):
+        return None
+    try:
+        return ClassifieurLocal.charger(chemin)
+    except Exception as e:
+        print(f"⚠️ Classifieur local illisible ({chemin}): {e}")
+        return None
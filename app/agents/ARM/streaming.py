@@ -0,0 +1,249 @@
+"""
+Classification des transcripts ARM en continu, pendant l'appel
+
+Les fragments de transcript (texte ou reconnaissance vocale) mettent à jour les
+probabilités des pathologies de façon incrémentale ; une classification est
+proposée au régulateur dès que la confiance dépasse le seuil, sans attendre la fin
+de l'appel. Des sources de rejeu (fichier texte/JSON ou audio WAV) remplacent la
+parole en direct.
+"""
+from typing import Dict, Any, List, Optional, AsyncIterator
+import asyncio
+import json
+
+from app.agents.ARM.local_classifier import ClassifieurLocal, texte_transcript
+from app.utils.guideline_index import tokenize
+
+
+class ClassificationEnContinu:
+    """
+    Session de classification d'un appel en cours
+
+    Les fragments finaux sont ajoutés au transcript ; un fragment intermédiaire
+    (reconnaissance vocale non stabilisée) remplace le précédent fragment intermédiaire.
+    Seuls les termes du fragment reçu sont comptés : le coût d'une mise à jour ne
+    dépend pas de la longueur de l'appel.
+    """
+
+    def __init__(self, classifieur: ClassifieurLocal, seuil: float = 0.8, stabilite: int = 2):
+        """
+        Args:
+            classifieur: Classifieur local (probabilités par pathologie)
+            seuil: Confiance à partir de laquelle une classification est proposée
+            stabilite: Nombre de mises à jour consécutives au-dessus du seuil, avec la même
+                pathologie principale, avant de proposer la classification
+        """
+        self.classifieur = classifieur
+        self.seuil = seuil
+        self.stabilite = max(1, stabilite)
+        self.fragments_finaux: List[str] = []
+        self.fragment_en_cours = ""
+        self._comptes: Dict[int, int] = {}
+        self._dernier_token: Optional[str] = None
+        self._serie = 0
+        self._principale: Optional[str] = None
+        self.emise: Optional[Dict[str, Any]] = None
+        self.nb_fragments = 0
+
+    @property
+    def transcript(self) -> str:
+        return " ".join(self.fragments_finaux + ([self.fragment_en_cours] if self.fragment_en_cours else []))
+
+    def _comptes_fragment(self, texte: str) -> tuple:
+        """Comptes des termes d'un fragment, bigramme de jonction avec le fragment précédent compris"""
+        tokens = tokenize(texte)
+        if self._dernier_token is not None and tokens:
+            tokens_bigrammes = [self._dernier_token] + tokens
+        else:
+            tokens_bigrammes = tokens
+        comptes: Dict[int, int] = {}
+        termes_fragment = tokens + [f"{a}_{b}" for a, b in zip(tokens_bigrammes, tokens_bigrammes[1:])]
+        for terme in termes_fragment:
+            i = self.classifieur.vocabulaire.get(terme)
+            if i is not None:
+                comptes[i] = comptes.get(i, 0) + 1
+        return comptes, (tokens[-1] if tokens else self._dernier_token)
+
+    def ajouter_fragment(self, texte: str, final: bool = True) -> Dict[str, Any]:
+        """
+        Ajoute un fragment de transcript et met à jour la classification
+
+        Args:
+            texte: Le fragment reçu
+            final: False pour un résultat intermédiaire de la reconnaissance vocale
+
+        Returns:
+            {classifications, confidence, probabilites, proposee} ; proposee vaut True
+            pour la mise à jour qui déclenche (ou met à jour) la proposition au régulateur
+        """
+        self.nb_fragments += 1
+        comptes_fragment, dernier = self._comptes_fragment(texte)
+        if final:
+            for i, n in comptes_fragment.items():
+                self._comptes[i] = self._comptes.get(i, 0) + n
+            self._dernier_token = dernier
+            self.fragments_finaux.append(texte)
+            self.fragment_en_cours = ""
+            comptes = self._comptes
+        else:
+            self.fragment_en_cours = texte
+            comptes = dict(self._comptes)
+            for i, n in comptes_fragment.items():
+                comptes[i] = comptes.get(i, 0) + n
+
+        resultat = self.classifieur.resultat(self.classifieur.probabilites_depuis_comptes(comptes))
+        principale = resultat["classifications"][0]
+        if resultat["confidence"] >= self.seuil and principale == self._principale:
+            self._serie += 1
+        elif resultat["confidence"] >= self.seuil:
+            self._serie = 1
+        else:
+            self._serie = 0
+        self._principale = principale
+
+        # Proposée une fois stable, puis à nouveau seulement si la pathologie principale change
+        proposee = self._serie >= self.stabilite and (
+            self.emise is None or self.emise["classifications"][0] != principale
+        )
+        if proposee:
+            self.emise = {**resultat, "fragment": self.nb_fragments}
+        return {**resultat, "proposee": proposee}
+
+
+async def fragments_depuis_texte(chemin: str, mots_par_fragment: int = 8,
+                                 delai: float = 0.0) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Rejoue un transcript texte comme s'il arrivait en direct
+
+    Args:
+        chemin: Fichier .txt, ou .json d'un appel de scripts/appel_urgneces_generator.py
+            (un appel, ou une liste d'appels dont le premier est rejoué)
+        mots_par_fragment: Taille des fragments
+        delai: Pause entre deux fragments, en secondes (0 : aussi vite que possible)
+
+    Yields:
+        {texte, final}
+    """
+    with open(chemin, "r", encoding="utf-8") as f:
+        contenu = f.read()
+    if chemin.endswith(".json"):
+        donnees = json.loads(contenu)
+        appel = donnees[0] if isinstance(donnees, list) else donnees
+        contenu = texte_transcript(appel)
+
+    for ligne in contenu.splitlines():
+        mots = ligne.split()
+        for debut in range(0, len(mots), mots_par_fragment):
+            if delai:
+                await asyncio.sleep(delai)
+            yield {"texte": " ".join(mots[debut:debut + mots_par_fragment]), "final": True}
+
+
+async def fragments_depuis_audio(chemin: str, langue: str = "fr-FR", duree_bloc: float = 0.1,
+                                 temps_reel: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Rejoue un enregistrement WAV (PCM 16 bits) à travers Speech-to-Text en streaming
+
+    Args:
+        chemin: Fichier WAV
+        langue: Langue de la reconnaissance
+        duree_bloc: Durée audio envoyée par requête, en secondes
+        temps_reel: Envoyer l'audio au rythme de l'enregistrement
+
+    Yields:
+        {texte, final} ; les résultats intermédiaires ont final=False
+    """
+    import wave
+    import threading
+    # Import tardif : seule cette source a besoin de google-cloud-speech
+    from google.cloud import speech
+
+    with wave.open(chemin, "rb") as wav:
+        frequence = wav.getframerate()
+        canaux = wav.getnchannels()
+        if wav.getsampwidth() != 2:
+            raise ValueError("Seul le WAV PCM 16 bits est pris en charge")
+        trames_par_bloc = max(1, int(frequence * duree_bloc))
+        blocs = []
+        while True:
+            bloc = wav.readframes(trames_par_bloc)
+            if not bloc:
+                break
+            blocs.append(bloc)
+
+    config = speech.StreamingRecognitionConfig(
+        config=speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=frequence,
+            audio_channel_count=canaux,
+            language_code=langue,
+        ),
+        interim_results=True,
+    )
+
+    def requetes():
+        import time
+        for bloc in blocs:
+            if temps_reel:
+                time.sleep(duree_bloc)
+            yield speech.StreamingRecognizeRequest(audio_content=bloc)
+
+    boucle = asyncio.get_running_loop()
+    file: asyncio.Queue = asyncio.Queue()
+    fin = object()
+
+    def reconnaitre():
+        # streaming_recognize est bloquant : il tourne dans un thread et alimente la file
+        try:
+            client = speech.SpeechClient()
+            for reponse in client.streaming_recognize(config=config, requests=requetes()):
+                for resultat in reponse.results:
+                    if resultat.alternatives:
+                        fragment = {"texte": resultat.alternatives[0].transcript.strip(),
+                                    "final": resultat.is_final}
+                        boucle.call_soon_threadsafe(file.put_nowait, fragment)
+        except Exception as e:
+            boucle.call_soon_threadsafe(file.put_nowait, e)
+        finally:
+            boucle.call_soon_threadsafe(file.put_nowait, fin)
+
+    threading.Thread(target=reconnaitre, daemon=True).start()
+    while True:
+        element = await file.get()
+        if element is fin:
+            return
+        if isinstance(element, Exception):
+            raise element
+        yield element
+
+
+def source_de_rejeu(chemin: str, delai: float = 0.0) -> AsyncIterator[Dict[str, Any]]:
+    """Source de fragments adaptée au fichier : audio (.wav) ou texte (.txt, .json)"""
+    if chemin.lower().endswith(".wav"):
+        return fragments_depuis_audio(chemin, temps_reel=delai > 0)
+    return fragments_depuis_texte(chemin, delai=delai)
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    from app.agents.ARM.classifier_agent import ARMClassifierAgent
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Rejeu d'un appel avec classification en continu")
+    parser.add_argument("fichier", help="Transcript (.txt, .json) ou enregistrement (.wav)")
+    parser.add_argument("--seuil", type=float, default=None, help="Seuil de confiance (défaut : ARM_LOCAL_THRESHOLD)")
+    parser.add_argument("--delai", type=float, default=0.0, help="Pause entre fragments texte / audio en temps réel")
+    args = parser.parse_args()
+
+    async def rejouer():
+        agent = ARMClassifierAgent()
+        async for evenement in agent.classifier_en_continu(source_de_rejeu(args.fichier, args.delai), args.seuil):
+            if evenement["type"] == "proposition":
+                print(f"🚨 [fragment {evenement['fragment']}] {', '.join(evenement['classifications'])} "
+                      f"({evenement['confidence']:.0%})")
+            elif evenement["type"] == "finale":
+                print(f"✅ Classification finale ({evenement['source']}): {', '.join(evenement['classifications'])}")
+
+    asyncio.run(rejouer())
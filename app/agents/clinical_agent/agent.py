@@ -11,6 +11,10 @@ from google.adk.tools import agent_tool
 
 from pydantic import BaseModel, Field
 
+from app.utils.llm import admit_llm_request, retrying_adk_model
+from app.utils.sessions import compact_llm_request
+from app.utils.telemetry import phase_span
+
 # Charger les variables d'environnement depuis le fichier .env
 load_dotenv()
 
@@ -55,6 +59,18 @@ os.environ.setdefault("DB_PORT", "5432")
 os.environ.setdefault("DB_HOST", get_cloudsql_db_host(project_id))
 os.environ.setdefault("DB_PASSWORD", get_db_password_from_secret_manager(project_id))
 
+# Itemids CHARTEVENTS des signes vitaux suivis
+VITAL_MAPPING = {
+    220045: "heart_rate",
+    220179: "systolic_bp",
+    220180: "diastolic_bp",
+    220210: "respiratory_rate",
+    223761: "temperature",
+    223762: "temperature",
+    220277: "spo2"
+}
+
+
 class AgentCollecteur:
     """Agent 1 : Collecte les données patient depuis Cloud SQL (MIMIC-III importée)"""
 
@@ -227,8 +243,10 @@ class AgentCollecteur:
             if limit:
                 query += f" LIMIT {limit}"
             
-            with self.engine.connect() as conn:
-                df = pd.read_sql(text(query), conn)
+            with phase_span("collector.table_read", **{"adn.table": table_name}) as span:
+                with self.engine.connect() as conn:
+                    df = pd.read_sql(text(query), conn)
+                span.set_attribute("adn.rows", len(df))
             
             logger.info(f"Table {table_name} chargée ({len(df)} lignes)")
             return df
@@ -296,12 +314,13 @@ class AgentCollecteur:
                 "flag": [None, None, "abnormal", "abnormal"]
             }),
             "chartevents": pd.DataFrame({
-                "subject_id": [12345, 12345, 12347, 12347],
-                "itemid": [220045, 220179, 220045, 220179],
+                "subject_id": [12345, 12345, 12347, 12347, 12347, 12347],
+                "itemid": [220045, 220179, 220045, 220179, 220045, 220179],
                 "charttime": ["2024-01-01 11:00:00", "2024-01-01 11:00:00",
+                             "2024-01-03 06:30:00", "2024-01-03 06:30:00",
                              "2024-01-03 09:30:00", "2024-01-03 09:30:00"],
-                "valuenum": [85.0, 120.0, 125.0, 80.0],
-                "valueuom": ["bpm", "mmHg", "bpm", "mmHg"]
+                "valuenum": [85.0, 120.0, 104.0, 98.0, 125.0, 80.0],
+                "valueuom": ["bpm", "mmHg", "bpm", "mmHg", "bpm", "mmHg"]
             }),
             "microbiologyevents": pd.DataFrame({
                 "subject_id": [12347],
@@ -406,6 +425,7 @@ class AgentCollecteur:
                 },
                 
                 "vitals_current": self._extract_vitals(chartevents),
+                "vitals_history": self._extract_vitals_history(chartevents),
                 "labs": self._extract_labs(labevents),
                 "cultures": self._extract_cultures(microevents),
                 "diagnoses_icd": self._extract_diagnoses(diagnoses),
@@ -464,18 +484,10 @@ class AgentCollecteur:
             return {}
         
         vitals = {}
-        vital_mapping = {
-            220045: "heart_rate",
-            220179: "systolic_bp",
-            220180: "diastolic_bp",
-            220210: "respiratory_rate",
-            223761: "temperature",
-            220277: "spo2"
-        }
         for _, row in chartevents.iterrows():
             item_id = row.get('itemid')
-            if item_id in vital_mapping:
-                name = vital_mapping[item_id]
+            if item_id in VITAL_MAPPING:
+                name = VITAL_MAPPING[item_id]
                 val = row.get('valuenum')
                 if pd.notna(val):
                     vitals[name] = {
@@ -485,6 +497,21 @@ class AgentCollecteur:
                     }
         return vitals
     
+    def _extract_vitals_history(self, chartevents: pd.DataFrame) -> Dict:
+        """Historique des signes vitaux par constante, trié par date (détection de tendances)"""
+        history = {}
+        if chartevents.empty:
+            return history
+
+        rows = chartevents[chartevents['itemid'].isin(VITAL_MAPPING) & chartevents['valuenum'].notna()]
+        for _, row in rows.sort_values('charttime').iterrows():
+            history.setdefault(VITAL_MAPPING[row['itemid']], []).append({
+                "value": float(row['valuenum']),
+                "unit": row.get('valueuom', ''),
+                "charttime": str(row['charttime'])
+            })
+        return history
+    
     def _extract_labs(self, labevents: pd.DataFrame) -> list:
         if labevents.empty:
             return []
@@ -594,7 +621,7 @@ def tool_collecter_depuis_texte(texte_medical: str) -> Dict[str, Any]:
 
 collecteur_agent = LlmAgent(
     name="collecteur_agent",
-    model="gemini-2.0-flash",
+    model=retrying_adk_model("gemini-2.0-flash"),
     description="Agent de collecte de données cliniques depuis MIMIC-III ou texte libre.",
     instruction="""
 Tu es un agent de collecte de données médicales. 
@@ -606,7 +633,8 @@ Retourne toujours les données dans un format JSON normalisé
 sous la clé 'patient_normalized'.
 """,
     tools=[tool_collecter_par_id, tool_collecter_depuis_texte],
-    output_key="donnees_patient"
+    output_key="donnees_patient",
+    before_model_callback=[compact_llm_request, admit_llm_request],
 )
 
 
@@ -668,7 +696,7 @@ class SynthetiseurOutput(BaseModel):
 
 synthetiseur_agent = LlmAgent(
     name="synthetiseur_agent",
-    model="gemini-2.0-flash",
+    model=retrying_adk_model("gemini-2.0-flash"),
     description="Medical synthesis and self-criticism agent using the Jekyll/Hyde method.",
     instruction="""Your RUTHLESS SELF-CRITICISM mission:
 1. Look for what is MISSING in the data
@@ -679,7 +707,8 @@ synthetiseur_agent = LlmAgent(
 
 Output strictly as JSON matching the defined schema.""",
     output_schema=SynthetiseurOutput,
-    output_key="synthese_clinique"
+    output_key="synthese_clinique",
+    before_model_callback=[compact_llm_request, admit_llm_request],
 )
 
 
@@ -749,7 +778,7 @@ class ExpertAgentOutput(BaseModel):
 
 expert_agent = LlmAgent(
     name="expert_agent",
-    model="gemini-2.0-flash",
+    model=retrying_adk_model("gemini-2.0-flash"),
     description="""
 Agent médical expert en validation clinique et diagnostics différentiels.
 Analyse les alertes de l'Agent Synthétiseur, valide contre les guidelines médicales,
@@ -766,7 +795,8 @@ Analyse la synthèse clinique et suis rigoureusement le processus en 5 phases :
 Retourne la sortie STRICTEMENT au format JSON conforme au schéma spécifié.
 """,
     output_schema=ExpertAgentOutput,
-    output_key="validation_expert"
+    output_key="validation_expert",
+    before_model_callback=[compact_llm_request, admit_llm_request],
 )
 
 
@@ -789,7 +819,7 @@ pipeline_tool = agent_tool.AgentTool(agent=pipeline_clinique)
 
 root_agent = LlmAgent(
     name="root_agent_clinique",
-    model="gemini-2.0-flash",
+    model=retrying_adk_model("gemini-2.0-flash"),
     description="""
     Agent coordinateur principal du système clinique multi-agent.
     Il orchestre la collecte, la synthèse et la validation médicale des données patients.
@@ -874,4 +904,5 @@ Fournir une réponse clinique complète, logique et hiérarchisée :
 - Plan d'action et recommandations
 """,
     tools=[pipeline_tool, collecteur_tool, synthetiseur_tool, expert_tool],
+    before_model_callback=[compact_llm_request, admit_llm_request],
 )
\ No newline at end of file
@@ -7,6 +7,20 @@ import pandas as pd
 import os
 from typing import Dict, Any, Optional
 
+from app.utils.telemetry import phase_span
+
+
+# Itemids CHARTEVENTS des signes vitaux suivis
+VITAL_MAPPING = {
+    220045: "heart_rate",
+    220179: "systolic_bp",
+    220180: "diastolic_bp",
+    220210: "respiratory_rate",
+    223761: "temperature",
+    223762: "temperature",
+    220277: "spo2"
+}
+
 
 class AgentCollecteur:
     """Agent 1 : Collecte les données patient depuis MIMIC-III ou texte"""
@@ -17,7 +31,10 @@ class AgentCollecteur:
     def _load_csv(self, name: str) -> pd.DataFrame:
         """Charge un fichier CSV"""
         path = os.path.join(self.data_dir, f"{name}.csv")
-        return pd.read_csv(path, low_memory=False)
+        with phase_span("collector.table_read", **{"adn.table": name}) as span:
+            df = pd.read_csv(path, low_memory=False)
+            span.set_attribute("adn.rows", len(df))
+        return df
     
     def collecter_donnees_patient(self, subject_id: Optional[int] = None, texte_medical: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -78,6 +95,7 @@ class AgentCollecteur:
                 },
                 
                 "vitals_current": self._extract_vitals(chartevents),
+                "vitals_history": self._extract_vitals_history(chartevents),
                 "labs": self._extract_labs(labevents),
                 "cultures": self._extract_cultures(microevents),
                 "diagnoses_icd": self._extract_diagnoses(diagnoses),
@@ -142,19 +160,10 @@ class AgentCollecteur:
         """Extrait les derniers signes vitaux"""
         vitals = {}
         
-        vital_mapping = {
-            220045: "heart_rate",
-            220179: "systolic_bp",
-            220180: "diastolic_bp",
-            220210: "respiratory_rate",
-            223761: "temperature",
-            220277: "spo2"
-        }
-        
         for _, row in chartevents.iterrows():
             item_id = row['itemid']
-            if item_id in vital_mapping:
-                name = vital_mapping[item_id]
+            if item_id in VITAL_MAPPING:
+                name = VITAL_MAPPING[item_id]
                 try:
                     value = float(row['valuenum']) if pd.notna(row['valuenum']) else None
                     if value:
@@ -168,6 +177,21 @@ class AgentCollecteur:
         
         return vitals
     
+    def _extract_vitals_history(self, chartevents: pd.DataFrame) -> Dict:
+        """Historique des signes vitaux par constante, trié par date (détection de tendances)"""
+        history = {}
+        if chartevents.empty:
+            return history
+
+        rows = chartevents[chartevents['itemid'].isin(VITAL_MAPPING) & chartevents['valuenum'].notna()]
+        for _, row in rows.sort_values('charttime').iterrows():
+            history.setdefault(VITAL_MAPPING[row['itemid']], []).append({
+                "value": float(row['valuenum']),
+                "unit": row.get('valueuom', ''),
+                "charttime": str(row['charttime'])
+            })
+        return history
+    
     def _extract_labs(self, labevents: pd.DataFrame) -> list:
         """Extrait les résultats de laboratoire"""
         labs = []
@@ -5,11 +5,15 @@ Temps d'exécution : T+90s à T+120s
 """
 
 import json
+import os
 from typing import Dict, List, Any
-from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel
 from vertexai.preview.generative_models import grounding
 
+from app.utils.clinical_scores import DETERMINISTIC_SCORES, compute_clinical_scores, score_key
+from app.utils.guideline_index import get_guideline_index
+from app.utils.llm import generate_content, get_model, vertexai_location
+from app.utils.telemetry import phase_span
+
 
 class AgentExpert:
     """
@@ -17,15 +21,20 @@ class AgentExpert:
     et génère des diagnostics différentiels via RAG
     """
     
-    def __init__(self, project_id: str, location: str = "us-central1"):
+    def __init__(self, project_id: str, location: str | None = None):
         self.project_id = project_id
-        self.location = location
-        aiplatform.init(project=project_id, location=location)
-        self.model = GenerativeModel("gemini-2.0-flash")
+        # Même région que le reste du pipeline (GCP_REGION, europe-west1 par défaut)
+        self.location = location or vertexai_location()
+        # Modèle partagé entre agents (registre de app.utils.llm)
+        self.model = get_model("gemini-2.0-flash", project_id=project_id, location=self.location)
         
         # Configuration RAG (Vertex AI Search - optionnel si disponible)
         self.rag_disponible = False  # Mettre True si Vertex AI Search configuré
         self.datastore_id = None  # ID du datastore médical si disponible
+
+        # Index local des fiches SFMU (GUIDELINE_INDEX_DIR), None s'il n'est pas construit
+        self.guidelines = get_guideline_index()
+        self.guidelines_top_k = int(os.getenv("GUIDELINE_TOP_K", "3"))
     
     def analyser_alertes(self, output_agent2: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -42,25 +51,29 @@ class AgentExpert:
         
         # Phase 1 : Générer les diagnostics différentiels
         print("\n📊 Phase 1 : Génération des diagnostics différentiels...")
-        diagnostics = self._generer_diagnostics_differentiels(
-            synthese, alertes, data_patient, scores
-        )
+        with phase_span("expert.diagnostics"):
+            diagnostics = self._generer_diagnostics_differentiels(
+                synthese, alertes, data_patient, scores
+            )
         
         # Phase 2 : Valider chaque alerte avec guidelines
         print("\n📚 Phase 2 : Validation avec guidelines médicales...")
-        alertes_validees = self._valider_alertes_avec_guidelines(alertes, data_patient)
+        with phase_span("expert.validation", **{"adn.alerts": len(alertes)}):
+            alertes_validees = self._valider_alertes_avec_guidelines(alertes, data_patient)
         
         # Phase 3 : Calculer scores de risque additionnels
         print("\n🎯 Phase 3 : Calcul des scores de risque...")
-        scores_risque = self._calculer_scores_risque_additionnels(
-            diagnostics, data_patient
-        )
+        with phase_span("expert.scores_risque"):
+            scores_risque = self._calculer_scores_risque_additionnels(
+                diagnostics, data_patient
+            )
         
         # Phase 4 : Générer plan d'action sourcé
         print("\n💊 Phase 4 : Génération du plan d'action...")
-        plan_action = self._generer_plan_action_source(
-            alertes_validees, diagnostics, data_patient
-        )
+        with phase_span("expert.plan_action"):
+            plan_action = self._generer_plan_action_source(
+                alertes_validees, diagnostics, data_patient
+            )
         
         # Résultat final
         output = {
@@ -150,8 +163,10 @@ Sois exhaustif mais pertinent - inclus les diagnostics graves même si moins pro
         if self.rag_disponible:
             response = self._query_avec_rag(prompt_diagnostics)
         else:
-            response = self.model.generate_content(
+            response = generate_content(
+                self.model,
                 prompt_diagnostics,
+                stage="expert.diagnostics",
                 generation_config={"response_mime_type": "application/json"}
             )
         
@@ -171,6 +186,7 @@ Sois exhaustif mais pertinent - inclus les diagnostics graves même si moins pro
         alertes_validees = []
         
         for alerte in alertes:
+            extraits = self._rechercher_guidelines(alerte, data_patient)
             
             prompt_validation = f"""
 Tu es un expert en médecine basée sur les preuves.
@@ -180,7 +196,7 @@ ALERTE À VALIDER :
 
 CONTEXTE PATIENT :
 {json.dumps(data_patient, indent=2, ensure_ascii=False)}
-
+{extraits}
 Ta mission : Valider cette alerte contre les guidelines médicales reconnues.
 
 Format JSON :
@@ -217,8 +233,10 @@ Format JSON :
             if self.rag_disponible:
                 response = self._query_avec_rag(prompt_validation)
             else:
-                response = self.model.generate_content(
+                response = generate_content(
+                    self.model,
                     prompt_validation,
+                    stage="expert.validation",
                     generation_config={"response_mime_type": "application/json"}
                 )
             
@@ -234,6 +252,39 @@ Format JSON :
         
         return alertes_validees
     
+    def _rechercher_guidelines(self, alerte: Dict, data_patient: Dict) -> str:
+        """
+        Recherche les passages pertinents dans l'index local des guidelines
+        Retourne le bloc à injecter dans le prompt (vide sans index ou sans résultat)
+        """
+        if self.guidelines is None:
+            return ""
+        
+        requete = " ".join(
+            str(alerte.get(champ) or "")
+            for champ in ("type", "finding", "clinical_impact", "action_required")
+        ) + " " + str((data_patient.get("admission") or {}).get("chief_complaint") or "")
+        with phase_span("expert.guidelines_retrieval", **{"adn.top_k": self.guidelines_top_k}) as span:
+            passages = self.guidelines.search(requete, k=self.guidelines_top_k)
+            span.set_attribute("adn.passages", len(passages))
+        if not passages:
+            return ""
+        
+        extraits = "\n\n".join(
+            f"[{p['id']}] {p.get('title', '')} - {p.get('section', '')}\n"
+            + (f"URL : {p['url']}\n" if p.get("url") else "")
+            + p["text"]
+            for p in passages
+        )
+        return f"""
+EXTRAITS DES GUIDELINES (Guide de régulation médicale SFMU, index local) :
+{extraits}
+
+Appuie ta validation en priorité sur ces extraits et cite-les dans guidelines_references
+(guideline_name = titre de la fiche, source_url = URL de l'extrait si indiquée,
+passage_id = identifiant entre crochets).
+"""
+    
     def _calculer_scores_risque_additionnels(
         self, 
         diagnostics: List[Dict], 
@@ -241,8 +292,30 @@ Format JSON :
     ) -> List[Dict]:
         """
         Calcule des scores de risque additionnels basés sur les diagnostics
+        Les scores calculables depuis les constantes (qSOFA, SIRS, NEWS2, shock index)
+        sont calculés localement, l'IA ne calcule que les scores restants
         """
-        
+        scores_calcules = [
+            {
+                "diagnosis_related": "Gravité globale",
+                "score_name": score["score_name"],
+                "score_value": score["value"],
+                "interpretation": score["interpretation"],
+                "risk_category": score["risk_category"],
+                "components_breakdown": score["components"],
+                "missing_components": score["missing_components"],
+                "confidence_in_calculation": (
+                    "HIGH - calcul déterministe"
+                    if not score["missing_components"]
+                    else "MEDIUM - calcul déterministe, composantes manquantes comptées normales"
+                ),
+            }
+            for score in compute_clinical_scores(data_patient)
+        ]
+        resume_calcules = ", ".join(
+            f"{s['score_name']} = {s['score_value']}" for s in scores_calcules
+        ) or "aucun"
+
         prompt_scores = f"""
 Tu es un expert en scores cliniques et pronostic.
 
@@ -252,7 +325,9 @@ DIAGNOSTICS RETENUS :
 DONNÉES PATIENT :
 {json.dumps(data_patient, indent=2, ensure_ascii=False)}
 
-Pour chaque diagnostic, calcule les scores de risque pertinents.
+SCORES DÉJÀ CALCULÉS (ne pas les recalculer ni les renvoyer) : {resume_calcules}
+
+Pour chaque diagnostic, calcule les AUTRES scores de risque pertinents (jamais {", ".join(DETERMINISTIC_SCORES)}).
 
 Exemples de scores selon le diagnostic :
 - Sepsis : APACHE II, SAPS II, mortalité prédite
@@ -281,13 +356,19 @@ Format JSON :
 }}
 """
         
-        response = self.model.generate_content(
+        response = generate_content(
+            self.model,
             prompt_scores,
+            stage="expert.scores_risque",
             generation_config={"response_mime_type": "application/json"}
         )
         
         result = json.loads(response.text)
-        return result.get("risk_scores", [])
+        deterministes = {score_key(name) for name in DETERMINISTIC_SCORES}
+        return scores_calcules + [
+            score for score in result.get("risk_scores", [])
+            if score_key(str(score.get("score_name"))) not in deterministes
+        ]
     
     def _generer_plan_action_source(
         self,
@@ -375,8 +456,10 @@ Format JSON :
 }}
 """
         
-        response = self.model.generate_content(
+        response = generate_content(
+            self.model,
             prompt_action,
+            stage="expert.plan_action",
             generation_config={"response_mime_type": "application/json"}
         )
         
@@ -465,8 +548,10 @@ Format JSON :
         
         if not self.rag_disponible or not self.datastore_id:
             # Fallback sur génération normale
-            return self.model.generate_content(
+            return generate_content(
+                self.model,
                 prompt,
+                stage="expert.rag",
                 generation_config={"response_mime_type": "application/json"}
             )
         
@@ -478,8 +563,10 @@ Format JSON :
         )
         
         # Génération avec grounding
-        response = self.model.generate_content(
+        response = generate_content(
+            self.model,
             prompt,
+            stage="expert.rag",
             generation_config={
                 "response_mime_type": "application/json",
                 "grounding": grounding_source
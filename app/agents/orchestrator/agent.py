@@ -15,6 +15,7 @@ if ROOT_DIR not in sys.path:
 from agents.collector.agent import AgentCollecteur
 from agents.synthesizer.agent import AgentSynthetiseur
 from agents.expert.agent import AgentExpert
+from app.utils.telemetry import phase_span
 
 
 class OrchestrateurADN:
@@ -28,10 +29,14 @@ class OrchestrateurADN:
         self.agent2 = AgentSynthetiseur(project_id=project_id)
         self.agent3 = AgentExpert(project_id=project_id)
     
-    def analyser_patient(self, subject_id: int) -> Dict[str, Any]:        
-        data_collectee = self.agent1.collecter_donnees_patient(subject_id)        
-        resultat_synthese = self.agent2.analyser_patient(data_collectee)
-        resultat_expert = self.agent3.analyser_alertes(resultat_synthese)
+    def analyser_patient(self, subject_id: int) -> Dict[str, Any]:
+        with phase_span("orchestrator.analyser_patient", **{"adn.patient_id": subject_id}):
+            with phase_span("collector.collecte"):
+                data_collectee = self.agent1.collecter_donnees_patient(subject_id)
+            with phase_span("synthesizer.analyse"):
+                resultat_synthese = self.agent2.analyser_patient(data_collectee)
+            with phase_span("expert.analyse"):
+                resultat_expert = self.agent3.analyser_alertes(resultat_synthese)
         return {
             "patient_id": subject_id,
             "agent1_collecteur": data_collectee,
@@ -16,11 +16,12 @@ import os
 
 import google.auth
 from google.adk.agents import Agent
-from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
 from vertexai.preview import rag
 
 from dotenv import load_dotenv
+from app.utils.llm import admit_llm_request, retrying_adk_model
 from .prompts import RAG_AGENT_INSTRUCTIONS
+from .retrieval import CachedVertexAiRagRetrieval
 
 load_dotenv()
 
@@ -44,7 +45,8 @@ rag_corpus = get_rag_corpus(project_id)
 tools = []
 
 if rag_corpus:
-    ask_vertex_retrieval = VertexAiRagRetrieval(
+    # Retrieval results cached by normalized question (RAG_CACHE_* settings)
+    ask_vertex_retrieval = CachedVertexAiRagRetrieval(
         name='retrieve_rag_documentation',
         description=(
             'Use this tool to retrieve documentation and reference materials for the question from the RAG corpus,'
@@ -63,8 +65,9 @@ if rag_corpus:
     tools.append(ask_vertex_retrieval)
 
 root_agent = Agent(
-    model='gemini-2.5-flash',
+    model=retrying_adk_model('gemini-2.5-flash'),
     name='ask_rag_agent',
     instruction=RAG_AGENT_INSTRUCTIONS,
     tools=tools,
+    before_model_callback=admit_llm_request,
 )
\ No newline at end of file
@@ -0,0 +1,94 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import hashlib
+import logging
+from typing import Any
+
+from google.adk.models import LlmRequest
+from google.adk.tools.retrieval.base_retrieval_tool import BaseRetrievalTool
+from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
+from google.adk.tools.tool_context import ToolContext
+from vertexai.preview import rag
+
+from app.utils.retrieval_cache import RetrievalCache
+
+
+def corpus_file_version(corpora: list[str]) -> str:
+    """
+    Version of RAG corpora: a hash of their file resource names.
+    Importing, re-uploading or deleting a file changes it.
+    """
+    digest = hashlib.sha1()
+    for corpus in sorted(corpora):
+        for name in sorted(f.name for f in rag.list_files(corpus_name=corpus)):
+            digest.update(name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CachedVertexAiRagRetrieval(VertexAiRagRetrieval):
+    """
+    VertexAiRagRetrieval with a result cache in front of the remote retrieval.
+
+    The built-in Gemini 2 retrieval runs inside the model call and cannot be
+    cached, so the tool is always declared as a function: every retrieval goes
+    through run_async, where results are cached by normalized query (TTL,
+    invalidated when the corpus files change) and identical concurrent
+    questions share one retrieval.
+    """
+
+    def __init__(self, *, cache: RetrievalCache | None = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        store = self.vertex_rag_store
+        corpora = [r.rag_corpus for r in store.rag_resources or []] + list(store.rag_corpora or [])
+        self.cache = cache or RetrievalCache.from_env(
+            corpus_version=lambda: corpus_file_version(corpora)
+        )
+        self._cache_scope = f"{sorted(corpora)}|{store.similarity_top_k}|{store.vector_distance_threshold}"
+
+    async def process_llm_request(
+        self,
+        *,
+        tool_context: ToolContext,
+        llm_request: LlmRequest,
+    ) -> None:
+        # Function declaration for every model (skips VertexAiRagRetrieval's built-in tool)
+        await BaseRetrievalTool.process_llm_request(
+            self, tool_context=tool_context, llm_request=llm_request
+        )
+
+    async def _retrieve(self, query: str) -> Any:
+        store = self.vertex_rag_store
+        # retrieval_query is blocking: keep it off the event loop
+        response = await asyncio.to_thread(
+            rag.retrieval_query,
+            text=query,
+            rag_resources=store.rag_resources,
+            rag_corpora=store.rag_corpora,
+            similarity_top_k=store.similarity_top_k,
+            vector_distance_threshold=store.vector_distance_threshold,
+        )
+        logging.debug(f"RAG raw response: {response}")
+        return (
+            f"No matching result found with the config: {store}"
+            if not response.contexts.contexts
+            else [context.text for context in response.contexts.contexts]
+        )
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        query = args["query"]
+        return await self.cache.get_or_fetch(
+            query, lambda: self._retrieve(query), scope=self._cache_scope
+        )
@@ -5,7 +5,15 @@ import vertexai
 from vertexai.preview import rag
 import os
 from dotenv import load_dotenv, set_key
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import argparse
+import hashlib
+import json
+import random
 import tempfile
+import threading
+import time
 
 # Load environment variables from .env file
 load_dotenv()
@@ -31,6 +39,26 @@ ENV_FILE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".
 # Extensions de fichiers supportés par Vertex AI RAG
 SUPPORTED_EXTENSIONS = ['.pdf', '.txt', '.html', '.json', '.csv']
 
+# Ingestion settings
+DEFAULT_WORKERS = 4
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(__file__), ".rag_ingest_manifest.json")
+MAX_QUOTA_RETRIES = 6
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 60.0
+
+# Chunking and bulk import settings
+DEFAULT_CHUNK_SIZE = 1024
+DEFAULT_CHUNK_OVERLAP = 200
+# ImportRagFiles accepts at most 25 GCS URIs per request
+DEFAULT_IMPORT_BATCH_SIZE = 25
+DEFAULT_MAX_EMBEDDING_REQUESTS_PER_MIN = 1000
+
+# Description given to the files uploaded from GCS (rag.upload_file keeps no source URI)
+GCS_UPLOAD_DESCRIPTION = "Document imported from GCS: "
+
+_storage_client = None
+_storage_client_lock = threading.Lock()
+
 
 # --- Functions ---
 def initialize_vertex_ai():
@@ -41,22 +69,24 @@ def initialize_vertex_ai():
     )
 
 
+def find_corpus():
+    """Returns the existing corpus with CORPUS_DISPLAY_NAME, or None."""
+    for existing_corpus in rag.list_corpora():
+        if existing_corpus.display_name == CORPUS_DISPLAY_NAME:
+            return existing_corpus
+    return None
+
+
 def get_or_create_corpus():
     """Creates a new corpus or retrieves an existing one."""
     embedding_model_config = rag.EmbeddingModelConfig(
         publisher_model="publishers/google/models/text-embedding-005"
     )
     
-    existing_corpora = rag.list_corpora()
-    corpus = None
-    
-    for existing_corpus in existing_corpora:
-        if existing_corpus.display_name == CORPUS_DISPLAY_NAME:
-            corpus = existing_corpus
-            print(f"Found existing corpus with display name '{CORPUS_DISPLAY_NAME}'")
-            break
-    
-    if corpus is None:
+    corpus = find_corpus()
+    if corpus is not None:
+        print(f"Found existing corpus with display name '{CORPUS_DISPLAY_NAME}'")
+    else:
         corpus = rag.create_corpus(
             display_name=CORPUS_DISPLAY_NAME,
             description=CORPUS_DESCRIPTION,
@@ -67,10 +97,23 @@ def get_or_create_corpus():
     return corpus
 
 
+def get_storage_client():
+    """Returns the GCS client shared by all workers (created once)."""
+    global _storage_client
+    with _storage_client_lock:
+        if _storage_client is None:
+            _storage_client = storage.Client(project=PROJECT_ID)
+        return _storage_client
+
+
+def _is_supported(name):
+    _, ext = os.path.splitext(name)
+    return ext.lower() in SUPPORTED_EXTENSIONS
+
+
 def list_gcs_files(bucket_name, prefix=""):
     """List all files in a GCS bucket with optional prefix filter."""
-    storage_client = storage.Client(project=PROJECT_ID)
-    bucket = storage_client.bucket(bucket_name)
+    bucket = get_storage_client().bucket(bucket_name)
     blobs = bucket.list_blobs(prefix=prefix)
     
     files = []
@@ -78,8 +121,7 @@ def list_gcs_files(bucket_name, prefix=""):
         # Skip directories (blobs ending with /)
         if not blob.name.endswith('/'):
             # Filter by supported extensions
-            _, ext = os.path.splitext(blob.name)
-            if ext.lower() in SUPPORTED_EXTENSIONS:
+            if _is_supported(blob.name):
                 files.append(blob)
             else:
                 print(f"Skipping unsupported file type: {blob.name}")
@@ -89,23 +131,174 @@ def list_gcs_files(bucket_name, prefix=""):
 
 def download_gcs_file(bucket_name, blob_name, local_path):
     """Download a file from GCS to local path."""
-    storage_client = storage.Client(project=PROJECT_ID)
-    bucket = storage_client.bucket(bucket_name)
+    bucket = get_storage_client().bucket(bucket_name)
     blob = bucket.blob(blob_name)
     
     blob.download_to_filename(local_path)
     print(f"Downloaded {blob_name} to {local_path}")
 
 
-def upload_file_to_corpus(corpus_name, file_path, display_name, description):
-    """Uploads a file to the specified corpus."""
+def gcs_sources(bucket_name, prefix=""):
+    """
+    Source entries for the supported blobs of a bucket.
+    The fingerprint is the blob generation and MD5: it changes whenever the object is rewritten.
+    """
+    sources = []
+    for blob in list_gcs_files(bucket_name, prefix):
+        uri = f"gs://{bucket_name}/{blob.name}"
+        sources.append({
+            "uri": uri,
+            "display_name": os.path.basename(blob.name),
+            "fingerprint": f"{blob.generation}:{blob.md5_hash}",
+            "size": blob.size or 0,
+            "description": f"{GCS_UPLOAD_DESCRIPTION}{uri}",
+            "fetch": lambda temp_dir, name=blob.name: _fetch_gcs_blob(bucket_name, name, temp_dir),
+        })
+    return sources
+
+
+def _fetch_gcs_blob(bucket_name, blob_name, temp_dir):
+    # One sub-directory per blob: files with the same basename do not collide
+    local_dir = tempfile.mkdtemp(dir=temp_dir)
+    local_path = os.path.join(local_dir, os.path.basename(blob_name))
+    download_gcs_file(bucket_name, blob_name, local_path)
+    return local_path
+
+
+def local_sources(directory):
+    """Source entries for the supported files of a local directory (offline testing, no GCS)."""
+    sources = []
+    for root, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            path = os.path.abspath(os.path.join(root, filename))
+            if not _is_supported(filename):
+                print(f"Skipping unsupported file type: {path}")
+                continue
+            digest = hashlib.md5()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            sources.append({
+                "uri": f"file://{path}",
+                "display_name": filename,
+                "fingerprint": digest.hexdigest(),
+                "size": os.path.getsize(path),
+                "description": f"Document imported from local file: {path}",
+                "fetch": lambda temp_dir, path=path: path,
+            })
+    return sources
+
+
+class IngestManifest:
+    """
+    Record of the files already ingested into a corpus: source URI -> fingerprint and RAG file.
+    Saved after every file so that an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path, corpus_name):
+        self.path = path
+        self.corpus_name = corpus_name
+        self.files = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            # A manifest written for another corpus says nothing about this one
+            if data.get("corpus") == corpus_name:
+                self.files = data.get("files", {})
+
+    def is_current(self, source):
+        entry = self.files.get(source["uri"])
+        return entry is not None and entry["fingerprint"] == source["fingerprint"]
+
+    def pending(self, sources, force=False):
+        """Sources that are new or changed since they were recorded (all of them if force)."""
+        return list(sources) if force else [s for s in sources if not self.is_current(s)]
+
+    def previous_rag_file(self, source):
+        entry = self.files.get(source["uri"])
+        return entry.get("rag_file") if entry else None
+
+    def record(self, source, rag_file_name):
+        self.record_many([(source, rag_file_name)])
+
+    def record_many(self, entries):
+        """Records (source, RAG file name) pairs with a single manifest write."""
+        imported_at = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            for source, rag_file_name in entries:
+                self.files[source["uri"]] = {
+                    "fingerprint": source["fingerprint"],
+                    "rag_file": rag_file_name,
+                    "imported_at": imported_at,
+                }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"corpus": self.corpus_name, "files": self.files}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+class QuotaBackoff:
+    """
+    Exponential backoff with full jitter on ResourceExhausted, shared by the workers:
+    when one upload hits the quota, the others wait too instead of hammering the API.
+    """
+
+    def __init__(self, max_retries=MAX_QUOTA_RETRIES, base_seconds=RETRY_BASE_SECONDS, max_seconds=RETRY_MAX_SECONDS):
+        self.max_retries = max_retries
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, attempt):
+        delay = random.uniform(0, min(self.max_seconds, self.base_seconds * 2**attempt))
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        return delay
+
+    def call(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            self.wait()
+            try:
+                return fn(*args, **kwargs)
+            except ResourceExhausted:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.pause(attempt)
+                print(f"Quota exceeded, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                attempt += 1
+
+
+def chunking_config(chunk_size=DEFAULT_CHUNK_SIZE, chunk_overlap=DEFAULT_CHUNK_OVERLAP):
+    """Transformation config applied to the ingested files."""
+    if chunk_overlap >= chunk_size:
+        raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+    return rag.TransformationConfig(
+        chunking_config=rag.ChunkingConfig(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    )
+
+
+def upload_file_to_corpus(corpus_name, file_path, display_name, description, backoff=None,
+                          transformation_config=None):
+    """Uploads a file to the specified corpus, backing off while the quota is exhausted."""
     print(f"Uploading {display_name} to corpus...")
+    backoff = backoff or QuotaBackoff()
     try:
-        rag_file = rag.upload_file(
+        rag_file = backoff.call(
+            rag.upload_file,
             corpus_name=corpus_name,
             path=file_path,
             display_name=display_name,
             description=description,
+            transformation_config=transformation_config,
         )
         print(f"✓ Successfully uploaded {display_name} to corpus")
         return rag_file
@@ -119,56 +312,244 @@ def upload_file_to_corpus(corpus_name, file_path, display_name, description):
         return None
 
 
-def import_gcs_files_to_corpus(corpus_name, bucket_name, prefix=""):
-    """Import all supported files from GCS bucket to RAG corpus."""
+def _ingest_source(corpus_name, source, temp_dir, manifest, backoff, transformation_config):
+    """Fetches one source, uploads it and records it. Returns True on success."""
+    local_path = source["fetch"](temp_dir)
+    result = upload_file_to_corpus(
+        corpus_name=corpus_name,
+        file_path=local_path,
+        display_name=source["display_name"],
+        description=source["description"],
+        backoff=backoff,
+        transformation_config=transformation_config,
+    )
+    if local_path.startswith(temp_dir):
+        os.remove(local_path)
+    if not result:
+        return False
+
+    # The file changed since the last run: drop the outdated version from the corpus
+    previous = manifest.previous_rag_file(source)
+    if previous and previous != result.name:
+        delete_rag_file(previous, source["display_name"])
+    manifest.record(source, result.name)
+    return True
+
+
+def delete_rag_file(rag_file_name, display_name):
+    """Deletes an outdated RAG file from the corpus. Returns True on success."""
+    try:
+        rag.delete_file(name=rag_file_name)
+        print(f"Deleted outdated version of {display_name}")
+        return True
+    except Exception as e:
+        print(f"✗ Could not delete outdated RAG file {rag_file_name}: {e}")
+        return False
+
+
+def ingest_sources(corpus_name, sources, manifest, workers=DEFAULT_WORKERS, force=False,
+                   transformation_config=None):
+    """
+    Uploads the sources to the corpus with a bounded worker pool.
+    Sources whose fingerprint matches the manifest are skipped unless force is set.
+    """
+    pending = manifest.pending(sources, force)
+    skipped = len(sources) - len(pending)
+    print(f"{len(pending)} file(s) to ingest, {skipped} unchanged file(s) skipped\n")
+
+    successful_uploads = 0
+    failed_uploads = 0
+    backoff = QuotaBackoff()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {
+                executor.submit(
+                    _ingest_source, corpus_name, source, temp_dir, manifest, backoff, transformation_config
+                ): source
+                for source in pending
+            }
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    if future.result():
+                        successful_uploads += 1
+                    else:
+                        failed_uploads += 1
+                except Exception as e:
+                    print(f"✗ Error processing {source['uri']}: {e}")
+                    failed_uploads += 1
+
+    print(f"\n=== Import Summary ===")
+    print(f"Total files found: {len(sources)}")
+    print(f"Unchanged (skipped): {skipped}")
+    print(f"Successful uploads: {successful_uploads}")
+    print(f"Failed uploads: {failed_uploads}")
+    return {"skipped": skipped, "uploaded": successful_uploads, "failed": failed_uploads}
+
+
+def _batches(items, size):
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _imported_uri(rag_file):
+    """GCS URI a RAG file was imported from with rag.import_files, or None."""
+    uris = list(getattr(getattr(rag_file, "gcs_source", None), "uris", None) or [])
+    return uris[0] if uris else None
+
+
+def _uploaded_uri(rag_file):
+    """GCS URI recorded in the description of a file uploaded with rag.upload_file, or None."""
+    description = getattr(rag_file, "description", "") or ""
+    if _imported_uri(rag_file) is None and description.startswith(GCS_UPLOAD_DESCRIPTION):
+        return description[len(GCS_UPLOAD_DESCRIPTION):]
+    return None
+
+
+def corpus_files_by_uri(corpus_name):
+    """
+    RAG files of the corpus grouped by source GCS URI:
+    {uri: {"imported": [names], "uploaded": [names]}}.
+    """
+    files = {}
+    for rag_file in rag.list_files(corpus_name=corpus_name):
+        for kind, uri in (("imported", _imported_uri(rag_file)), ("uploaded", _uploaded_uri(rag_file))):
+            if uri:
+                files.setdefault(uri, {"imported": [], "uploaded": []})[kind].append(rag_file.name)
+    return files
+
+
+def bulk_import_sources(corpus_name, sources, manifest, force=False, batch_size=DEFAULT_IMPORT_BATCH_SIZE,
+                        transformation_config=None,
+                        max_embedding_requests_per_min=DEFAULT_MAX_EMBEDDING_REQUESTS_PER_MIN):
+    """
+    Imports GCS sources server-side with rag.import_files, batch_size URIs per request:
+    nothing is downloaded or uploaded by this machine.
+    A GCS import does not recognise the copies added with rag.upload_file (upload mode),
+    so before a file is imported its uploaded copies and the RAG file recorded for it in
+    the manifest are deleted. The imported RAG file names are then resolved from the
+    corpus (by GCS source URI) and recorded.
+    """
+    pending = manifest.pending(sources, force)
+    skipped = len(sources) - len(pending)
+    batches = _batches(pending, batch_size)
+    print(f"{len(pending)} file(s) to import in {len(batches)} batch(es), {skipped} unchanged file(s) skipped\n")
+    if not batches:
+        return {"skipped": skipped, "uploaded": 0, "failed": 0}
+
+    existing = corpus_files_by_uri(corpus_name)
+    imported = failed = 0
+    backoff = QuotaBackoff()
+    for number, batch in enumerate(batches, start=1):
+        print(f"Importing batch {number}/{len(batches)} ({len(batch)} file(s))...")
+        for source in batch:
+            outdated = set(existing.get(source["uri"], {}).get("uploaded", []))
+            previous = manifest.previous_rag_file(source)
+            if previous:
+                outdated.add(previous)
+            for rag_file_name in sorted(outdated):
+                delete_rag_file(rag_file_name, source["display_name"])
+        try:
+            # Batches run one after the other: concurrent imports into one corpus are rejected
+            response = backoff.call(
+                rag.import_files,
+                corpus_name=corpus_name,
+                paths=[source["uri"] for source in batch],
+                transformation_config=transformation_config,
+                max_embedding_requests_per_min=max_embedding_requests_per_min,
+            )
+        except Exception as e:
+            print(f"✗ Error importing batch {number}: {e}")
+            failed += len(batch)
+            continue
+
+        batch_failed = getattr(response, "failed_rag_files_count", 0) or 0
+        imported += len(batch) - batch_failed
+        failed += batch_failed
+        print(f"✓ Batch {number}: {response.imported_rag_files_count} imported, "
+              f"{getattr(response, 'skipped_rag_files_count', 0) or 0} already up to date, {batch_failed} failed")
+        # Per-file failures are not itemized by the response: only record fully successful batches
+        if not batch_failed:
+            names = {uri: files["imported"][0] for uri, files in corpus_files_by_uri(corpus_name).items()
+                     if files["imported"]}
+            manifest.record_many([(source, names.get(source["uri"])) for source in batch])
+
+    print(f"\n=== Import Summary ===")
+    print(f"Total files found: {len(sources)}")
+    print(f"Unchanged (skipped): {skipped}")
+    print(f"Imported: {imported}")
+    print(f"Failed: {failed}")
+    return {"skipped": skipped, "uploaded": imported, "failed": failed}
+
+
+def report_dry_run(sources, manifest, mode, force=False, batch_size=DEFAULT_IMPORT_BATCH_SIZE):
+    """Prints what an ingestion would do, without touching the corpus."""
+    pending = manifest.pending(sources, force)
+    new = [s for s in pending if s["uri"] not in manifest.files]
+    changed = [s for s in pending if s["uri"] in manifest.files]
+    total_bytes = sum(s["size"] for s in pending)
+
+    print(f"\n=== Dry run ({mode} mode) ===")
+    print(f"Total files found: {len(sources)}")
+    print(f"Unchanged (would be skipped): {len(sources) - len(pending)}")
+    print(f"New: {len(new)}")
+    print(f"Changed: {len(changed)}")
+    print(f"Data to ingest: {total_bytes / 1e6:.1f} MB")
+    if mode == "import":
+        print(f"Import requests: {len(_batches(pending, batch_size))} (batches of {batch_size})")
+    for source in pending:
+        status = "changed" if source["uri"] in manifest.files else "new"
+        print(f"  - [{status}] {source['uri']} ({source['size']} bytes)")
+    return {"new": len(new), "changed": len(changed), "skipped": len(sources) - len(pending), "bytes": total_bytes}
+
+
+def import_gcs_files_to_corpus(corpus_name, bucket_name, prefix="", manifest_path=DEFAULT_MANIFEST_PATH,
+                               workers=DEFAULT_WORKERS, force=False, mode="import",
+                               batch_size=DEFAULT_IMPORT_BATCH_SIZE, transformation_config=None,
+                               max_embedding_requests_per_min=DEFAULT_MAX_EMBEDDING_REQUESTS_PER_MIN,
+                               dry_run=False):
+    """
+    Import all supported files from GCS bucket to RAG corpus.
+    mode "import" imports the GCS URIs server-side in bulk, "upload" downloads and uploads each file.
+    """
     print(f"\n=== Importing files from GCS bucket: {bucket_name} ===\n")
     
     # List files in GCS bucket
-    gcs_files = list_gcs_files(bucket_name, prefix)
+    sources = gcs_sources(bucket_name, prefix)
     
-    if not gcs_files:
+    if not sources:
         print(f"No supported files found in bucket '{bucket_name}' with prefix '{prefix}'")
         return
     
-    print(f"Found {len(gcs_files)} supported file(s) in GCS bucket\n")
+    print(f"Found {len(sources)} supported file(s) in GCS bucket")
+    manifest = IngestManifest(manifest_path, corpus_name)
+    if dry_run:
+        return report_dry_run(sources, manifest, mode, force, batch_size)
+    if mode == "import":
+        return bulk_import_sources(
+            corpus_name, sources, manifest, force, batch_size, transformation_config,
+            max_embedding_requests_per_min,
+        )
+    return ingest_sources(corpus_name, sources, manifest, workers, force, transformation_config)
+
+
+def import_local_files_to_corpus(corpus_name, directory, manifest_path=DEFAULT_MANIFEST_PATH,
+                                 workers=DEFAULT_WORKERS, force=False, transformation_config=None,
+                                 dry_run=False):
+    """Import all supported files from a local directory to RAG corpus."""
+    print(f"\n=== Importing files from local directory: {directory} ===\n")
     
-    # Create temporary directory for downloads
-    with tempfile.TemporaryDirectory() as temp_dir:
-        successful_uploads = 0
-        failed_uploads = 0
-        
-        for blob in gcs_files:
-            try:
-                # Create local file path
-                local_filename = os.path.basename(blob.name)
-                local_path = os.path.join(temp_dir, local_filename)
-                
-                # Download from GCS
-                download_gcs_file(bucket_name, blob.name, local_path)
-                
-                # Upload to corpus
-                result = upload_file_to_corpus(
-                    corpus_name=corpus_name,
-                    file_path=local_path,
-                    display_name=local_filename,
-                    description=f"Document imported from GCS: gs://{bucket_name}/{blob.name}"
-                )
-                
-                if result:
-                    successful_uploads += 1
-                else:
-                    failed_uploads += 1
-                
-                print()  # Add blank line between files
-                
-            except Exception as e:
-                print(f"✗ Error processing {blob.name}: {e}\n")
-                failed_uploads += 1
-        
-        print(f"\n=== Import Summary ===")
-        print(f"Total files processed: {len(gcs_files)}")
-        print(f"Successful uploads: {successful_uploads}")
-        print(f"Failed uploads: {failed_uploads}")
+    sources = local_sources(directory)
+    
+    if not sources:
+        print(f"No supported files found in '{directory}'")
+        return
+    
+    print(f"Found {len(sources)} supported file(s) in local directory")
+    manifest = IngestManifest(manifest_path, corpus_name)
+    if dry_run:
+        return report_dry_run(sources, manifest, "upload", force)
+    return ingest_sources(corpus_name, sources, manifest, workers, force, transformation_config)
 
 
 def list_corpus_files(corpus_name):
@@ -191,29 +572,79 @@ def update_env_file(corpus_name, env_file_path):
 
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description="Vertex AI RAG corpus setup")
+    parser.add_argument("--bucket", default=BUCKET_NAME, help="GCS bucket holding the documents")
+    parser.add_argument("--prefix", default="", help="Only import blobs under this prefix, e.g. 'documents/'")
+    parser.add_argument("--local-dir", help="Import from a local directory instead of GCS (upload mode only)")
+    parser.add_argument("--mode", choices=["import", "upload"], default="import",
+                        help="import: bulk server-side import of the GCS URIs; upload: download then upload each file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent downloads/uploads (upload mode)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_IMPORT_BATCH_SIZE, help="GCS URIs per import request")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Chunk size in tokens")
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP, help="Chunk overlap in tokens")
+    parser.add_argument("--max-embedding-rpm", type=int, default=DEFAULT_MAX_EMBEDDING_REQUESTS_PER_MIN,
+                        help="Embedding requests per minute allowed to a bulk import")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="Manifest of already ingested files")
+    parser.add_argument("--force", action="store_true", help="Re-ingest files even if unchanged")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report what would be ingested without creating or modifying the corpus")
+    args = parser.parse_args()
+
     print("=== Vertex AI RAG Corpus Setup ===\n")
+    transformation_config = chunking_config(args.chunk_size, args.chunk_overlap)
     
     # Initialize Vertex AI
     initialize_vertex_ai()
     
-    # Get or create corpus
-    corpus = get_or_create_corpus()
+    if args.dry_run:
+        # Read-only: never create the corpus nor touch the .env file
+        corpus = find_corpus()
+        corpus_name = corpus.name if corpus else CORPUS_DISPLAY_NAME
+        if corpus is None:
+            print(f"Corpus '{CORPUS_DISPLAY_NAME}' does not exist yet: every file is new")
+    else:
+        # Get or create corpus
+        corpus = get_or_create_corpus()
+        corpus_name = corpus.name
+        
+        # Update .env file with corpus name
+        update_env_file(corpus_name, ENV_FILE_PATH)
     
-    # Update .env file with corpus name
-    update_env_file(corpus.name, ENV_FILE_PATH)
+    if args.local_dir:
+        import_local_files_to_corpus(
+            corpus_name=corpus_name,
+            directory=args.local_dir,
+            manifest_path=args.manifest,
+            workers=args.workers,
+            force=args.force,
+            transformation_config=transformation_config,
+            dry_run=args.dry_run,
+        )
+    else:
+        # Import files from GCS bucket
+        import_gcs_files_to_corpus(
+            corpus_name=corpus_name,
+            bucket_name=args.bucket,
+            prefix=args.prefix,
+            manifest_path=args.manifest,
+            workers=args.workers,
+            force=args.force,
+            mode=args.mode,
+            batch_size=args.batch_size,
+            transformation_config=transformation_config,
+            max_embedding_requests_per_min=args.max_embedding_rpm,
+            dry_run=args.dry_run,
+        )
     
-    # Import files from GCS bucket
-    import_gcs_files_to_corpus(
-        corpus_name=corpus.name,
-        bucket_name=BUCKET_NAME,
-        prefix=""  # Optional: specify a prefix to filter files, e.g., "documents/"
-    )
+    if args.dry_run:
+        print("\n=== Dry run complete (nothing was ingested) ===")
+        return
     
     # List all files in corpus
-    list_corpus_files(corpus_name=corpus.name)
+    list_corpus_files(corpus_name=corpus_name)
     
     print("\n=== Setup Complete ===")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
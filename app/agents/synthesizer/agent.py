@@ -6,9 +6,61 @@ COMPATIBLE avec format hospitalier ET appels SAMU
 """
 
 import json
-from typing import Dict, List, Any
-from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel
+import os
+from typing import Dict, List, Any, Tuple
+
+from app.agents.synthesizer.schemas import CIBLES_NORMALISEES, convertir_samu, registre as registre_schemas
+from app.agents.synthesizer.trends import analyser_tendances
+from app.utils.clinical_scores import DETERMINISTIC_SCORES, compute_clinical_scores, merge_scores
+from app.utils.llm import generate_content, get_model, vertexai_location
+from app.utils.telemetry import phase_span
+
+# Schéma de la réponse fusionnée (scores cliniques + dégradation silencieuse)
+SCHEMA_SCORES_DEGRADATION = {
+    "type": "OBJECT",
+    "properties": {
+        "applicable_scores": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "score_name": {"type": "STRING"},
+                    "value": {"type": "NUMBER"},
+                    "interpretation": {"type": "STRING"},
+                    "components": {
+                        "type": "ARRAY",
+                        "items": {
+                            "type": "OBJECT",
+                            "properties": {
+                                "name": {"type": "STRING"},
+                                "value": {"type": "STRING"},
+                            },
+                            "required": ["name", "value"],
+                        },
+                    },
+                    "clinical_action": {"type": "STRING"},
+                },
+                "required": ["score_name", "value", "interpretation"],
+            },
+        },
+        "deterioration_analysis": {
+            "type": "OBJECT",
+            "properties": {
+                "silent_deterioration_detected": {"type": "BOOLEAN"},
+                "severity": {"type": "STRING", "enum": ["LOW", "MEDIUM", "HIGH"]},
+                "trajectory": {
+                    "type": "STRING",
+                    "enum": ["STABLE", "SLOW_DETERIORATION", "RAPID_DETERIORATION"],
+                },
+                "evidence": {"type": "ARRAY", "items": {"type": "STRING"}},
+                "predicted_outcome": {"type": "STRING"},
+                "time_window": {"type": "STRING"},
+            },
+            "required": ["silent_deterioration_detected", "severity", "trajectory", "evidence"],
+        },
+    },
+    "required": ["applicable_scores", "deterioration_analysis"],
+}
 
 
 class AgentSynthetiseur:
@@ -18,90 +70,75 @@ class AgentSynthetiseur:
     COMPATIBLE avec format hospitalier ET appels SAMU
     """
 
-    def __init__(self, project_id: str, location: str = "us-central1"):
+    def __init__(self, project_id: str, location: str | None = None, mode_fusionne: bool | None = None):
         self.project_id = project_id
-        self.location = location
-        aiplatform.init(project=project_id, location=location)
-        self.model = GenerativeModel("gemini-2.0-flash")
+        # Phases 3 et 4 en un seul appel structuré (SYNTHESIZER_FUSED_PHASES=true)
+        if mode_fusionne is None:
+            mode_fusionne = os.getenv("SYNTHESIZER_FUSED_PHASES", "false").lower() == "true"
+        self.mode_fusionne = mode_fusionne
+        # Même région que le reste du pipeline (GCP_REGION, europe-west1 par défaut)
+        self.location = location or vertexai_location()
+        # Modèle partagé entre agents (registre de app.utils.llm)
+        self.model = get_model("gemini-2.0-flash", project_id=project_id, location=self.location)
 
     def normaliser_input(self, data_input: Dict[str, Any]) -> Dict[str, Any]:
         """
         Normalise n'importe quel format d'input en format unifié
-        Gère : format hospitalier, appels SAMU, ou tout autre format
+        Formats connus (hospitalier, SAMU, FHIR, clé/valeur plat) : conversion locale (schemas.py)
+        Format inconnu : mapping de champs appris une fois par structure, puis mis en cache
         """
+        data_normalise = registre_schemas.normaliser(data_input, self._apprendre_mapping)
+        if data_normalise is not None:
+            return data_normalise
 
-        # Si c'est déjà au bon format (patient_normalized existe)
-        if "patient_normalized" in data_input:
-            return data_input
-
-        # Si c'est un appel SAMU (avec input.text et expected_output)
-        if "input" in data_input and "expected_output" in data_input:
-            return self._convertir_format_samu(data_input)
-
-        # Sinon, essayer de détecter automatiquement
+        # Aucun mapping exploitable : conversion complète par l'IA
         return self._auto_detecter_format(data_input)
 
     def _convertir_format_samu(self, data_samu: Dict) -> Dict:
         """
         Convertit le format SAMU en format unifié
         """
-        expected = data_samu.get("expected_output", {})
-        meta = data_samu.get("meta", {})
-        appel_text = data_samu.get("input", {}).get("text", "")
-
-        # Construction du format normalisé
-        patient_normalized = {
-            "id": data_samu.get("id", "SAMU_UNKNOWN"),
-            "source_type": "SAMU_CALL",
-            "call_transcript": appel_text,
-            "scenario": meta.get("scenario", "Non spécifié"),
-            "age": expected.get("patient_identification", {}).get("age"),
-            "sex": expected.get("patient_identification", {}).get("sex"),
-            "weight": expected.get("patient_identification", {}).get("weight"),
+        return convertir_samu(data_samu)
 
-            "admission": {
-                "type": "PREHOSPITAL_EMERGENCY",
-                "chief_complaint": expected.get("incident_description", {}).get("main_reason"),
-                "mechanism": expected.get("incident_description", {}).get("mechanism"),
-                "onset_time": expected.get("incident_description", {}).get("onset_time"),
-                "evolution": expected.get("incident_description", {}).get("evolution"),
-                "date": None
-            },
-
-            "location": expected.get("location", {}),
-
-            "vitals_current": {
-                "consciousness": expected.get("patient_identification", {}).get("consciousness"),
-                "breathing": expected.get("vital_signs", {}).get("breathing"),
-                "pulse": expected.get("vital_signs", {}).get("pulse"),
-                "skin_color": expected.get("vital_signs", {}).get("skin_color"),
-                "sweating": expected.get("vital_signs", {}).get("sweating"),
-                "temperature": expected.get("vital_signs", {}).get("temperature"),
-                "bleeding": expected.get("vital_signs", {}).get("bleeding")
-            },
-
-            "symptoms": expected.get("symptoms", {}),
+    def _apprendre_mapping(self, squelette: Dict, apercu: Dict) -> Dict[str, str]:
+        """
+        Demande à l'IA le mapping des champs d'une structure inconnue
+        Seuls la structure et un aperçu tronqué des valeurs sont envoyés
+        """
 
-            "medical_history": {
-                "known_conditions": expected.get("medical_history", {}).get("known_conditions", []),
-                "medications_current": expected.get("medical_history", {}).get("medications"),
-                "anticoagulant_use": expected.get("medical_history", {}).get("anticoagulant_use"),
-                "allergies": expected.get("medical_history", {}).get("allergies"),
-                "recent_hospitalization": expected.get("medical_history", {}).get("recent_hospitalization")
-            },
+        prompt_mapping = f"""
+Tu reçois des données patient dans un format inconnu.
 
-            "caller_info": expected.get("caller_info", {}),
+STRUCTURE (clés imbriquées, listes réduites à un élément) :
+{json.dumps(squelette, indent=2, ensure_ascii=False)}
 
-            "actions_already_taken": expected.get("actions_already_taken", {}),
+APERÇU DES VALEURS :
+{json.dumps(apercu, indent=2, ensure_ascii=False)}
 
-            "risk_factors": expected.get("risk_factors", {}),
+Ta mission : associer chaque champ médicalement pertinent à un champ du format normalisé.
+Chemins source : clés séparées par des points (ex : "patient.vitals.hr").
+Chemins cible : commencent par l'un de {", ".join(sorted(CIBLES_NORMALISEES))}
+(ex : "age", "sex", "admission.chief_complaint", "vitals_current.heart_rate",
+"vitals_current.systolic_bp", "vitals_current.spo2", "vitals_current.temperature",
+"medical_history.known_conditions", "labs").
 
-            "environment_context": expected.get("environment_context", {}),
+Format JSON :
+{{
+    "mapping": {{"chemin.source": "chemin.cible"}}
+}}
+"""
 
-            "instructions_given": expected.get("instructions_given", {})
-        }
+        response = generate_content(
+            self.model,
+            prompt_mapping,
+            stage="synthesizer.mapping_format",
+            generation_config={"response_mime_type": "application/json"}
+        )
 
-        return {"patient_normalized": patient_normalized}
+        try:
+            return json.loads(response.text).get("mapping", {})
+        except (ValueError, AttributeError):
+            return {}
 
     def _auto_detecter_format(self, data: Dict) -> Dict:
         """
@@ -158,8 +195,10 @@ Format de sortie (JSON STRICT) :
 Extrait TOUT ce qui est disponible, même si incomplet.
 """
 
-        response = self.model.generate_content(
+        response = generate_content(
+            self.model,
             prompt_detection,
+            stage="synthesizer.detection_format",
             generation_config={"response_mime_type": "application/json"}
         )
 
@@ -190,8 +229,10 @@ Format attendu (JSON):
 Sois concis mais complet. C'est un résumé standard de qualité.
 """
 
-        response = self.model.generate_content(
+        response = generate_content(
+            self.model,
             prompt_synthese,
+            stage="synthesizer.synthese",
             generation_config={"response_mime_type": "application/json"}
         )
 
@@ -266,19 +307,31 @@ Format de sortie (JSON STRICT) :
 Sois IMPITOYABLE. Un patient peut mourir si tu rates quelque chose.
 """
 
-        response = self.model.generate_content(
+        response = generate_content(
+            self.model,
             prompt_critique,
+            stage="synthesizer.critique",
             generation_config={"response_mime_type": "application/json"}
         )
 
         critique = json.loads(response.text)
         return critique
 
+    def _resumer_scores_calcules(self, scores_calcules: List[Dict]) -> str:
+        """Résumé des scores déjà calculés localement, pour les prompts"""
+        if not scores_calcules:
+            return "aucun (données insuffisantes)"
+        return ", ".join(
+            f"{s['score_name']} = {s['value']} ({s['interpretation']})" for s in scores_calcules
+        )
+
     def calculer_scores_cliniques(self, data_patient: Dict) -> Dict:
         """
-        Calcule les scores cliniques standards (SOFA, qSOFA, etc.)
-        Utilise l'IA pour identifier QUELS scores sont pertinents
+        Calcule les scores cliniques standards
+        qSOFA, SIRS, NEWS2 et shock index sont calculés localement (app.utils.clinical_scores),
+        l'IA identifie et calcule uniquement les AUTRES scores pertinents
         """
+        scores_calcules = compute_clinical_scores(data_patient)
 
         prompt_scores = f"""
 Tu es un expert en scores cliniques de médecine d'urgence.
@@ -286,8 +339,11 @@ Tu es un expert en scores cliniques de médecine d'urgence.
 Données patient :
 {json.dumps(data_patient, indent=2, ensure_ascii=False)}
 
-Identifie quels scores cliniques sont pertinents pour ce patient, puis calcule-les.
-Exemples : SOFA, qSOFA, SIRS, CHA2DS2-VASc, CURB-65, etc.
+Scores déjà calculés à partir des constantes et de la biologie (NE PAS les recalculer ni les renvoyer) :
+{self._resumer_scores_calcules(scores_calcules)}
+
+Identifie quels AUTRES scores cliniques sont pertinents pour ce patient, puis calcule-les.
+Exemples : SOFA, CHA2DS2-VASc, CURB-65, Glasgow, etc. (jamais {", ".join(DETERMINISTIC_SCORES)}).
 
 Format JSON :
 {{
@@ -303,19 +359,27 @@ Format JSON :
 }}
 """
 
-        response = self.model.generate_content(
+        response = generate_content(
+            self.model,
             prompt_scores,
+            stage="synthesizer.scores",
             generation_config={"response_mime_type": "application/json"}
         )
 
         scores = json.loads(response.text)
+        scores["applicable_scores"] = merge_scores(scores_calcules, scores.get("applicable_scores", []))
         return scores
 
     def detecter_degradation_silencieuse(self, data_patient: Dict) -> Dict:
         """
         Détecte les tendances inquiétantes dans les signes vitaux
-        L'IA analyse les patterns temporels ELLE-MÊME
+        Pentes et franchissements de seuils calculés localement (trends.py) ;
+        l'IA n'est consultée que si les signaux sont ambigus
         """
+        tendances = analyser_tendances(data_patient)
+        if not tendances["ambigu"]:
+            print("   Trajectoire déterminée par les tendances (sans appel LLM)")
+            return tendances["deterioration"]
 
         prompt_tendance = f"""
 Analyse les tendances cliniques pour détecter une dégradation silencieuse.
@@ -323,6 +387,10 @@ Analyse les tendances cliniques pour détecter une dégradation silencieuse.
 Données patient avec historique temporel :
 {json.dumps(data_patient, indent=2, ensure_ascii=False)}
 
+Signaux déjà calculés (pentes sur fenêtres glissantes, franchissements de seuils) :
+{json.dumps(tendances["signaux"], ensure_ascii=False)}
+Ces signaux sont ambigus : {", ".join(tendances["raisons_ambiguite"])}.
+
 Cherche :
 - Tendances des signes vitaux (FC qui monte, TA qui baisse, etc.)
 - Aggravation progressive des labs (lactate qui monte, créat qui monte)
@@ -340,14 +408,90 @@ Format JSON :
 }}
 """
 
-        response = self.model.generate_content(
+        response = generate_content(
+            self.model,
             prompt_tendance,
+            stage="synthesizer.degradation",
             generation_config={"response_mime_type": "application/json"}
         )
 
         deterioration = json.loads(response.text)
         return deterioration
 
+    def calculer_scores_et_degradation(self, data_patient: Dict) -> Tuple[Dict, Dict]:
+        """
+        Phases 3 + 4 fusionnées : scores cliniques et dégradation silencieuse
+        en un seul appel structuré (les données patient ne sont envoyées qu'une fois)
+        Repli sur les deux appels séparés si la réponse n'est pas exploitable
+        """
+        tendances = analyser_tendances(data_patient)
+        if not tendances["ambigu"]:
+            # Trajectoire déterminée sans le modèle : seul l'appel des scores reste
+            print("   Trajectoire déterminée par les tendances (sans appel LLM)")
+            return self.calculer_scores_cliniques(data_patient), tendances["deterioration"]
+
+        scores_calcules = compute_clinical_scores(data_patient)
+
+        prompt_fusionne = f"""
+Tu es un expert en scores cliniques de médecine d'urgence et en détection de dégradation clinique.
+
+Données patient avec historique temporel :
+{json.dumps(data_patient, indent=2, ensure_ascii=False)}
+
+Scores déjà calculés à partir des constantes et de la biologie (NE PAS les recalculer ni les renvoyer) :
+{self._resumer_scores_calcules(scores_calcules)}
+
+Tâche 1 - Scores cliniques :
+Identifie quels AUTRES scores cliniques sont pertinents pour ce patient, puis calcule-les.
+Exemples : SOFA, CHA2DS2-VASc, CURB-65, Glasgow, etc. (jamais {", ".join(DETERMINISTIC_SCORES)}).
+Pour chaque score : valeur, interprétation clinique, composantes et action suggérée.
+
+Tâche 2 - Dégradation silencieuse :
+Analyse les tendances cliniques pour détecter une dégradation silencieuse.
+Cherche :
+- Tendances des signes vitaux (FC qui monte, TA qui baisse, etc.)
+- Aggravation progressive des labs (lactate qui monte, créat qui monte)
+- Pattern de dégradation multi-organique
+- Signes précoces de choc ou défaillance d'organe
+Indique le pronostic probable si non traité et la fenêtre thérapeutique estimée.
+
+Réponds en JSON avec "applicable_scores" (tâche 1) et "deterioration_analysis" (tâche 2).
+"""
+
+        try:
+            response = generate_content(
+                self.model,
+                prompt_fusionne,
+                stage="synthesizer.scores_degradation",
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": SCHEMA_SCORES_DEGRADATION,
+                }
+            )
+            resultat = json.loads(response.text)
+            scores = {
+                "applicable_scores": merge_scores(scores_calcules, [
+                    {
+                        **score,
+                        # Même format que calculer_scores_cliniques : {"composante": valeur}
+                        "components": {
+                            c["name"]: c["value"] for c in score.get("components", [])
+                        },
+                    }
+                    for score in resultat["applicable_scores"]
+                ])
+            }
+            deterioration = resultat["deterioration_analysis"]
+            if not isinstance(deterioration, dict):
+                raise TypeError("deterioration_analysis n'est pas un objet")
+            return scores, deterioration
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Réponse fusionnée inexploitable ({e}), repli sur deux appels")
+            return (
+                self.calculer_scores_cliniques(data_patient),
+                self.detecter_degradation_silencieuse(data_patient),
+            )
+
     def analyser_patient(self, data_input: Dict) -> Dict:
         """
         Pipeline complet : Normalisation + Synthèse + Critique + Validation
@@ -355,27 +499,39 @@ Format JSON :
         """
         # ÉTAPE 0 : Normalisation de l'input
         print("🔄 Étape 0 : Normalisation du format d'entrée...")
-        data_collecteur = self.normaliser_input(data_input)
+        with phase_span("synthesizer.normalisation"):
+            data_collecteur = self.normaliser_input(data_input)
         print("✅ Format normalisé")
 
         print("\n🔄 Phase 1 : Synthèse Jekyll (Mode Bienveillant)...")
-        synthese = self.phase_synthese(data_collecteur)
+        with phase_span("synthesizer.synthese"):
+            synthese = self.phase_synthese(data_collecteur)
         print(f"✅ Synthèse créée")
         print(f"   Problèmes identifiés : {', '.join(synthese.get('key_problems', []))}")
         print(f"   Sévérité : {synthese.get('severity', 'N/A')}")
 
         print("\n⚠️ Phase 2 : Critique Hyde (Mode Sceptique)...")
-        critique = self.phase_critique(synthese, data_collecteur)
+        with phase_span("synthesizer.critique"):
+            critique = self.phase_critique(synthese, data_collecteur)
         nb_alertes = len(critique.get('critical_alerts', []))
         print(f"🔍 {nb_alertes} alertes critiques détectées")
 
-        print("\n📊 Phase 3 : Calcul des scores cliniques...")
-        scores = self.calculer_scores_cliniques(data_collecteur)
-        print(f"   Scores calculés : {', '.join([s['score_name'] for s in scores.get('applicable_scores', [])])}")
-
-        print("\n📈 Phase 4 : Détection de dégradation silencieuse...")
-        deterioration = self.detecter_degradation_silencieuse(data_collecteur)
-        print(f"   Trajectoire : {deterioration.get('trajectory', 'N/A')}")
+        if self.mode_fusionne:
+            print("\n📊 Phases 3+4 : Scores cliniques et dégradation silencieuse (appel fusionné)...")
+            with phase_span("synthesizer.scores_degradation"):
+                scores, deterioration = self.calculer_scores_et_degradation(data_collecteur)
+            print(f"   Scores calculés : {', '.join([s['score_name'] for s in scores.get('applicable_scores', [])])}")
+            print(f"   Trajectoire : {deterioration.get('trajectory', 'N/A')}")
+        else:
+            print("\n📊 Phase 3 : Calcul des scores cliniques...")
+            with phase_span("synthesizer.scores"):
+                scores = self.calculer_scores_cliniques(data_collecteur)
+            print(f"   Scores calculés : {', '.join([s['score_name'] for s in scores.get('applicable_scores', [])])}")
+
+            print("\n📈 Phase 4 : Détection de dégradation silencieuse...")
+            with phase_span("synthesizer.degradation"):
+                deterioration = self.detecter_degradation_silencieuse(data_collecteur)
+            print(f"   Trajectoire : {deterioration.get('trajectory', 'N/A')}")
 
         # Résultat final combiné
         output = {
@@ -0,0 +1,475 @@
+"""
+Registre des détecteurs de schéma - Agent Synthétiseur
+Normalise les formats d'entrée connus (hospitalier, SAMU, bundle FHIR, clé/valeur plat)
+sans appel au modèle ; pour une structure inconnue, le mapping de champs appris par
+le LLM est mis en cache par empreinte structurelle et réappliqué localement
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Détecteur : (reconnaît le format ?, convertit en {"patient_normalized": ...})
+Detecteur = Tuple[Callable[[Dict], bool], Callable[[Dict], Dict]]
+
+# Demande au LLM un mapping {"chemin.source": "chemin.cible"} (squelette, aperçu des valeurs)
+DemandeMapping = Callable[[Dict, Dict], Dict[str, str]]
+
+# Premiers segments autorisés pour les chemins cibles d'un mapping appris
+CIBLES_NORMALISEES = {
+    "id", "source_type", "age", "sex", "weight", "admission", "vitals_current",
+    "symptoms", "medical_history", "medications_current", "labs", "imaging",
+    "call_transcript", "texte_brut", "autres_donnees",
+}
+
+
+class RegistreSchemas:
+    """
+    Détecteurs de format essayés dans l'ordre d'enregistrement,
+    puis cache des mappings appris par empreinte structurelle
+    """
+
+    def __init__(self, chemin_cache: Optional[str] = None):
+        self.detecteurs: Dict[str, Detecteur] = {}
+        self.chemin_cache = chemin_cache
+        self._mappings: Dict[str, Dict[str, str]] = {}
+        self._verrou = threading.Lock()
+        if chemin_cache and os.path.exists(chemin_cache):
+            try:
+                with open(chemin_cache, encoding="utf-8") as f:
+                    self._mappings = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Cache des mappings illisible ({e}), ignoré")
+
+    def enregistrer(self, nom: str, reconnait: Callable[[Dict], bool]):
+        """Décorateur : enregistre une fonction de conversion pour un format"""
+        def decorateur(convertir: Callable[[Dict], Dict]) -> Callable[[Dict], Dict]:
+            self.detecteurs[nom] = (reconnait, convertir)
+            return convertir
+        return decorateur
+
+    def detecter(self, data: Dict) -> Optional[str]:
+        """Nom du premier détecteur qui reconnaît le format, ou None"""
+        for nom, (reconnait, _) in self.detecteurs.items():
+            if reconnait(data):
+                return nom
+        return None
+
+    def mapping_connu(self, empreinte: str) -> Optional[Dict[str, str]]:
+        with self._verrou:
+            return self._mappings.get(empreinte)
+
+    def memoriser_mapping(self, empreinte: str, mapping: Dict[str, str]) -> None:
+        with self._verrou:
+            self._mappings[empreinte] = mapping
+            if self.chemin_cache:
+                with open(self.chemin_cache, "w", encoding="utf-8") as f:
+                    json.dump(self._mappings, f, indent=2, ensure_ascii=False)
+
+    def normaliser(self, data: Dict, demander_mapping: DemandeMapping) -> Optional[Dict]:
+        """
+        Normalise une entrée
+
+        :param data: Entrée brute
+        :param demander_mapping: Appel LLM utilisé pour une structure jamais vue
+        :return: {"patient_normalized": ...}, ou None si aucun mapping exploitable
+        """
+        nom = self.detecter(data)
+        if nom is not None:
+            return self.detecteurs[nom][1](data)
+
+        empreinte = empreinte_structure(data)
+        mapping = self.mapping_connu(empreinte)
+        if mapping is None:
+            mapping = valider_mapping(demander_mapping(squelette(data), apercu(data)))
+            if not mapping:
+                return None
+            self.memoriser_mapping(empreinte, mapping)
+        return appliquer_mapping(data, mapping, empreinte)
+
+
+def squelette(valeur: Any) -> Any:
+    """Structure d'une valeur : clés imbriquées, listes réduites à un élément, scalaires effacés"""
+    if isinstance(valeur, dict):
+        return {cle: squelette(v) for cle, v in valeur.items()}
+    if isinstance(valeur, list):
+        return [squelette(valeur[0])] if valeur else []
+    return "scalaire"
+
+
+def apercu(valeur: Any, longueur_max: int = 40) -> Any:
+    """Valeurs d'exemple pour le LLM : listes réduites à un élément, textes tronqués"""
+    if isinstance(valeur, dict):
+        return {cle: apercu(v, longueur_max) for cle, v in valeur.items()}
+    if isinstance(valeur, list):
+        return [apercu(valeur[0], longueur_max)] if valeur else []
+    if isinstance(valeur, str) and len(valeur) > longueur_max:
+        return valeur[:longueur_max] + "…"
+    return valeur
+
+
+def empreinte_structure(data: Dict) -> str:
+    """Empreinte stable de la structure (indépendante des valeurs et de l'ordre des clés)"""
+    return hashlib.sha1(
+        json.dumps(squelette(data), sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def lire_chemin(data: Any, chemin: str) -> Any:
+    for segment in chemin.split("."):
+        if not isinstance(data, dict) or segment not in data:
+            return None
+        data = data[segment]
+    return data
+
+
+def ecrire_chemin(data: Dict, chemin: str, valeur: Any) -> None:
+    *parents, feuille = chemin.split(".")
+    for segment in parents:
+        data = data.setdefault(segment, {})
+        if not isinstance(data, dict):
+            return
+    data[feuille] = valeur
+
+
+def valider_mapping(mapping: Any) -> Dict[str, str]:
+    """Ne garde que les paires chemin source → chemin cible normalisé"""
+    if not isinstance(mapping, dict):
+        return {}
+    return {
+        source: cible
+        for source, cible in mapping.items()
+        if isinstance(source, str) and isinstance(cible, str)
+        and cible.split(".")[0] in CIBLES_NORMALISEES
+    }
+
+
+def appliquer_mapping(data: Dict, mapping: Dict[str, str], empreinte: str) -> Dict:
+    """Applique un mapping appris ; les champs non mappés vont dans autres_donnees"""
+    patient: Dict[str, Any] = {"id": "INCONNU", "source_type": f"FORMAT_APPRIS_{empreinte[:8]}"}
+    for source, cible in mapping.items():
+        valeur = lire_chemin(data, source)
+        if valeur is not None:
+            ecrire_chemin(patient, cible, valeur)
+
+    sources = {source.split(".")[0] for source in mapping}
+    autres = {cle: valeur for cle, valeur in data.items() if cle not in sources}
+    if autres:
+        patient.setdefault("autres_donnees", {}).update(autres)
+    return {"patient_normalized": patient}
+
+
+registre = RegistreSchemas(chemin_cache=os.getenv("SCHEMA_MAPPING_CACHE") or None)
+
+
+# ---------------------------------------------------------------------------
+# Format hospitalier (déjà normalisé par l'Agent Collecteur)
+# ---------------------------------------------------------------------------
+
+@registre.enregistrer("hospitalier", lambda data: "patient_normalized" in data)
+def convertir_hospitalier(data: Dict) -> Dict:
+    return data
+
+
+# ---------------------------------------------------------------------------
+# Appels SAMU (input.text + expected_output)
+# ---------------------------------------------------------------------------
+
+@registre.enregistrer("samu", lambda data: "input" in data and "expected_output" in data)
+def convertir_samu(data_samu: Dict) -> Dict:
+    """Convertit le format SAMU en format unifié"""
+    expected = data_samu.get("expected_output", {})
+    meta = data_samu.get("meta", {})
+    appel_text = data_samu.get("input", {}).get("text", "")
+
+    patient_normalized = {
+        "id": data_samu.get("id", "SAMU_UNKNOWN"),
+        "source_type": "SAMU_CALL",
+        "call_transcript": appel_text,
+        "scenario": meta.get("scenario", "Non spécifié"),
+        "age": expected.get("patient_identification", {}).get("age"),
+        "sex": expected.get("patient_identification", {}).get("sex"),
+        "weight": expected.get("patient_identification", {}).get("weight"),
+
+        "admission": {
+            "type": "PREHOSPITAL_EMERGENCY",
+            "chief_complaint": expected.get("incident_description", {}).get("main_reason"),
+            "mechanism": expected.get("incident_description", {}).get("mechanism"),
+            "onset_time": expected.get("incident_description", {}).get("onset_time"),
+            "evolution": expected.get("incident_description", {}).get("evolution"),
+            "date": None
+        },
+
+        "location": expected.get("location", {}),
+
+        "vitals_current": {
+            "consciousness": expected.get("patient_identification", {}).get("consciousness"),
+            "breathing": expected.get("vital_signs", {}).get("breathing"),
+            "pulse": expected.get("vital_signs", {}).get("pulse"),
+            "skin_color": expected.get("vital_signs", {}).get("skin_color"),
+            "sweating": expected.get("vital_signs", {}).get("sweating"),
+            "temperature": expected.get("vital_signs", {}).get("temperature"),
+            "bleeding": expected.get("vital_signs", {}).get("bleeding")
+        },
+
+        "symptoms": expected.get("symptoms", {}),
+
+        "medical_history": {
+            "known_conditions": expected.get("medical_history", {}).get("known_conditions", []),
+            "medications_current": expected.get("medical_history", {}).get("medications"),
+            "anticoagulant_use": expected.get("medical_history", {}).get("anticoagulant_use"),
+            "allergies": expected.get("medical_history", {}).get("allergies"),
+            "recent_hospitalization": expected.get("medical_history", {}).get("recent_hospitalization")
+        },
+
+        "caller_info": expected.get("caller_info", {}),
+
+        "actions_already_taken": expected.get("actions_already_taken", {}),
+
+        "risk_factors": expected.get("risk_factors", {}),
+
+        "environment_context": expected.get("environment_context", {}),
+
+        "instructions_given": expected.get("instructions_given", {})
+    }
+
+    return {"patient_normalized": patient_normalized}
+
+
+# ---------------------------------------------------------------------------
+# Bundle FHIR R4 (Patient, Observation, Condition, Medication*, AllergyIntolerance)
+# ---------------------------------------------------------------------------
+
+# Codes LOINC des signes vitaux
+LOINC_CONSTANTES = {
+    "8867-4": "heart_rate",
+    "8480-6": "systolic_bp",
+    "8462-4": "diastolic_bp",
+    "9279-1": "respiratory_rate",
+    "8310-5": "temperature",
+    "59408-5": "spo2",
+    "2708-6": "spo2",
+}
+
+# Codes LOINC de biologie → itemid MIMIC-III (scores et tendances raisonnent par itemid)
+LOINC_BIOLOGIE = {
+    "2524-7": 50813,   # Lactate
+    "32693-4": 50813,  # Lactate
+    "2160-0": 50912,   # Créatinine
+    "6690-2": 51301,   # Leucocytes
+    "764-1": 51144,    # Formes immatures (bands)
+    "2019-8": 50818,   # PaCO2
+    "777-3": 51265,    # Plaquettes
+    "1975-2": 50885,   # Bilirubine totale
+    "1963-8": 50882,   # Bicarbonates
+}
+
+
+def _est_fhir(data: Dict) -> bool:
+    return data.get("resourceType") == "Bundle" or data.get("resourceType") == "Patient"
+
+
+def _codes(concept: Dict) -> List[str]:
+    return [c.get("code") for c in (concept or {}).get("coding", []) if c.get("code")]
+
+
+def _libelle(concept: Dict) -> Optional[str]:
+    concept = concept or {}
+    if concept.get("text"):
+        return concept["text"]
+    return next((c.get("display") for c in concept.get("coding", []) if c.get("display")), None)
+
+
+def _age(date_naissance: Optional[str]) -> Optional[int]:
+    try:
+        naissance = date.fromisoformat(date_naissance[:10])
+    except (TypeError, ValueError):
+        return None
+    aujourd_hui = date.today()
+    return aujourd_hui.year - naissance.year - (
+        (aujourd_hui.month, aujourd_hui.day) < (naissance.month, naissance.day)
+    )
+
+
+def _mesures_observation(observation: Dict) -> List[Tuple[List[str], Dict, Optional[str]]]:
+    """(codes, valueQuantity, libellé) de l'observation et de ses composantes (ex : panel de TA)"""
+    mesures = []
+    for partie in [observation] + observation.get("component", []):
+        if "valueQuantity" in partie:
+            mesures.append((_codes(partie.get("code")), partie["valueQuantity"], _libelle(partie.get("code"))))
+    return mesures
+
+
+@registre.enregistrer("fhir", _est_fhir)
+def convertir_fhir(bundle: Dict) -> Dict:
+    """Convertit un bundle FHIR R4 (ou une ressource Patient seule) en format unifié"""
+    if bundle.get("resourceType") == "Patient":
+        ressources = [bundle]
+    else:
+        ressources = [e.get("resource", {}) for e in bundle.get("entry", [])]
+
+    patient_normalized: Dict[str, Any] = {
+        "id": "FHIR_UNKNOWN",
+        "source_type": "FHIR_BUNDLE",
+        "age": None,
+        "sex": "inconnu",
+        "admission": {"type": "FHIR", "chief_complaint": None, "date": None},
+        "vitals_current": {},
+        "vitals_history": {},
+        "labs": [],
+        "medications_current": [],
+        "medical_history": {"known_conditions": [], "allergies": []},
+    }
+
+    observations = sorted(
+        (r for r in ressources if r.get("resourceType") == "Observation"),
+        key=lambda r: r.get("effectiveDateTime") or "",
+    )
+    for ressource in ressources:
+        type_ressource = ressource.get("resourceType")
+        if type_ressource == "Patient":
+            patient_normalized["id"] = ressource.get("id", "FHIR_UNKNOWN")
+            patient_normalized["age"] = _age(ressource.get("birthDate"))
+            patient_normalized["sex"] = {"male": "homme", "female": "femme"}.get(
+                ressource.get("gender"), "inconnu"
+            )
+        elif type_ressource == "Condition":
+            libelle = _libelle(ressource.get("code"))
+            if libelle:
+                patient_normalized["medical_history"]["known_conditions"].append(libelle)
+        elif type_ressource in ("MedicationStatement", "MedicationRequest"):
+            libelle = _libelle(ressource.get("medicationCodeableConcept"))
+            if libelle:
+                patient_normalized["medications_current"].append({"drug": libelle})
+        elif type_ressource == "AllergyIntolerance":
+            libelle = _libelle(ressource.get("code"))
+            if libelle:
+                patient_normalized["medical_history"]["allergies"].append(libelle)
+        elif type_ressource == "Encounter":
+            patient_normalized["admission"]["date"] = (ressource.get("period") or {}).get("start")
+            motifs = [_libelle(m) for m in ressource.get("reasonCode", [])]
+            patient_normalized["admission"]["chief_complaint"] = ", ".join(m for m in motifs if m) or None
+
+    for observation in observations:
+        charttime = observation.get("effectiveDateTime")
+        interpretation = [_libelle(i) for i in observation.get("interpretation", [])]
+        for codes, quantite, libelle in _mesures_observation(observation):
+            mesure = {"value": quantite.get("value"), "unit": quantite.get("unit", ""), "charttime": charttime}
+            constante = next((LOINC_CONSTANTES[c] for c in codes if c in LOINC_CONSTANTES), None)
+            if constante:
+                patient_normalized["vitals_current"][constante] = mesure
+                patient_normalized["vitals_history"].setdefault(constante, []).append(mesure)
+                continue
+            patient_normalized["labs"].append({
+                "itemid": next((LOINC_BIOLOGIE[c] for c in codes if c in LOINC_BIOLOGIE), None),
+                "loinc": codes[0] if codes else None,
+                "label": libelle,
+                "charttime": charttime,
+                "value": str(quantite.get("value")),
+                "valuenum": quantite.get("value"),
+                "valueuom": quantite.get("unit"),
+                "flag": ", ".join(i for i in interpretation if i) or None,
+            })
+
+    return {"patient_normalized": patient_normalized}
+
+
+# ---------------------------------------------------------------------------
+# Clé/valeur plat ({"age": 67, "FC": 120, "TA": "90/60", ...})
+# ---------------------------------------------------------------------------
+
+# Alias (minuscules, sans accents ni ponctuation) → champ normalisé
+ALIAS_PLATS = {
+    "id": "id", "patientid": "id", "identifiant": "id",
+    "age": "age",
+    "sex": "sex", "sexe": "sex", "gender": "sex", "genre": "sex",
+    "poids": "weight", "weight": "weight",
+    "motif": "admission.chief_complaint", "motifappel": "admission.chief_complaint",
+    "chiefcomplaint": "admission.chief_complaint", "complaint": "admission.chief_complaint",
+    "fc": "vitals_current.heart_rate", "hr": "vitals_current.heart_rate",
+    "heartrate": "vitals_current.heart_rate", "frequencecardiaque": "vitals_current.heart_rate",
+    "pouls": "vitals_current.heart_rate", "pulse": "vitals_current.heart_rate",
+    "pas": "vitals_current.systolic_bp", "sbp": "vitals_current.systolic_bp",
+    "systolicbp": "vitals_current.systolic_bp", "systolic": "vitals_current.systolic_bp",
+    "pad": "vitals_current.diastolic_bp", "dbp": "vitals_current.diastolic_bp",
+    "diastolicbp": "vitals_current.diastolic_bp", "diastolic": "vitals_current.diastolic_bp",
+    "ta": "tension", "pa": "tension", "tension": "tension", "bloodpressure": "tension",
+    "fr": "vitals_current.respiratory_rate", "rr": "vitals_current.respiratory_rate",
+    "respiratoryrate": "vitals_current.respiratory_rate",
+    "frequencerespiratoire": "vitals_current.respiratory_rate",
+    "spo2": "vitals_current.spo2", "saturation": "vitals_current.spo2", "sat": "vitals_current.spo2",
+    "temperature": "vitals_current.temperature", "temp": "vitals_current.temperature",
+    "gcs": "vitals_current.gcs", "glasgow": "vitals_current.gcs",
+    "conscience": "vitals_current.consciousness", "consciousness": "vitals_current.consciousness",
+    "antecedents": "medical_history.known_conditions", "history": "medical_history.known_conditions",
+    "traitements": "medications_current", "medications": "medications_current",
+    "allergies": "medical_history.allergies",
+}
+
+
+def _cle_alias(cle: str) -> str:
+    sans_accents = unicodedata.normalize("NFKD", str(cle)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", sans_accents.lower())
+
+
+def _est_plat(data: Dict) -> bool:
+    scalaires = all(not isinstance(v, (dict, list)) for v in data.values())
+    return bool(data) and scalaires and any(_cle_alias(cle) in ALIAS_PLATS for cle in data)
+
+
+def _tension(valeur: Any) -> Dict[str, Dict]:
+    """
+    Constantes systolique/diastolique d'une tension "PAS/PAD"
+
+    Une tension notée en cmHg ("12/8", usage courant en France) est convertie en
+    mmHg : une systolique inférieure à 30 n'est pas plausible en mmHg.
+    """
+    systolique, _, diastolique = str(valeur).partition("/")
+    constantes = {"systolic_bp": {"value": systolique.strip()}}
+    if diastolique:
+        constantes["diastolic_bp"] = {"value": diastolique.strip()}
+    try:
+        pas, pad = (float(v.strip().replace(",", ".")) for v in (systolique, diastolique))
+    except ValueError:
+        return constantes
+    if 0 < pad < pas < 30:
+        constantes = {
+            "systolic_bp": {"value": round(pas * 10), "unit": "mmHg"},
+            "diastolic_bp": {"value": round(pad * 10), "unit": "mmHg"},
+        }
+    return constantes
+
+
+@registre.enregistrer("plat", _est_plat)
+def convertir_plat(data: Dict) -> Dict:
+    """Convertit un dictionnaire clé/valeur plat (alias FR/EN des champs courants)"""
+    patient: Dict[str, Any] = {
+        "id": "FLAT_UNKNOWN",
+        "source_type": "FLAT_KEY_VALUE",
+        "admission": {"type": "INCONNU", "chief_complaint": None, "date": None},
+        "vitals_current": {},
+        "medical_history": {},
+    }
+    autres = {}
+    for cle, valeur in data.items():
+        cible = ALIAS_PLATS.get(_cle_alias(cle))
+        if cible is None:
+            autres[cle] = valeur
+        elif cible == "tension":
+            patient["vitals_current"].update(_tension(valeur))
+        elif cible == "sex":
+            patient["sex"] = {"m": "homme", "h": "homme", "male": "homme", "homme": "homme",
+                              "f": "femme", "female": "femme", "femme": "femme"}.get(
+                _cle_alias(valeur), "inconnu")
+        elif cible.startswith("vitals_current."):
+            ecrire_chemin(patient, cible, {"value": valeur})
+        else:
+            ecrire_chemin(patient, cible, valeur)
+    if autres:
+        patient["autres_donnees"] = autres
+    return {"patient_normalized": patient}
@@ -0,0 +1,258 @@
+"""
+Détection de tendances - Agent Synthétiseur
+Pentes sur fenêtres glissantes et franchissements de seuils, calculés avec NumPy
+sur les séries temporelles des constantes (CHARTEVENTS) et de la biologie (LABEVENTS)
+
+Produit les champs de `detecter_degradation_silencieuse` et de `DeteriorationAnalysis`
+sans appel au modèle ; le LLM n'est consulté que si les signaux sont ambigus
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.utils.clinical_scores import temperature_celsius
+
+# Règles par série : sens d'aggravation (+1 hausse, -1 baisse), seuils anormal/critique
+# et pentes (par heure) d'aggravation lente/rapide
+REGLES_CONSTANTES = {
+    "heart_rate": {"label": "FC", "unite": "bpm", "sens": 1, "anormal": 100, "critique": 130, "pente_lente": 3, "pente_rapide": 8},
+    "systolic_bp": {"label": "PAS", "unite": "mmHg", "sens": -1, "anormal": 100, "critique": 90, "pente_lente": 3, "pente_rapide": 8},
+    "respiratory_rate": {"label": "FR", "unite": "/min", "sens": 1, "anormal": 22, "critique": 30, "pente_lente": 1, "pente_rapide": 3},
+    "spo2": {"label": "SpO2", "unite": "%", "sens": -1, "anormal": 94, "critique": 90, "pente_lente": 0.5, "pente_rapide": 1.5},
+    "temperature": {"label": "Température", "unite": "°C", "sens": 1, "anormal": 38, "critique": 39.5, "pente_lente": 0.1, "pente_rapide": 0.3},
+}
+
+# Itemids MIMIC-III LABEVENTS
+REGLES_BIOLOGIE = {
+    50813: {"label": "Lactate", "unite": "mmol/L", "sens": 1, "anormal": 2, "critique": 4, "pente_lente": 0.1, "pente_rapide": 0.5},
+    50912: {"label": "Créatinine", "unite": "mg/dL", "sens": 1, "anormal": 1.5, "critique": 3.5, "pente_lente": 0.02, "pente_rapide": 0.1},
+    51300: {"label": "Leucocytes", "unite": "G/L", "sens": 1, "anormal": 12, "critique": 20, "pente_lente": 0.1, "pente_rapide": 0.5},
+    51301: {"label": "Leucocytes", "unite": "G/L", "sens": 1, "anormal": 12, "critique": 20, "pente_lente": 0.1, "pente_rapide": 0.5},
+    51265: {"label": "Plaquettes", "unite": "G/L", "sens": -1, "anormal": 150, "critique": 50, "pente_lente": 1, "pente_rapide": 5},
+    50885: {"label": "Bilirubine", "unite": "mg/dL", "sens": 1, "anormal": 2, "critique": 6, "pente_lente": 0.02, "pente_rapide": 0.1},
+    50882: {"label": "Bicarbonates", "unite": "mmol/L", "sens": -1, "anormal": 22, "critique": 15, "pente_lente": 0.1, "pente_rapide": 0.5},
+}
+
+# Fenêtres glissantes (heures)
+FENETRE_CONSTANTES_H = 6.0
+FENETRE_BIOLOGIE_H = 24.0
+
+
+def pentes_glissantes(t: np.ndarray, v: np.ndarray, fenetre: float) -> np.ndarray:
+    """
+    Pente des moindres carrés sur la fenêtre [t_i - fenetre, t_i], pour chaque point i
+    Sommes cumulées : O(n) quel que soit le nombre de points par fenêtre
+
+    :param t: Temps en heures (croissants)
+    :param v: Valeurs
+    :param fenetre: Largeur de la fenêtre en heures
+    :return: Pentes par heure (NaN si moins de 2 points distincts dans la fenêtre)
+    """
+    debut = np.searchsorted(t, t - fenetre, side="left")
+    fin = np.arange(1, len(t) + 1)
+
+    def somme(x: np.ndarray) -> np.ndarray:
+        cumul = np.concatenate(([0.0], np.cumsum(x)))
+        return cumul[fin] - cumul[debut]
+
+    n = fin - debut
+    st, sv, stt, stv = somme(t), somme(v), somme(t * t), somme(t * v)
+    denominateur = n * stt - st ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominateur > 1e-9, (n * stv - st * sv) / denominateur, np.nan)
+
+
+def franchissements(v: np.ndarray, seuil: float, sens: int) -> np.ndarray:
+    """Indices où la série franchit le seuil dans le sens de l'aggravation"""
+    au_dela = sens * v >= sens * seuil
+    return np.flatnonzero(~au_dela[:-1] & au_dela[1:]) + 1
+
+
+def _serie(points: List[Dict], valeur=None) -> Optional[tuple]:
+    """(temps en heures depuis le 1er point, valeurs) triés par temps, ou None"""
+    paires = []
+    for point in points:
+        v = valeur(point) if valeur else point.get("value")
+        try:
+            paires.append((np.datetime64(str(point["charttime"]).replace(" ", "T"), "s"), float(v)))
+        except (KeyError, TypeError, ValueError):
+            continue
+    paires = [(t, v) for t, v in paires if not np.isnan(v)]
+    if not paires:
+        return None
+    paires.sort(key=lambda p: p[0])
+    temps = np.array([p[0] for p in paires])
+    t = (temps - temps[0]).astype("timedelta64[s]").astype(float) / 3600
+    return t, np.array([p[1] for p in paires], dtype=float)
+
+
+def _series_patient(patient: Dict[str, Any]) -> List[tuple]:
+    """(règle, t, v) pour chaque série connue du patient"""
+    series = []
+    historique = patient.get("vitals_history") or {}
+    for nom, regle in REGLES_CONSTANTES.items():
+        valeur = temperature_celsius if nom == "temperature" else None
+        serie = _serie(historique.get(nom) or [], valeur)
+        if serie is None and isinstance(patient.get("vitals_current", {}).get(nom), dict):
+            # Pas d'historique : la valeur courante seule
+            serie = _serie([patient["vitals_current"][nom]], valeur)
+        if serie is not None:
+            series.append(({**regle, "fenetre": FENETRE_CONSTANTES_H}, *serie))
+
+    labs_par_item: Dict[int, List[Dict]] = {}
+    for lab in patient.get("labs") or []:
+        if lab.get("itemid") in REGLES_BIOLOGIE:
+            labs_par_item.setdefault(lab["itemid"], []).append(lab)
+    for itemid, labs in labs_par_item.items():
+        serie = _serie(labs, lambda lab: lab.get("valuenum"))
+        if serie is not None:
+            series.append(({**REGLES_BIOLOGIE[itemid], "fenetre": FENETRE_BIOLOGIE_H}, *serie))
+    return series
+
+
+def analyser_serie(regle: Dict, t: np.ndarray, v: np.ndarray) -> Dict[str, Any]:
+    """
+    Statut d'une série : AGGRAVATION_RAPIDE, AGGRAVATION_LENTE, AMELIORATION, STABLE
+    ou INSUFFISANT (un seul point), et niveau de la dernière valeur
+    """
+    sens = regle["sens"]
+    derniere = v[-1]
+    niveau = (
+        "CRITIQUE" if sens * derniere >= sens * regle["critique"]
+        else "ANORMAL" if sens * derniere >= sens * regle["anormal"]
+        else "NORMAL"
+    )
+    signal = {
+        "label": regle["label"],
+        "unite": regle["unite"],
+        "derniere_valeur": round(float(derniere), 2),
+        "niveau": niveau,
+        "points": len(v),
+        "statut": "INSUFFISANT",
+        "pente_par_heure": None,
+        "franchissements": [],
+    }
+    if len(v) < 2:
+        return signal
+
+    pentes = pentes_glissantes(t, v, regle["fenetre"])
+    pente = pentes[-1]
+    if np.isnan(pente):
+        # Derniers points trop espacés pour la fenêtre : pente sur toute la série
+        pente = pentes_glissantes(t, v, np.inf)[-1]
+    dans_fenetre = t >= t[-1] - regle["fenetre"]
+    croisements = [
+        niveau_seuil
+        for niveau_seuil in ("critique", "anormal")
+        if any(dans_fenetre[i] for i in franchissements(v, regle[niveau_seuil], sens))
+    ]
+    aggravation = sens * pente if not np.isnan(pente) else 0.0
+
+    if aggravation >= regle["pente_rapide"] or "critique" in croisements:
+        statut = "AGGRAVATION_RAPIDE"
+    elif aggravation >= regle["pente_lente"] or "anormal" in croisements:
+        statut = "AGGRAVATION_LENTE"
+    elif aggravation <= -regle["pente_lente"]:
+        statut = "AMELIORATION"
+    else:
+        statut = "STABLE"
+
+    signal.update({
+        "statut": statut,
+        "pente_par_heure": None if np.isnan(pente) else round(float(pente), 3),
+        "premiere_valeur": round(float(v[0]), 2),
+        "duree_h": round(float(t[-1] - t[0]), 1),
+        "franchissements": croisements,
+    })
+    return signal
+
+
+def _preuve(signal: Dict) -> str:
+    if signal["statut"] == "INSUFFISANT":
+        return f"{signal['label']} {signal['derniere_valeur']} {signal['unite']} ({signal['niveau'].lower()}, mesure isolée)"
+    texte = (
+        f"{signal['label']} : {signal['premiere_valeur']} → {signal['derniere_valeur']} {signal['unite']} "
+        f"en {signal['duree_h']} h"
+    )
+    if signal["pente_par_heure"] is not None:
+        texte += f" ({signal['pente_par_heure']:+g}/h)"
+    if signal["franchissements"]:
+        texte += f", franchissement du seuil {' et '.join(signal['franchissements'])}"
+    return texte
+
+
+def analyser_tendances(data_patient: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Analyse des tendances d'un patient
+
+    :param data_patient: Format normalisé ({"patient_normalized": ...} ou le patient lui-même)
+    :return: {"deterioration": champs de dégradation, "signaux": [...],
+              "ambigu": bool, "raisons_ambiguite": [...]}
+    """
+    patient = data_patient.get("patient_normalized", data_patient)
+    signaux = [analyser_serie(regle, t, v) for regle, t, v in _series_patient(patient)]
+
+    rapides = [s for s in signaux if s["statut"] == "AGGRAVATION_RAPIDE"]
+    lents = [s for s in signaux if s["statut"] == "AGGRAVATION_LENTE"]
+    ameliorations = [s for s in signaux if s["statut"] == "AMELIORATION"]
+    critiques = [s for s in signaux if s["niveau"] == "CRITIQUE"]
+    anormaux = [s for s in signaux if s["niveau"] != "NORMAL"]
+
+    if rapides or len(lents) >= 2:
+        trajectoire = "RAPID_DETERIORATION"
+    elif lents:
+        trajectoire = "SLOW_DETERIORATION"
+    else:
+        trajectoire = "STABLE"
+
+    if trajectoire == "RAPID_DETERIORATION" or critiques:
+        severite = "HIGH"
+    elif trajectoire == "SLOW_DETERIORATION" or anormaux:
+        severite = "MEDIUM"
+    else:
+        severite = "LOW"
+    niveau_risque = (
+        "CRITICAL" if trajectoire == "RAPID_DETERIORATION" and critiques else severite
+    )
+
+    raisons = []
+    if not any(s["statut"] != "INSUFFISANT" for s in signaux):
+        raisons.append("aucune série temporelle exploitable")
+    if (rapides or lents) and ameliorations and trajectoire != "RAPID_DETERIORATION":
+        raisons.append("signaux contradictoires (aggravation et amélioration)")
+    if len(lents) == 1 and not rapides and lents[0]["niveau"] == "NORMAL" and not anormaux:
+        raisons.append("aggravation isolée sans valeur anormale")
+
+    aggravations = rapides + lents
+    fenetre = {
+        "RAPID_DETERIORATION": "Quelques heures (< 6 h)",
+        "SLOW_DETERIORATION": "12 à 48 h",
+        "STABLE": None,
+    }[trajectoire]
+    preuves = [_preuve(s) for s in aggravations + [s for s in anormaux if s not in aggravations]]
+
+    deterioration = {
+        "silent_deterioration_detected": trajectoire != "STABLE",
+        "severity": severite,
+        "trajectory": trajectoire,
+        "evidence": preuves,
+        "predicted_outcome": (
+            f"Poursuite de l'aggravation ({', '.join(s['label'] for s in aggravations)})"
+            if aggravations else "Pas de dégradation attendue à court terme"
+        ),
+        "time_window": fenetre,
+        # Champs DeteriorationAnalysis
+        "risk_level": niveau_risque,
+        "warning_signs": [
+            f"{s['label']} en aggravation {'rapide' if s in rapides else 'lente'}" for s in aggravations
+        ] + [f"{s['label']} critique" for s in critiques if s not in aggravations],
+        "predicted_timeline": fenetre,
+        "method": "tendances",
+    }
+    return {
+        "deterioration": deterioration,
+        "signaux": signaux,
+        "ambigu": bool(raisons),
+        "raisons_ambiguite": raisons,
+    }
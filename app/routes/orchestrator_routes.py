@@ -1,26 +1,40 @@
 # backend/app/routes/orchestrator_routes.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import time
 import logging
 import sys
 import os
+import threading
 
 # Ajouter le chemin racine pour importer les agents
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
-from app.agents.orchestrator.agent import OrchestrateurADN
-
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["orchestrator"])
 
-# Initialiser l'orchestrateur (une seule fois au démarrage)
 PROJECT_ID = os.getenv("GCP_PROJECT_ID", "ai-diagnostic-navigator-475316")
-orchestrateur = OrchestrateurADN(project_id=PROJECT_ID)
+
+# L'orchestrateur (et ses 3 agents) est créé au premier besoin, ou par le
+# préchauffage du serveur : l'import de ce module reste léger
+_orchestrateur = None
+_orchestrateur_lock = threading.Lock()
+
+
+def get_orchestrateur():
+    """Retourne l'orchestrateur partagé, créé une seule fois"""
+    global _orchestrateur
+    if _orchestrateur is None:
+        with _orchestrateur_lock:
+            if _orchestrateur is None:
+                from app.agents.orchestrator.agent import OrchestrateurADN
+                _orchestrateur = OrchestrateurADN(project_id=PROJECT_ID)
+    return _orchestrateur
 
 
 class AnalyzeRequest(BaseModel):
@@ -55,39 +69,9 @@ async def analyze(req: AnalyzeRequest):
     logger.info(f"Analyse orchestrée - Patient: {req.patient_id}, Query length: {len(req.query)}")
 
     try:
-        # Déterminer le mode (MIMIC-III ou texte médical)
-        if req.patient_id and req.patient_id.isdigit():
-            # Mode MIMIC-III
-            subject_id = int(req.patient_id)
-            resultat = orchestrateur.analyser_patient(subject_id)
-            analysis_id = f"mimic_{subject_id}_{int(time.time())}"
-        else:
-            # Mode texte médical
-            from agents.collector.agent import AgentCollecteur
-            from agents.synthesizer.agent import AgentSynthetiseur
-            from agents.expert.agent import AgentExpert
-            
-            agent1 = AgentCollecteur()
-            agent2 = AgentSynthetiseur(project_id=PROJECT_ID)
-            agent3 = AgentExpert(project_id=PROJECT_ID)
-            
-            # Étape 1 : Collecte depuis texte
-            data_collectee = agent1.collecter_donnees_patient(texte_medical=req.query)
-            
-            # Étape 2 : Synthèse + Critique
-            resultat_synthese = agent2.analyser_patient(data_collectee)
-            
-            # Étape 3 : Expertise
-            resultat_expert = agent3.analyser_alertes(resultat_synthese)
-            
-            resultat = {
-                "patient_id": "TEXT_INPUT",
-                "agent1_collecteur": data_collectee,
-                "agent2_synthetiseur": resultat_synthese,
-                "agent3_expert": resultat_expert,
-                "status": "success"
-            }
-            analysis_id = f"text_{int(time.time())}"
+        # Les agents sont synchrones (et attendent leur admission LLM en bloquant) :
+        # ils tournent dans un thread pour ne jamais bloquer la boucle d'événements
+        resultat, analysis_id = await asyncio.to_thread(_executer_analyse, req)
         
         # Formater la réponse pour le frontend
         response = _formater_pour_frontend(resultat)
@@ -105,6 +89,43 @@ async def analyze(req: AnalyzeRequest):
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
 
+def _executer_analyse(req: AnalyzeRequest) -> Tuple[Dict, str]:
+    """Exécute l'analyse (appels bloquants) et retourne (résultat, analysis_id)"""
+    # Déterminer le mode (MIMIC-III ou texte médical)
+    if req.patient_id and req.patient_id.isdigit():
+        # Mode MIMIC-III
+        subject_id = int(req.patient_id)
+        resultat = get_orchestrateur().analyser_patient(subject_id)
+        return resultat, f"mimic_{subject_id}_{int(time.time())}"
+    
+    # Mode texte médical
+    from agents.collector.agent import AgentCollecteur
+    from agents.synthesizer.agent import AgentSynthetiseur
+    from agents.expert.agent import AgentExpert
+    
+    agent1 = AgentCollecteur()
+    agent2 = AgentSynthetiseur(project_id=PROJECT_ID)
+    agent3 = AgentExpert(project_id=PROJECT_ID)
+    
+    # Étape 1 : Collecte depuis texte
+    data_collectee = agent1.collecter_donnees_patient(texte_medical=req.query)
+    
+    # Étape 2 : Synthèse + Critique
+    resultat_synthese = agent2.analyser_patient(data_collectee)
+    
+    # Étape 3 : Expertise
+    resultat_expert = agent3.analyser_alertes(resultat_synthese)
+    
+    resultat = {
+        "patient_id": "TEXT_INPUT",
+        "agent1_collecteur": data_collectee,
+        "agent2_synthetiseur": resultat_synthese,
+        "agent3_expert": resultat_expert,
+        "status": "success"
+    }
+    return resultat, f"text_{int(time.time())}"
+
+
 def _formater_pour_frontend(resultat: Dict) -> Dict:
     """Convertit le format agent → format frontend"""
     
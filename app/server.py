@@ -1,49 +1,180 @@
 import os
+import re
 import json
 import uuid
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from functools import lru_cache
 
-import google.auth
 from fastapi import FastAPI, Body, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from google.adk.cli.fast_api import get_fast_api_app
-from google.cloud import logging as google_cloud_logging
-from opentelemetry import trace
+from opentelemetry import metrics, trace
+from opentelemetry.sdk.metrics import MeterProvider
 from opentelemetry.sdk.trace import TracerProvider, export
 
-from app.utils.gcs import create_bucket_if_not_exists
-from app.utils.tracing import CloudTraceLoggingSpanExporter
+from app.utils.llm import model_latency_stats
+from app.utils.sessions import (
+    SessionJanitor,
+    SessionStateReader,
+    get_session_db_kwargs,
+    get_session_service_uri,
+)
+from app.utils.sse import iter_asgi_sse_events
 from app.utils.typing import Feedback, StartSessionRequest, SendMessageRequest, GetStateRequest
 from app.routes import orchestrator_routes
 
-_, project_id = google.auth.default()
-logging_client = google_cloud_logging.Client()
-logger = logging_client.logger(__name__)
+# lazy (default): GCP clients, bucket check, exporters and the orchestrator are
+# initialized in the background after startup; eager: before serving requests
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy").strip().lower()
+
 allow_origins = (
     os.getenv("ALLOW_ORIGINS", "").split(",") if os.getenv("ALLOW_ORIGINS") else None
 )
 
-bucket_name = f"gs://{project_id}-adn-app-logs"
-create_bucket_if_not_exists(
-    bucket_name=bucket_name, project=project_id, location="europe-west1"
-)
 
+@lru_cache(maxsize=1)
+def get_project_id() -> str:
+    """Return the GCP project: from the environment on Cloud Run, else through ADC (on first use)."""
+    project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
+    if not project_id:
+        import google.auth
+
+        project_id = google.auth.default()[1]
+    return project_id
+
+
+def get_bucket_name() -> str:
+    """Return the logs and artifacts bucket of the project."""
+    return f"gs://{get_project_id()}-adn-app-logs"
+
+
+# The artifact service is created with the app: the bucket is used when the project
+# is set in the environment (Cloud Run); an ADC lookup would block the import, so
+# local runs without GOOGLE_CLOUD_PROJECT keep artifacts in memory
+artifact_service_uri = get_bucket_name() if os.getenv("GOOGLE_CLOUD_PROJECT") else None
+
+# Spans are recorded from the start; exporters are attached by setup_telemetry()
 provider = TracerProvider()
-processor = export.BatchSpanProcessor(CloudTraceLoggingSpanExporter())
-provider.add_span_processor(processor)
 trace.set_tracer_provider(provider)
 
+
+@lru_cache(maxsize=1)
+def get_cloud_logger():
+    """Return the Cloud Logging logger, creating the client on first use."""
+    from google.cloud import logging as google_cloud_logging
+
+    return google_cloud_logging.Client(project=get_project_id()).logger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _request_logger():
+    """Cloud Logging logger for request events, or None when it cannot be created."""
+    try:
+        return get_cloud_logger()
+    except Exception as e:
+        logging.warning(f"Cloud Logging unavailable, logging locally: {e}")
+        return None
+
+
+def log_struct(payload: dict, severity: str = "INFO") -> None:
+    """
+    Log a structured request event to Cloud Logging, falling back to the
+    standard logging module. Logging never fails the request.
+    """
+    cloud_logger = _request_logger()
+    if cloud_logger is not None:
+        try:
+            cloud_logger.log_struct(payload, severity=severity)
+            return
+        except Exception as e:
+            logging.warning(f"Cloud Logging write failed: {e}")
+    level = logging.getLevelName(severity)
+    logging.log(level if isinstance(level, int) else logging.INFO, json.dumps(payload, default=str))
+
+
+def setup_telemetry() -> None:
+    """Attach the exporters selected through TRACE_EXPORTER (cloud, otlp, jsonl, none)."""
+    from app.utils.tracing import create_metric_reader, create_span_exporter
+
+    span_exporter = create_span_exporter()
+    if span_exporter is not None:
+        provider.add_span_processor(export.BatchSpanProcessor(span_exporter))
+
+    # Pipeline stage durations and LLM token counts (app.utils.telemetry)
+    metric_reader = create_metric_reader(project_id=get_project_id())
+    metrics.set_meter_provider(
+        MeterProvider(metric_readers=[metric_reader] if metric_reader else [])
+    )
+
+
+def initialize_services() -> None:
+    """
+    Create the GCP clients and warm up the agents (blocking calls).
+
+    Run in a worker thread by the lifespan, so that in lazy mode the server
+    accepts requests (health checks, ADK endpoints) while this completes.
+    """
+    from app.utils.gcs import create_bucket_if_not_exists
+
+    steps = [
+        ("telemetry", setup_telemetry),
+        ("cloud logging", get_cloud_logger),
+        (
+            "bucket",
+            lambda: create_bucket_if_not_exists(
+                bucket_name=get_bucket_name(), project=get_project_id(), location="europe-west1"
+            ),
+        ),
+        ("orchestrator", orchestrator_routes.get_orchestrateur),
+    ]
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            logging.warning(f"Startup step '{name}' failed: {e}")
+    logging.info(f"Services initialized ({STARTUP_MODE} startup)")
+
+
 # AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents")
 print(f"Agent directory: {AGENT_DIR}")
-session_service_uri = None
+# Sessions are kept in memory unless SESSION_SERVICE_URI points to a database
+session_service_uri = get_session_service_uri()
+# Projected reads of the session store (state keys, metadata) without loading events
+session_reader = SessionStateReader(session_service_uri) if session_service_uri else None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Initialize the GCP services (in the background unless STARTUP_MODE=eager) and
+    run the session store maintenance (TTL expiry, compaction).
+    """
+    tasks = []
+    if STARTUP_MODE == "eager":
+        await asyncio.to_thread(initialize_services)
+    else:
+        tasks.append(asyncio.create_task(asyncio.to_thread(initialize_services)))
+    if session_service_uri:
+        janitor = SessionJanitor.from_env(session_service_uri, engine=session_reader.engine)
+        tasks.append(asyncio.create_task(janitor.run_forever()))
+    yield
+    for task in tasks:
+        task.cancel()
+
 
 # Create Google ADK app
 app: FastAPI = get_fast_api_app(
     agents_dir=AGENT_DIR,
     web=True,
-    artifact_service_uri=bucket_name,
+    artifact_service_uri=artifact_service_uri,
     allow_origins=allow_origins,
     session_service_uri=session_service_uri,
+    session_db_kwargs=get_session_db_kwargs(session_service_uri) if session_service_uri else None,
+    lifespan=lifespan,
 )
 app.title = "Clinical Agent API"
 app.description = "API for interacting with the Clinical Agent (Google ADK + Custom Endpoints)."
@@ -138,7 +269,7 @@ async def start_session(req: StartSessionRequest = Body(...)):
 
         data = response.json()
 
-        logger.log_struct({
+        log_struct({
             "event": "session_created",
             "user_id": user_id,
             "session_id": data.get("id", session_id)
@@ -160,6 +291,65 @@ async def start_session(req: StartSessionRequest = Body(...)):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+def _clean_agent_text(text: str) -> str:
+    """Strip null bytes and ANSI codes from an agent text."""
+    text = re.sub(r'\x00', '', text)  # Null bytes
+    text = re.sub(r'\x1b\[[0-9;]*m', '', text)  # ANSI codes
+    return text.strip()
+
+
+def _event_text(event: dict) -> str | None:
+    """Return the concatenated text parts of an ADK event (thoughts excluded), if any."""
+    parts = (event.get("content") or {}).get("parts") or []
+    texts = [part["text"] for part in parts if part.get("text") and not part.get("thought")]
+    return "".join(texts) if texts else None
+
+
+def _to_client_events(event: dict) -> list[dict]:
+    """Convert an ADK event into the lightweight events relayed to the client."""
+    if "error" in event:
+        return [{"type": "error", "detail": event["error"]}]
+
+    client_events = []
+    for part in (event.get("content") or {}).get("parts") or []:
+        if part.get("functionCall"):
+            call = part["functionCall"]
+            client_events.append({
+                "type": "tool_call",
+                "author": event.get("author"),
+                "name": call.get("name"),
+                "args": call.get("args", {}),
+            })
+        elif part.get("functionResponse"):
+            result = part["functionResponse"]
+            client_events.append({
+                "type": "tool_result",
+                "author": event.get("author"),
+                "name": result.get("name"),
+                "response": result.get("response"),
+            })
+        elif part.get("text") and not part.get("thought"):
+            client_events.append({
+                "type": "token" if event.get("partial") else "message",
+                "author": event.get("author"),
+                "text": part["text"],
+            })
+    return client_events
+
+
+def _run_sse_payload(app_name: str, user_id: str, session_id: str, query: str, streaming: bool) -> dict:
+    return {
+        "app_name": app_name,
+        "user_id": user_id,
+        "session_id": session_id,
+        "new_message": {
+            "role": "user",
+            "parts": [{"text": query}]
+        },
+        "streaming": streaming,
+    }
+
+
 @app.post("/send_message")
 async def send_message(req: SendMessageRequest = Body(...)):
     """
@@ -172,81 +362,43 @@ async def send_message(req: SendMessageRequest = Body(...)):
     print(f"Message from {user_id}/{session_id}: {req.query}")
 
     try:
-        from fastapi.testclient import TestClient
-        client = TestClient(app)
-        
         # Ensure session exists
         ensure_session_exists_internal(app_name, user_id, session_id)
 
-        # Send message via /run_sse endpoint
-        payload = {
-            "app_name": app_name,
-            "user_id": user_id,
-            "session_id": session_id,
-            "new_message": {
-                "role": "user",
-                "parts": [{"text": req.query}]
-            },
-            "streaming": False,
-        }
-
-        response = client.post("/run_sse", json=payload)
-
-        if response.status_code >= 400:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Agent error: {response.text[:500]}"
-            )
+        # Consume /run_sse incrementally, keeping only the last text part
+        payload = _run_sse_payload(app_name, user_id, session_id, req.query, streaming=False)
+        events_count = 0
+        agent_response = None
+        async for event in iter_asgi_sse_events(app, "/run_sse", payload):
+            events_count += 1
+            if "error" in event:
+                raise HTTPException(status_code=500, detail=f"Agent error: {event['error']}")
+            agent_response = _event_text(event) or agent_response
 
-        # Parse SSE response
-        events = []
-        for line in response.text.split('\n'):
-            if line.startswith('data: '):
-                try:
-                    data_str = line[6:]  # Remove "data: "
-                    event_json = json.loads(data_str)
-                    events.append(event_json)
-                except json.JSONDecodeError:
-                    continue
-
-        if not events:
+        if not events_count:
             raise HTTPException(
                 status_code=500,
                 detail="No SSE events received"
             )
 
-        print(f"{len(events)} events received")
+        print(f"{events_count} events received")
 
-        # Extract text from response
-        agent_response = None
-        for event in reversed(events):
-            if "content" in event and "parts" in event["content"]:
-                for part in event["content"]["parts"]:
-                    if "text" in part:
-                        agent_response = part["text"]
-                        break
-                if agent_response:
-                    break
-        
         # Clean the response
         if agent_response:
-            import re
-            agent_response = re.sub(r'\x00', '', agent_response)  # Null bytes
-            agent_response = re.sub(r'\x1b\[[0-9;]*m', '', agent_response)  # ANSI codes
-            agent_response = agent_response.strip()
+            agent_response = _clean_agent_text(agent_response)
 
-        logger.log_struct({
+        log_struct({
             "event": "message_sent",
             "user_id": user_id,
             "session_id": session_id,
             "query": req.query,
-            "events_count": len(events)
+            "events_count": events_count
         }, severity="INFO")
 
         return {
             "success": True,
             "response": agent_response,
-            "events_count": len(events),
+            "events_count": events_count,
             "session_id": session_id,
             "user_id": user_id,
         }
@@ -258,10 +410,111 @@ async def send_message(req: SendMessageRequest = Body(...)):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+@app.post("/send_message_stream")
+async def send_message_stream(req: SendMessageRequest = Body(...)):
+    """
+    Send a message to the agent and relay its events as Server-Sent Events.
+
+    Partial model tokens ("token"), complete messages ("message"), tool calls
+    ("tool_call") and tool results ("tool_result") are forwarded as soon as the
+    agent produces them, followed by a final "done" event.
+    """
+    user_id = req.user_id or "user_backend"
+    session_id = req.session_id or "session_api"
+    app_name = APP_NAME
+
+    print(f"Streaming message from {user_id}/{session_id}: {req.query}")
+
+    ensure_session_exists_internal(app_name, user_id, session_id)
+    payload = _run_sse_payload(app_name, user_id, session_id, req.query, streaming=True)
+
+    async def event_stream():
+        events_count = 0
+        agent_response = None
+        try:
+            async for event in iter_asgi_sse_events(app, "/run_sse", payload):
+                events_count += 1
+                if not event.get("partial"):
+                    agent_response = _event_text(event) or agent_response
+                for client_event in _to_client_events(event):
+                    yield f"data: {json.dumps(client_event, ensure_ascii=False)}\n\n"
+        except HTTPException as e:
+            yield f"data: {json.dumps({'type': 'error', 'detail': e.detail})}\n\n"
+            return
+        except Exception as e:
+            print(f"Error in send_message_stream: {str(e)}")
+            yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+            return
+
+        done = {
+            "type": "done",
+            "response": _clean_agent_text(agent_response) if agent_response else None,
+            "events_count": events_count,
+            "session_id": session_id,
+            "user_id": user_id,
+        }
+        yield f"data: {json.dumps(done, ensure_ascii=False)}\n\n"
+
+        log_struct({
+            "event": "message_streamed",
+            "user_id": user_id,
+            "session_id": session_id,
+            "query": req.query,
+            "events_count": events_count
+        }, severity="INFO")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+AGENT_OUTPUT_KEYS = ["donnees_patient", "synthese_clinique", "validation_expert"]
+
+
+async def read_session_projection(
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    fields: list[str] | None = None,
+    with_events_count: bool = False,
+) -> dict | None:
+    """
+    Read the requested state keys and metadata of a session.
+
+    With a database session store only the projected columns are read;
+    otherwise the full session is fetched from ADK and projected here.
+    """
+    if session_reader is not None:
+        return await asyncio.to_thread(
+            session_reader.read, app_name, user_id, session_id, fields, with_events_count
+        )
+
+    from fastapi.testclient import TestClient
+    client = TestClient(app)
+
+    response = client.get(f"/apps/{app_name}/users/{user_id}/sessions/{session_id}")
+    if response.status_code == 404:
+        return None
+    if response.status_code >= 400:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Error: {response.text[:500]}"
+        )
+
+    data = response.json()
+    state = data.get("state", {})
+    return {
+        "id": data.get("id", session_id),
+        "user_id": data.get("userId", user_id),
+        "state": state if fields is None else {key: state.get(key) for key in fields},
+        "events_count": len(data.get("events", [])),
+        "created_at": data.get("createdTime"),
+        "last_update": data.get("lastUpdateTime"),
+    }
+
+
 @app.post("/get_state")
 async def get_state(req: GetStateRequest = Body(...)):
     """
-    Retrieve the complete session state.
+    Retrieve the session state, or only the keys listed in `fields`.
     """
     user_id = req.user_id or "user_backend"
     session_id = req.session_id or "session_api"
@@ -270,45 +523,44 @@ async def get_state(req: GetStateRequest = Body(...)):
     print(f"Retrieving state for {user_id}/{session_id}...")
 
     try:
-        from fastapi.testclient import TestClient
-        client = TestClient(app)
-        
-        response = client.get(
-            f"/apps/{app_name}/users/{user_id}/sessions/{session_id}"
+        data = await read_session_projection(
+            app_name, user_id, session_id, req.fields, with_events_count=True
         )
 
-        if response.status_code == 404:
+        if data is None:
             # Create session if it doesn't exist
             print(f"Session not found, creating...")
-            response = client.post(
+            from fastapi.testclient import TestClient
+            response = TestClient(app).post(
                 f"/apps/{app_name}/users/{user_id}/sessions",
                 json={"session_id": session_id}
             )
-
-        if response.status_code >= 400:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Error: {response.text[:500]}"
+            if response.status_code >= 400:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Error: {response.text[:500]}"
+                )
+            data = await read_session_projection(
+                app_name, user_id, session_id, req.fields, with_events_count=True
             )
 
-        data = response.json()
-
         print(f"State retrieved: {len(str(data))} characters")
 
-        logger.log_struct({
+        log_struct({
             "event": "get_state",
             "user_id": user_id,
-            "session_id": session_id
+            "session_id": session_id,
+            "fields": req.fields,
         }, severity="INFO")
 
         return {
             "success": True,
-            "session_id": data.get("id", session_id),
-            "user_id": data.get("userId", user_id),
-            "state": data.get("state", {}),
-            "events_count": len(data.get("events", [])),
-            "created_at": data.get("createdTime"),
-            "last_update": data.get("lastUpdateTime"),
+            "session_id": data["id"],
+            "user_id": data["user_id"],
+            "state": data["state"],
+            "events_count": data["events_count"],
+            "created_at": data["created_at"],
+            "last_update": data["last_update"],
         }
 
     except HTTPException:
@@ -330,38 +582,22 @@ async def get_agent_outputs(req: GetStateRequest = Body(...)):
     print(f"Retrieving agent outputs for {user_id}/{session_id}...")
 
     try:
-        from fastapi.testclient import TestClient
-        client = TestClient(app)
-        
-        response = client.get(
-            f"/apps/{app_name}/users/{user_id}/sessions/{session_id}"
-        )
+        # Only the agent output keys are read, never the event history
+        keys = [k for k in AGENT_OUTPUT_KEYS if req.fields is None or k in req.fields]
+        data = await read_session_projection(app_name, user_id, session_id, keys)
 
-        if response.status_code == 404:
+        if data is None:
             raise HTTPException(status_code=404, detail="Session not found")
 
-        if response.status_code >= 400:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Error: {response.text[:500]}"
-            )
-
-        data = response.json()
-        state = data.get("state", {})
-
         # Extract agent outputs
-        agent_outputs = {
-            "donnees_patient": state.get("donnees_patient"),
-            "synthese_clinique": state.get("synthese_clinique"),
-            "validation_expert": state.get("validation_expert"),
-        }
+        agent_outputs = data["state"]
 
         # Count available outputs
         available_outputs = [k for k, v in agent_outputs.items() if v is not None]
 
         print(f"Outputs: {', '.join(available_outputs) if available_outputs else 'None'}")
 
-        logger.log_struct({
+        log_struct({
             "event": "get_agent_outputs",
             "user_id": user_id,
             "session_id": session_id,
@@ -370,11 +606,11 @@ async def get_agent_outputs(req: GetStateRequest = Body(...)):
 
         return {
             "success": True,
-            "session_id": data.get("id", session_id),
-            "user_id": data.get("userId", user_id),
+            "session_id": data["id"],
+            "user_id": data["user_id"],
             "agent_outputs": agent_outputs,
             "available_outputs": available_outputs,
-            "last_update": data.get("lastUpdateTime"),
+            "last_update": data["last_update"],
         }
 
     except HTTPException:
@@ -397,11 +633,14 @@ async def health_check():
             "adk": "Google ADK endpoints (see /docs)",
             "custom": [
                 "POST /start_session",
-                "POST /send_message", 
+                "POST /send_message",
+                "POST /send_message_stream",
                 "POST /get_state",
                 "POST /get_agent_outputs"
             ]
-        }
+        },
+        # Recent latency of the shared Vertex AI models (app.utils.llm registry)
+        "llm_models": model_latency_stats(),
     }
 
 
@@ -409,7 +648,7 @@ async def health_check():
 @app.post("/feedback")
 def collect_feedback(feedback: Feedback) -> dict[str, str]:
     """Collect and log feedback."""
-    logger.log_struct(feedback.model_dump(), severity="INFO")
+    log_struct(feedback.model_dump(), severity="INFO")
     return {"status": "success"}
 
 
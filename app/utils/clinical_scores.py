@@ -0,0 +1,401 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Deterministic bedside scores (qSOFA, SIRS, NEWS2, shock index) computed from
+the normalized patient format (`vitals_current` and MIMIC-III `labs`).
+
+All scores are computed on NumPy arrays with one row per patient, so a batch
+of patients costs the same handful of vector operations as a single one.
+Missing measurements are NaN: they contribute no points and are reported in
+`missing_components`.
+"""
+
+import re
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+# Scores computed here; the LLM is only asked for the other ones
+DETERMINISTIC_SCORES = ("qSOFA", "SIRS", "NEWS2", "Shock index")
+
+# MIMIC-III LABEVENTS itemids
+LAB_ITEMIDS = {
+    "wbc": (51300, 51301),  # K/uL
+    "bands": (51144,),  # %
+    "paco2": (50818,),  # mmHg
+}
+
+MEASUREMENTS = (
+    "respiratory_rate",
+    "systolic_bp",
+    "heart_rate",
+    "temperature",
+    "spo2",
+    "altered_mentation",
+    "supplemental_oxygen",
+    "wbc",
+    "bands",
+    "paco2",
+)
+
+_ALTERED_MENTATION = re.compile(r"\b(?:inconscient|confus|somnolent|altér|coma|désorient)")
+# Negation within two words before the term, in the same clause ("non confus", "pas de confusion")
+_NEGATED = re.compile(r"\b(?:non|pas|sans|ni|aucune?)(?:\s+\w+){0,2}\s*$")
+_AVPU = re.compile(r"^(?:avpu\s*[:=]?\s*)?([avpu])$")
+
+
+_NUMBER = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+
+def _value(vital: Any) -> float:
+    """
+    Numeric value of a `vitals_current` entry: {"value": ...}, a bare number
+    or a free-text value such as "38,5 °C" (SAMU calls).
+    """
+    if isinstance(vital, dict):
+        vital = vital.get("value")
+    if isinstance(vital, bool) or vital is None:
+        return np.nan
+    if isinstance(vital, str):
+        match = _NUMBER.search(vital)
+        vital = match.group().replace(",", ".") if match else None
+    try:
+        return float(vital)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def temperature_celsius(vital: Any) -> float:
+    """Temperature in °C; MIMIC itemid 223761 is charted in °F."""
+    value = _value(vital)
+    unit = str(vital.get("unit") or "") if isinstance(vital, dict) else ""
+    if "F" in unit.upper() or value > 45:
+        return (value - 32) * 5 / 9
+    return value
+
+
+def _altered_mentation(vitals: dict[str, Any]) -> float:
+    """1.0 if GCS < 15 or the consciousness description is abnormal, NaN if unknown."""
+    gcs = _value(vitals.get("gcs"))
+    if not np.isnan(gcs):
+        return float(gcs < 15)
+    consciousness = vitals.get("consciousness")
+    if isinstance(consciousness, dict):
+        consciousness = consciousness.get("value")
+    if not consciousness or not isinstance(consciousness, str):
+        return np.nan
+    text = consciousness.strip().lower()
+    avpu = _AVPU.match(text)
+    if avpu:
+        return float(avpu.group(1) != "a")
+    return float(
+        any(not _NEGATED.search(text[: match.start()]) for match in _ALTERED_MENTATION.finditer(text))
+    )
+
+
+def _latest_labs(labs: Sequence[dict[str, Any]]) -> dict[int, float]:
+    """Most recent numeric value per lab itemid."""
+    latest: dict[int, tuple[str, float]] = {}
+    for lab in labs or []:
+        try:
+            itemid = int(lab.get("itemid"))
+            value = float(lab.get("valuenum"))
+        except (TypeError, ValueError):
+            continue
+        charttime = str(lab.get("charttime") or "")
+        if itemid not in latest or charttime >= latest[itemid][0]:
+            latest[itemid] = (charttime, value)
+    return {itemid: value for itemid, (_, value) in latest.items()}
+
+
+def measurement_matrix(patients: Sequence[dict[str, Any]]) -> dict[str, np.ndarray]:
+    """
+    Extract the score inputs of several patients into NaN-padded arrays.
+
+    :param patients: `patient_normalized` dicts
+    :return: One float array (length = number of patients) per measurement
+    """
+    rows = []
+    for patient in patients:
+        vitals = patient.get("vitals_current") or {}
+        labs = _latest_labs(patient.get("labs") or [])
+        lab = {
+            name: next((labs[i] for i in itemids if i in labs), np.nan)
+            for name, itemids in LAB_ITEMIDS.items()
+        }
+        oxygen = vitals.get("supplemental_oxygen")
+        rows.append(
+            (
+                _value(vitals.get("respiratory_rate")),
+                _value(vitals.get("systolic_bp")),
+                _value(vitals.get("heart_rate")),
+                temperature_celsius(vitals.get("temperature")),
+                _value(vitals.get("spo2")),
+                _altered_mentation(vitals),
+                np.nan if oxygen is None else float(oxygen is True or bool(_value(oxygen) > 0)),
+                lab["wbc"],
+                lab["bands"],
+                lab["paco2"],
+            )
+        )
+    matrix = np.array(rows, dtype=float).reshape(len(rows), len(MEASUREMENTS))
+    return {name: matrix[:, i] for i, name in enumerate(MEASUREMENTS)}
+
+
+def _points(values: np.ndarray, conditions: list, points: list) -> np.ndarray:
+    """Banded points; NaN values score 0."""
+    with np.errstate(invalid="ignore"):
+        return np.select(conditions, points, default=0) * ~np.isnan(values)
+
+
+def compute_scores(m: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Compute the scores and their components for every patient.
+
+    :param m: The output of `measurement_matrix`
+    :return: Score and component arrays (component arrays are 0/1 or points)
+    """
+    rr, sbp, hr, temp = m["respiratory_rate"], m["systolic_bp"], m["heart_rate"], m["temperature"]
+    spo2, altered, oxygen = m["spo2"], m["altered_mentation"], m["supplemental_oxygen"]
+    wbc, bands, paco2 = m["wbc"], m["bands"], m["paco2"]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = {
+            # qSOFA (Sepsis-3)
+            "qsofa.respiratory_rate": (rr >= 22).astype(float),
+            "qsofa.systolic_bp": (sbp <= 100).astype(float),
+            "qsofa.altered_mentation": np.nan_to_num(altered),
+            # SIRS
+            "sirs.temperature": ((temp > 38) | (temp < 36)).astype(float),
+            "sirs.heart_rate": (hr > 90).astype(float),
+            "sirs.respiratory": ((rr > 20) | (paco2 < 32)).astype(float),
+            "sirs.wbc": ((wbc > 12) | (wbc < 4) | (bands > 10)).astype(float),
+            # NEWS2 (SpO2 scale 1)
+            "news2.respiratory_rate": _points(
+                rr, [rr <= 8, rr <= 11, rr <= 20, rr <= 24, rr >= 25], [3, 1, 0, 2, 3]
+            ),
+            "news2.spo2": _points(spo2, [spo2 <= 91, spo2 <= 93, spo2 <= 95], [3, 2, 1]),
+            "news2.supplemental_oxygen": np.nan_to_num(oxygen) * 2,
+            "news2.systolic_bp": _points(
+                sbp, [sbp <= 90, sbp <= 100, sbp <= 110, sbp >= 220], [3, 2, 1, 3]
+            ),
+            "news2.heart_rate": _points(
+                hr,
+                [hr <= 40, hr <= 50, hr <= 90, hr <= 110, hr <= 130, hr > 130],
+                [3, 1, 0, 1, 2, 3],
+            ),
+            "news2.consciousness": np.nan_to_num(altered) * 3,
+            "news2.temperature": _points(
+                temp, [temp <= 35, temp <= 36, temp <= 38, temp <= 39, temp > 39], [3, 1, 0, 1, 2]
+            ),
+            "shock_index": hr / sbp,
+        }
+
+    out["qsofa"] = out["qsofa.respiratory_rate"] + out["qsofa.systolic_bp"] + out["qsofa.altered_mentation"]
+    out["sirs"] = sum(out[f"sirs.{c}"] for c in ("temperature", "heart_rate", "respiratory", "wbc"))
+    news2_parts = [k for k in out if k.startswith("news2.")]
+    out["news2"] = sum(out[k] for k in news2_parts)
+    out["news2.max_single"] = np.max(np.stack([out[k] for k in news2_parts]), axis=0)
+
+    # Number of known inputs per score, to decide whether a score is reportable
+    known = {k: (~np.isnan(v)).astype(int) for k, v in m.items()}
+    out["qsofa.known"] = known["respiratory_rate"] + known["systolic_bp"] + known["altered_mentation"]
+    out["sirs.known"] = (
+        known["temperature"] + known["heart_rate"]
+        + (known["respiratory_rate"] | known["paco2"]) + (known["wbc"] | known["bands"])
+    )
+    out["news2.known"] = (
+        known["respiratory_rate"] + known["spo2"] + known["systolic_bp"]
+        + known["heart_rate"] + known["temperature"] + known["altered_mentation"]
+    )
+    return out
+
+
+def _missing(m: dict[str, np.ndarray], i: int, names: Sequence[str]) -> list[str]:
+    return [name for name in names if np.isnan(m[name][i])]
+
+
+def _news2_action(total: float, max_single: float) -> tuple[str, str, str]:
+    """(interpretation, clinical action, risk category) of a NEWS2 total (RCP 2017 thresholds)."""
+    if total >= 7:
+        return (
+            "Risque clinique élevé",
+            "Réponse d'urgence : évaluation par une équipe de soins critiques",
+            "HIGH",
+        )
+    if total >= 5:
+        return (
+            "Risque clinique moyen",
+            "Réponse urgente : évaluation médicale rapide, surveillance horaire",
+            "INTERMEDIATE",
+        )
+    if max_single >= 3:
+        return (
+            "Risque faible à moyen (paramètre isolé à 3)",
+            "Évaluation urgente par un clinicien",
+            "INTERMEDIATE",
+        )
+    return "Risque clinique faible", "Surveillance standard toutes les 4 à 12 h", "LOW"
+
+
+def format_scores(m: dict[str, np.ndarray], s: dict[str, np.ndarray], i: int) -> list[dict[str, Any]]:
+    """
+    Format the scores of patient `i` like the synthesizer's `applicable_scores`.
+
+    Scores are reported when enough inputs are known (2/3 for qSOFA, 2/4 for
+    SIRS, 3/6 for NEWS2, both for the shock index).
+    """
+    scores = []
+
+    if s["qsofa.known"][i] >= 2:
+        value = int(s["qsofa"][i])
+        scores.append({
+            "score_name": "qSOFA",
+            "value": value,
+            "interpretation": (
+                "qSOFA ≥ 2 : risque élevé de mortalité, sepsis à suspecter"
+                if value >= 2 else "qSOFA < 2 : pas de critère de gravité du sepsis"
+            ),
+            "components": {
+                "FR ≥ 22": int(s["qsofa.respiratory_rate"][i]),
+                "PAS ≤ 100": int(s["qsofa.systolic_bp"][i]),
+                "Altération de la conscience": int(s["qsofa.altered_mentation"][i]),
+            },
+            "clinical_action": (
+                "Rechercher une infection, lactates, hémocultures, évaluer le SOFA"
+                if value >= 2 else "Réévaluer si aggravation clinique"
+            ),
+            "risk_category": "HIGH" if value >= 2 else "LOW",
+            "missing_components": _missing(m, i, ("respiratory_rate", "systolic_bp", "altered_mentation")),
+        })
+
+    if s["sirs.known"][i] >= 2:
+        value = int(s["sirs"][i])
+        scores.append({
+            "score_name": "SIRS",
+            "value": value,
+            "interpretation": (
+                "SIRS positif (≥ 2 critères)" if value >= 2 else "SIRS négatif (< 2 critères)"
+            ),
+            "components": {
+                "Température > 38 °C ou < 36 °C": int(s["sirs.temperature"][i]),
+                "FC > 90": int(s["sirs.heart_rate"][i]),
+                "FR > 20 ou PaCO2 < 32 mmHg": int(s["sirs.respiratory"][i]),
+                "GB > 12 ou < 4 G/L ou > 10 % de formes immatures": int(s["sirs.wbc"][i]),
+            },
+            "clinical_action": (
+                "Réponse inflammatoire systémique : rechercher un foyer infectieux"
+                if value >= 2 else "Pas d'action spécifique"
+            ),
+            "risk_category": "INTERMEDIATE" if value >= 2 else "LOW",
+            "missing_components": _missing(m, i, ("temperature", "heart_rate", "respiratory_rate", "wbc")),
+        })
+
+    if s["news2.known"][i] >= 3:
+        value = int(s["news2"][i])
+        interpretation, action, risk = _news2_action(value, s["news2.max_single"][i])
+        scores.append({
+            "score_name": "NEWS2",
+            "value": value,
+            "interpretation": interpretation,
+            "components": {
+                "Fréquence respiratoire": int(s["news2.respiratory_rate"][i]),
+                "SpO2 (échelle 1)": int(s["news2.spo2"][i]),
+                "Oxygène": int(s["news2.supplemental_oxygen"][i]),
+                "PAS": int(s["news2.systolic_bp"][i]),
+                "Pouls": int(s["news2.heart_rate"][i]),
+                "Conscience": int(s["news2.consciousness"][i]),
+                "Température": int(s["news2.temperature"][i]),
+            },
+            "clinical_action": action,
+            "risk_category": risk,
+            "missing_components": _missing(
+                m, i,
+                ("respiratory_rate", "spo2", "supplemental_oxygen", "systolic_bp",
+                 "heart_rate", "altered_mentation", "temperature"),
+            ),
+        })
+
+    shock_index = s["shock_index"][i]
+    if np.isfinite(shock_index):
+        scores.append({
+            "score_name": "Shock index",
+            "value": round(float(shock_index), 2),
+            "interpretation": (
+                "≥ 1,0 : instabilité hémodynamique probable" if shock_index >= 1
+                else "0,7-1,0 : à surveiller" if shock_index >= 0.7
+                else "< 0,7 : normal"
+            ),
+            "components": {"FC": float(m["heart_rate"][i]), "PAS": float(m["systolic_bp"][i])},
+            "clinical_action": (
+                "Rechercher une hypovolémie ou un choc, remplissage à discuter"
+                if shock_index >= 1 else "Surveillance hémodynamique"
+            ),
+            "risk_category": (
+                "HIGH" if shock_index >= 1 else "INTERMEDIATE" if shock_index >= 0.7 else "LOW"
+            ),
+            "missing_components": [],
+        })
+
+    for score in scores:
+        score["source"] = "calcul déterministe"
+    return scores
+
+
+def compute_clinical_scores_batch(patients: Sequence[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    """
+    Compute the deterministic scores of several patients at once.
+
+    :param patients: `patient_normalized` dicts
+    :return: For each patient, the list of computable scores
+    """
+    if not patients:
+        return []
+    m = measurement_matrix(patients)
+    s = compute_scores(m)
+    return [format_scores(m, s, i) for i in range(len(patients))]
+
+
+def score_key(name: str) -> str:
+    """Normalized score name, to match LLM-reported scores ("NEWS 2", "qSofa"...)."""
+    return re.sub(r"[\s_-]", "", name or "").upper()
+
+
+def merge_scores(computed: list[dict[str, Any]], reported: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Merge the deterministic scores with LLM-reported ones. LLM values for the
+    deterministic scores are dropped, even when the score was not computable.
+
+    :param computed: The output of `compute_clinical_scores`
+    :param reported: Scores returned by the LLM
+    :return: The computed scores followed by the other reported scores
+    """
+    known = {score_key(name) for name in DETERMINISTIC_SCORES}
+    return computed + [
+        score for score in reported
+        if isinstance(score, dict) and score_key(str(score.get("score_name"))) not in known
+    ]
+
+
+def compute_clinical_scores(patient: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Compute the deterministic scores of one patient.
+
+    :param patient: A `patient_normalized` dict (or the collector output containing it)
+    :return: The computable scores, in the synthesizer's `applicable_scores` format
+    """
+    patient = patient.get("patient_normalized", patient)
+    return compute_clinical_scores_batch([patient])[0]
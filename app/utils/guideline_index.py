@@ -0,0 +1,456 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process retrieval index over the cleaned SFMU guideline fiches.
+
+Passages are scored with BM25 over an inverted index stored as flat NumPy
+arrays. Optional dense embeddings are fused with the BM25 ranking
+(reciprocal rank fusion). Everything is persisted to a directory and the
+arrays are memory-mapped on load, so opening the index is almost free.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from collections.abc import Callable, Iterable, Sequence
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+# Embeds a batch of texts into an (n, d) float array
+Embedder = Callable[[Sequence[str]], np.ndarray]
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_EMBEDDING_MODEL = "text-multilingual-embedding-002"
+
+# Passages longer than this are split (on line boundaries)
+MAX_PASSAGE_WORDS = 250
+# Section corpus written by scripts/clean.py next to the cleaned fiches
+SECTION_CORPUS_FILENAME = "corpus_sections.jsonl"
+
+_STOPWORDS = frozenset(
+    "au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma mais me "
+    "meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te "
+    "tes toi ton tu un une vos votre vous est sont ete etre avoir fait si plus tout tous "
+    "the of and or to in for on with is are".split()
+)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, accent-free tokens without stopwords; a trailing plural "s" is dropped."""
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    tokens = []
+    for token in _TOKEN.findall(ascii_text):
+        if len(token) < 2 or token in _STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("s"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _slug(text: str) -> str:
+    return "-".join(tokenize(text)) or "section"
+
+
+def _split_words(text: str, max_words: int) -> list[str]:
+    """Split a section on line boundaries into chunks of at most ~max_words words."""
+    chunks: list[str] = []
+    current: list[str] = []
+    count = 0
+    for line in text.splitlines():
+        words = len(line.split())
+        if current and count + words > max_words:
+            chunks.append("\n".join(current))
+            current, count = [], 0
+        current.append(line)
+        count += words
+    if current:
+        chunks.append("\n".join(current))
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+
+def parse_fiche(text: str, source: str, max_words: int = MAX_PASSAGE_WORDS) -> list[dict[str, Any]]:
+    """
+    Split a fiche written by scripts/clean.py into passages, one per (sub)section.
+
+    :param text: The cleaned fiche ("# TITRE", "Catégorie:", "## ..." and "### ..." headings)
+    :param source: The fiche path relative to the corpus root, used in passage ids
+    :param max_words: Longer sections are split into several passages
+    :return: Passages {id, title, category, section, text, source}
+    """
+    title, category = "", ""
+    sections: list[tuple[str, list[str]]] = []
+    parent = ""
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("### "):
+            sections.append((f"{parent} - {stripped[4:].strip()}" if parent else stripped[4:].strip(), []))
+        elif stripped.startswith("## "):
+            parent = stripped[3:].strip()
+            sections.append((parent, []))
+        elif stripped.startswith("# "):
+            title = stripped[2:].strip()
+        elif stripped.startswith("Catégorie:"):
+            category = stripped[len("Catégorie:"):].strip()
+        elif stripped and sections:
+            sections[-1][1].append(stripped)
+
+    passages = []
+    for section, lines in sections:
+        for i, chunk in enumerate(_split_words("\n".join(lines), max_words)):
+            passages.append({
+                "id": f"{source}#{_slug(section)}" + (f"-{i}" if i else ""),
+                "title": title,
+                "category": category,
+                "section": section,
+                "text": chunk,
+                "source": source,
+            })
+    return passages
+
+
+def load_passages_from_directory(directory: str | os.PathLike) -> list[dict[str, Any]]:
+    """
+    Read every cleaned fiche (*.txt) under a directory, in a stable order.
+
+    :param directory: The output directory of scripts/clean.py
+    :return: The passages of all fiches
+    """
+    root = Path(directory)
+    passages = []
+    for path in sorted(root.rglob("*.txt")):
+        source = path.relative_to(root).as_posix()
+        passages.extend(parse_fiche(path.read_text(encoding="utf-8"), source))
+    return passages
+
+
+def load_passages_from_jsonl(path: str | os.PathLike, max_words: int = MAX_PASSAGE_WORDS) -> list[dict[str, Any]]:
+    """
+    Read the section corpus written by scripts/clean.py (one JSON record per fiche section).
+
+    :param path: The corpus_sections.jsonl file
+    :param max_words: Longer sections are split into several passages
+    :return: Passages {id, title, category, section, section_type, text, source, url}
+    """
+    passages = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            for i, chunk in enumerate(_split_words(record["texte"], max_words)):
+                passages.append({
+                    "id": record["id"] + (f"-{i}" if i else ""),
+                    "title": record["titre"],
+                    "category": record["categorie"],
+                    "section": record["section"],
+                    "section_type": record["section_type"],
+                    "text": chunk,
+                    "source": record["fiche"],
+                    "url": record.get("url", ""),
+                })
+    return passages
+
+
+def load_passages(source: str | os.PathLike) -> list[dict[str, Any]]:
+    """
+    Read the passages of a cleaned corpus: a JSONL section corpus, or a directory
+    holding one (preferred, a single sequential read) or the cleaned fiches.
+
+    :param source: A .jsonl file or the output directory of scripts/clean.py
+    :return: The passages
+    """
+    path = Path(source)
+    if path.is_file():
+        return load_passages_from_jsonl(path)
+    if (path / SECTION_CORPUS_FILENAME).exists():
+        return load_passages_from_jsonl(path / SECTION_CORPUS_FILENAME)
+    return load_passages_from_directory(path)
+
+
+class GuidelineIndex:
+    """BM25 (+ optional dense) index over guideline passages."""
+
+    def __init__(
+        self,
+        passages: list[dict[str, Any]],
+        vocabulary: dict[str, int],
+        term_offsets: np.ndarray,
+        posting_docs: np.ndarray,
+        posting_tfs: np.ndarray,
+        doc_lengths: np.ndarray,
+        embeddings: np.ndarray | None = None,
+        embedding_model: str | None = None,
+        embedder: Embedder | None = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        self.passages = passages
+        self.vocabulary = vocabulary
+        self.term_offsets = term_offsets
+        self.posting_docs = posting_docs
+        self.posting_tfs = posting_tfs
+        self.doc_lengths = doc_lengths
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+        self.embedder = embedder
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    @classmethod
+    def build(
+        cls,
+        passages: Iterable[dict[str, Any]],
+        embedder: Embedder | None = None,
+        embedding_model: str | None = None,
+    ) -> "GuidelineIndex":
+        """
+        Build the index in memory.
+
+        :param passages: Passages with at least "id" and "text" (title and section are indexed too)
+        :param embedder: When given, passages are also embedded for hybrid search
+        :param embedding_model: The embedder's model name, recorded in the index metadata
+        :return: The index
+        """
+        passages = list(passages)
+        vocabulary: dict[str, int] = {}
+        term_ids: list[int] = []
+        doc_ids: list[int] = []
+        tfs: list[int] = []
+        doc_lengths = np.zeros(len(passages), dtype=np.int32)
+
+        for doc_id, passage in enumerate(passages):
+            tokens = tokenize(
+                " ".join(str(passage.get(field) or "") for field in ("title", "section", "text"))
+            )
+            doc_lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        # Postings grouped by term: term t owns posting_*[term_offsets[t]:term_offsets[t + 1]]
+        term_array = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_array, kind="stable")
+        term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_array, minlength=len(vocabulary)), out=term_offsets[1:])
+
+        embeddings = None
+        if embedder is not None and passages:
+            embeddings = _normalize(embedder([passage["text"] for passage in passages]))
+
+        return cls(
+            passages=passages,
+            vocabulary=vocabulary,
+            term_offsets=term_offsets,
+            posting_docs=np.asarray(doc_ids, dtype=np.int32)[order],
+            posting_tfs=np.asarray(tfs, dtype=np.float32)[order],
+            doc_lengths=doc_lengths,
+            embeddings=embeddings,
+            embedding_model=embedding_model,
+            embedder=embedder,
+        )
+
+    def save(self, directory: str | os.PathLike) -> None:
+        """Persist the index: passages as JSONL, vocabulary as JSON, arrays as .npy."""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "passages.jsonl", "w", encoding="utf-8") as f:
+            for passage in self.passages:
+                f.write(json.dumps(passage, ensure_ascii=False) + "\n")
+        terms = sorted(self.vocabulary, key=self.vocabulary.__getitem__)
+        (path / "vocabulary.json").write_text(json.dumps(terms, ensure_ascii=False), encoding="utf-8")
+        np.save(path / "term_offsets.npy", self.term_offsets)
+        np.save(path / "posting_docs.npy", self.posting_docs)
+        np.save(path / "posting_tfs.npy", self.posting_tfs)
+        np.save(path / "doc_lengths.npy", self.doc_lengths)
+        if self.embeddings is not None:
+            np.save(path / "embeddings.npy", np.asarray(self.embeddings, dtype=np.float32))
+        elif (path / "embeddings.npy").exists():
+            (path / "embeddings.npy").unlink()
+        meta = {
+            "format_version": INDEX_FORMAT_VERSION,
+            "passages": len(self.passages),
+            "terms": len(terms),
+            "k1": self.k1,
+            "b": self.b,
+            "embedding_model": self.embedding_model if self.embeddings is not None else None,
+        }
+        (path / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: str | os.PathLike, embedder: Embedder | None = None) -> "GuidelineIndex":
+        """
+        Open a persisted index; the arrays are memory-mapped.
+
+        :param directory: A directory written by `save`
+        :param embedder: Query embedder; without it, dense vectors are ignored (BM25 only)
+        :return: The index
+        """
+        path = Path(directory)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported guideline index format: {meta.get('format_version')}")
+        with open(path / "passages.jsonl", encoding="utf-8") as f:
+            passages = [json.loads(line) for line in f if line.strip()]
+        terms = json.loads((path / "vocabulary.json").read_text(encoding="utf-8"))
+        embeddings = None
+        if (path / "embeddings.npy").exists():
+            embeddings = np.load(path / "embeddings.npy", mmap_mode="r")
+        return cls(
+            passages=passages,
+            vocabulary={term: i for i, term in enumerate(terms)},
+            term_offsets=np.load(path / "term_offsets.npy", mmap_mode="r"),
+            posting_docs=np.load(path / "posting_docs.npy", mmap_mode="r"),
+            posting_tfs=np.load(path / "posting_tfs.npy", mmap_mode="r"),
+            doc_lengths=np.load(path / "doc_lengths.npy", mmap_mode="r"),
+            embeddings=embeddings,
+            embedding_model=meta.get("embedding_model"),
+            embedder=embedder,
+            k1=meta.get("k1", 1.5),
+            b=meta.get("b", 0.75),
+        )
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        """BM25 score of every passage for a query."""
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        n = len(self.passages)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.posting_docs[start:end]
+            tfs = self.posting_tfs[start:end]
+            df = end - start
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_doc_length)
+            # Postings hold each document once per term, so fancy-index accumulation is safe
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        return scores
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        where: dict[str, Any] | None = None,
+        rrf_k: int = 60,
+    ) -> list[dict[str, Any]]:
+        """
+        Return the k most relevant passages.
+
+        :param query: Free-text query
+        :param k: Number of passages
+        :param where: Filters on passage fields: exact match, or membership for a list/tuple/set
+            (e.g. {"category": "CARDIO-VASCULAIRE", "section_type": ["arm_priorite", "medecin_regulateur"]})
+        :param rrf_k: Reciprocal rank fusion constant, for hybrid search
+        :return: Passages with a "score" key, best first
+        """
+        if not self.passages:
+            return []
+        scores = self.bm25_scores(query)
+        mask = None
+        if where:
+            accepted = {
+                field: set(value) if isinstance(value, (list, tuple, set, frozenset)) else {value}
+                for field, value in where.items()
+            }
+            mask = np.array(
+                [all(p.get(field) in values for field, values in accepted.items()) for p in self.passages]
+            )
+            scores = np.where(mask, scores, 0)
+
+        if self.embeddings is not None and self.embedder is not None:
+            similarities = np.asarray(self.embeddings @ _normalize(self.embedder([query]))[0])
+            if mask is not None:
+                similarities = np.where(mask, similarities, -np.inf)
+            # Reciprocal rank fusion; passages without any query term get no BM25 rank
+            fused = np.zeros(len(self.passages), dtype=np.float64)
+            for ranking_scores, floor in ((scores, 0.0), (similarities, -np.inf)):
+                ranking = np.argsort(-ranking_scores, kind="stable")
+                ranking = ranking[ranking_scores[ranking] > floor]
+                fused[ranking] += 1.0 / (rrf_k + np.arange(1, len(ranking) + 1))
+            scores = fused
+        elif not scores.any():
+            return []
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [{**self.passages[i], "score": float(scores[i])} for i in top if scores[i] > 0]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def vertex_embedder(model_name: str = DEFAULT_EMBEDDING_MODEL, batch_size: int = 100) -> Embedder:
+    """
+    Embedder backed by a Vertex AI text embedding model (imported lazily).
+
+    :param model_name: The embedding model
+    :param batch_size: Texts per embedding request
+    :return: An embedder
+    """
+    from vertexai.language_models import TextEmbeddingModel
+
+    from app.utils.llm import init_vertexai
+
+    init_vertexai()
+    model = TextEmbeddingModel.from_pretrained(model_name)
+
+    def embed(texts: Sequence[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(e.values for e in model.get_embeddings(list(texts[start : start + batch_size])))
+        return np.asarray(vectors, dtype=np.float32)
+
+    return embed
+
+
+@lru_cache(maxsize=1)
+def get_guideline_index() -> GuidelineIndex | None:
+    """
+    Return the process-wide guideline index (GUIDELINE_INDEX_DIR), or None
+    when it has not been built. Dense vectors are used only when
+    GUIDELINE_INDEX_DENSE=true, since each query then costs an embedding call.
+    """
+    directory = os.getenv("GUIDELINE_INDEX_DIR", "guideline_index")
+    if not (Path(directory) / "meta.json").exists():
+        logging.warning(f"Guideline index not found in {directory}, guideline validation without retrieval")
+        return None
+    try:
+        meta = json.loads((Path(directory) / "meta.json").read_text(encoding="utf-8"))
+        embedder = None
+        if os.getenv("GUIDELINE_INDEX_DENSE", "false").lower() == "true" and meta.get("embedding_model"):
+            embedder = vertex_embedder(meta["embedding_model"])
+        return GuidelineIndex.load(directory, embedder=embedder)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not load the guideline index from {directory}: {e}")
+        return None
@@ -0,0 +1,561 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import functools
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from google.api_core.exceptions import ResourceExhausted
+
+from app.utils.telemetry import (
+    llm_latency,
+    llm_queue_depth,
+    llm_queue_wait,
+    llm_retries,
+    llm_tokens,
+    phase_span,
+)
+
+# Lower values are admitted first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int) -> Iterator[None]:
+    """
+    Set the admission priority of the LLM calls made in this context
+    (e.g. PRIORITY_BATCH for evaluation or ingestion scripts).
+
+    :param priority: PRIORITY_INTERACTIVE, PRIORITY_BATCH or any integer
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class LlmQueueTimeout(TimeoutError):
+    """Raised when an LLM call waits for admission longer than the queue timeout."""
+
+
+class TokenBucket:
+    """A token bucket refilled continuously at `rate_per_minute` (0 means unlimited)."""
+
+    def __init__(self, rate_per_minute: float) -> None:
+        self.rate = rate_per_minute / 60
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be consumed (amounts above capacity wait for a full bucket)."""
+        if not self.rate:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: float) -> None:
+        if self.rate:
+            self.tokens -= min(amount, self.capacity)
+
+
+class LlmScheduler:
+    """
+    Process-wide admission control for LLM calls.
+
+    Calls wait in a priority queue (interactive before batch, FIFO within a
+    priority) and are admitted when both the request and the estimated token
+    budgets allow it, so that load spikes queue up instead of exhausting the
+    Vertex AI quota all at once.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        queue_timeout: float = 120.0,
+    ) -> None:
+        """
+        :param requests_per_minute: Request budget (0 for unlimited)
+        :param tokens_per_minute: Estimated token budget (0 for unlimited)
+        :param queue_timeout: Maximum wait for admission, in seconds
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._queue: list[tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._async_waiters: dict[tuple[int, int], tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+
+    @classmethod
+    def from_env(cls) -> "LlmScheduler":
+        """Create a scheduler configured through the LLM_* environment variables."""
+        return cls(
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "120")),
+            tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "400000")),
+            queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "120")),
+        )
+
+    @property
+    def depth(self) -> int:
+        """Number of calls waiting for admission."""
+        return len(self._queue)
+
+    def acquire(self, estimated_tokens: int, priority: int | None = None) -> float:
+        """
+        Block until the call is admitted.
+
+        :param estimated_tokens: Estimated tokens of the call
+        :param priority: Admission priority (defaults to the context priority)
+        :return: The time spent waiting, in seconds
+        """
+        priority = _priority.get() if priority is None else priority
+        ticket = (priority, next(self._sequence))
+        attributes = {"priority": priority}
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            llm_queue_depth.add(1, attributes)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._budget_wait(ticket, estimated_tokens, now)
+                    if wait is not None and wait <= 0:
+                        self._admit(estimated_tokens)
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._withdraw(ticket)
+                        raise self._timeout()
+                    self._condition.wait(remaining if wait is None else min(wait, remaining))
+            finally:
+                llm_queue_depth.add(-1, attributes)
+                self._wake()
+
+        waited = time.monotonic() - start
+        llm_queue_wait.record(waited * 1000, attributes)
+        return waited
+
+    async def acquire_async(self, estimated_tokens: int, priority: int | None = None) -> float:
+        """
+        Wait until the call is admitted without holding a thread.
+
+        The task sleeps on an asyncio.Event that the scheduler sets (through
+        `call_soon_threadsafe`) whenever the queue moves. A cancelled task leaves
+        the queue at once instead of consuming budget once admitted.
+
+        :param estimated_tokens: Estimated tokens of the call
+        :param priority: Admission priority (defaults to the context priority)
+        :return: The time spent waiting, in seconds
+        """
+        priority = _priority.get() if priority is None else priority
+        ticket = (priority, next(self._sequence))
+        attributes = {"priority": priority}
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        event = asyncio.Event()
+
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            self._async_waiters[ticket] = (asyncio.get_running_loop(), event)
+            llm_queue_depth.add(1, attributes)
+        admitted = False
+        try:
+            while True:
+                with self._condition:
+                    now = time.monotonic()
+                    wait = self._budget_wait(ticket, estimated_tokens, now)
+                    if wait is not None and wait <= 0:
+                        self._admit(estimated_tokens)
+                        admitted = True
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise self._timeout()
+                    # Cleared under the lock: a wake-up issued after this point is not lost
+                    event.clear()
+                try:
+                    await asyncio.wait_for(
+                        event.wait(), remaining if wait is None else min(wait, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                del self._async_waiters[ticket]
+                if not admitted:
+                    self._withdraw(ticket)
+                llm_queue_depth.add(-1, attributes)
+                self._wake()
+
+        waited = time.monotonic() - start
+        llm_queue_wait.record(waited * 1000, attributes)
+        return waited
+
+    def _budget_wait(self, ticket: tuple[int, int], estimated_tokens: int, now: float) -> float | None:
+        """Seconds until the budgets admit `ticket`, or None while it is not first in line."""
+        if self._queue[0] is not ticket:
+            return None
+        return max(
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimated_tokens, now),
+        )
+
+    def _admit(self, estimated_tokens: int) -> None:
+        self.requests.consume(1)
+        self.tokens.consume(estimated_tokens)
+        heapq.heappop(self._queue)
+
+    def _withdraw(self, ticket: tuple[int, int]) -> None:
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+
+    def _timeout(self) -> LlmQueueTimeout:
+        return LlmQueueTimeout(
+            f"LLM call not admitted after {self.queue_timeout:.0f}s "
+            f"({len(self._queue)} calls queued)"
+        )
+
+    def _wake(self) -> None:
+        """Wake every waiter, thread or task: the next call in line may now be admitted."""
+        self._condition.notify_all()
+        for loop, event in list(self._async_waiters.values()):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+
+
+scheduler = LlmScheduler.from_env()
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2**attempt))
+
+
+def estimate_tokens(prompt_bytes: int) -> int:
+    """Rough token estimate of a prompt (about 4 bytes per token)."""
+    return prompt_bytes // 4 + 1
+
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+_models: dict[str, Any] = {}
+_models_lock = threading.Lock()
+_vertexai_config: dict[str, str | None] = {}
+_latencies: dict[str, deque] = {}
+
+
+def vertexai_location() -> str:
+    """Return the Vertex AI region of the pipeline models (GCP_REGION, europe-west1 by default)."""
+    return os.getenv("GCP_REGION", "europe-west1")
+
+
+def init_vertexai(project_id: str | None = None, location: str | None = None) -> None:
+    """
+    Initialize the Vertex AI SDK once for the process.
+
+    :param project_id: The project (GCP_PROJECT_ID / GOOGLE_CLOUD_PROJECT by default)
+    :param location: The region (GCP_REGION by default)
+    """
+    with _models_lock:
+        _init_vertexai_locked(project_id, location)
+
+
+def _init_vertexai_locked(project_id: str | None, location: str | None) -> None:
+    project_id = project_id or os.getenv("GCP_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
+    location = location or vertexai_location()
+    if _vertexai_config:
+        if location != _vertexai_config["location"]:
+            logging.warning(
+                f"Vertex AI already initialized in {_vertexai_config['location']}, "
+                f"ignoring location {location}"
+            )
+        return
+
+    import vertexai
+
+    vertexai.init(project=project_id, location=location)
+    _vertexai_config.update(project=project_id, location=location)
+    logging.info(f"Vertex AI initialized (project={project_id}, location={location})")
+
+
+def get_model(
+    name: str = DEFAULT_MODEL, project_id: str | None = None, location: str | None = None
+) -> Any:
+    """
+    Return the shared GenerativeModel for a model name.
+
+    Vertex AI is initialized once (single region for the whole pipeline) and
+    each model is created once, so all agents reuse the same client and its
+    keep-alive connections.
+
+    :param name: The model name
+    :param project_id: The project, used only for the first initialization
+    :param location: The region, used only for the first initialization
+    :return: The shared model instance
+    """
+    model = _models.get(name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(name)
+            if model is None:
+                _init_vertexai_locked(project_id, location)
+                from vertexai.generative_models import GenerativeModel
+
+                model = _models[name] = GenerativeModel(name)
+    return model
+
+
+def model_latency_stats() -> dict[str, dict[str, float]]:
+    """
+    Summarize the latency of the recent calls of each model (last 1000 calls).
+
+    :return: Per model: number of calls, mean, p50 and p95 latency in milliseconds
+    """
+    stats = {}
+    for name, samples in list(_latencies.items()):
+        values = sorted(samples)
+        if not values:
+            continue
+        stats[name] = {
+            "calls": len(values),
+            "mean_ms": round(sum(values) / len(values), 1),
+            "p50_ms": round(values[len(values) // 2], 1),
+            "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+        }
+    return stats
+
+
+def model_name(model: Any) -> str:
+    """
+    Return the short name of a Vertex AI GenerativeModel (e.g. "gemini-2.0-flash").
+
+    :param model: The model instance
+    :return: The model name
+    """
+    name = getattr(model, "_model_name", None) or type(model).__name__
+    return name.rsplit("/", 1)[-1]
+
+
+def generate_content(model: Any, prompt: Any, *, stage: str, **kwargs: Any) -> Any:
+    """
+    Call `model.generate_content` through the LLM scheduler, inside an LLM span
+    carrying the prompt size, the token usage reported by Vertex AI and whether
+    the context cache was hit. Quota errors are retried with jittered backoff.
+
+    :param model: The Vertex AI GenerativeModel
+    :param prompt: The prompt (text or contents)
+    :param stage: The pipeline stage issuing the call (e.g. "synthesizer.synthese")
+    :param kwargs: Arguments forwarded to `generate_content`
+    :return: The model response
+    """
+    name = model_name(model)
+    prompt_bytes = len(prompt.encode() if isinstance(prompt, str) else str(prompt).encode())
+    with phase_span(
+        f"llm.{stage}",
+        **{"llm.model": name, "llm.stage": stage, "llm.prompt_bytes": prompt_bytes},
+    ) as span:
+        queue_wait = 0.0
+        for attempt in range(MAX_RETRIES + 1):
+            queue_wait += scheduler.acquire(estimate_tokens(prompt_bytes))
+            try:
+                call_start = time.perf_counter()
+                response = model.generate_content(prompt, **kwargs)
+                _record_latency(name, stage, (time.perf_counter() - call_start) * 1000)
+                break
+            except ResourceExhausted:
+                if attempt == MAX_RETRIES:
+                    raise
+                llm_retries.add(1, {"stage": stage, "model": name})
+                time.sleep(retry_delay(attempt))
+        span.set_attributes({"llm.queue_wait_ms": queue_wait * 1000, "llm.retries": attempt})
+        _record_usage(span, response, name, stage)
+        return response
+
+
+async def generate_content_async(model: Any, prompt: Any, *, stage: str, **kwargs: Any) -> Any:
+    """
+    Async counterpart of `generate_content`: awaits `model.generate_content_async`,
+    so the event loop keeps serving other requests during the call. Admission
+    is awaited without a worker thread and backoff uses `asyncio.sleep`.
+
+    :param model: The Vertex AI GenerativeModel
+    :param prompt: The prompt (text or contents)
+    :param stage: The pipeline stage issuing the call (e.g. "arm.classification")
+    :param kwargs: Arguments forwarded to `generate_content_async`
+    :return: The model response
+    """
+    name = model_name(model)
+    prompt_bytes = len(prompt.encode() if isinstance(prompt, str) else str(prompt).encode())
+    with phase_span(
+        f"llm.{stage}",
+        **{"llm.model": name, "llm.stage": stage, "llm.prompt_bytes": prompt_bytes},
+    ) as span:
+        queue_wait = 0.0
+        for attempt in range(MAX_RETRIES + 1):
+            queue_wait += await scheduler.acquire_async(estimate_tokens(prompt_bytes))
+            try:
+                call_start = time.perf_counter()
+                response = await model.generate_content_async(prompt, **kwargs)
+                _record_latency(name, stage, (time.perf_counter() - call_start) * 1000)
+                break
+            except ResourceExhausted:
+                if attempt == MAX_RETRIES:
+                    raise
+                llm_retries.add(1, {"stage": stage, "model": name})
+                await asyncio.sleep(retry_delay(attempt))
+        span.set_attributes({"llm.queue_wait_ms": queue_wait * 1000, "llm.retries": attempt})
+        _record_usage(span, response, name, stage)
+        return response
+
+
+async def admit_llm_request(callback_context: Any, llm_request: Any) -> None:
+    """
+    ADK before_model_callback: admit the agent's model calls through the same
+    scheduler as the direct Vertex AI calls.
+    """
+    await scheduler.acquire_async(estimate_tokens(_request_bytes(llm_request)))
+
+
+def _request_bytes(llm_request: Any) -> int:
+    """Size of the text parts of an ADK LlmRequest."""
+    return sum(
+        len(part.text.encode())
+        for content in llm_request.contents or []
+        for part in content.parts or []
+        if part.text
+    )
+
+
+def is_quota_error(error: BaseException) -> bool:
+    """Whether an error is a quota rejection (Vertex AI ResourceExhausted or a google-genai 429)."""
+    return isinstance(error, ResourceExhausted) or getattr(error, "code", None) == 429
+
+
+async def retry_llm_stream(
+    call: Callable[[], AsyncIterator[Any]], prompt_bytes: int, *, stage: str, name: str
+) -> AsyncIterator[Any]:
+    """
+    Yield the responses of `call()`, retrying quota errors with backoff.
+
+    The first attempt is assumed admitted already (by `admit_llm_request`);
+    each retry is admitted again. A quota error raised after a response was
+    yielded is not retried, since the partial output already reached the caller.
+
+    :param call: Starts the model call and returns its response stream
+    :param prompt_bytes: Size of the prompt, for admission of the retries
+    :param stage: The pipeline stage issuing the call
+    :param name: The model name
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            await scheduler.acquire_async(estimate_tokens(prompt_bytes))
+        yielded = False
+        try:
+            async for response in call():
+                yielded = True
+                yield response
+            return
+        except Exception as e:
+            if yielded or not is_quota_error(e) or attempt == MAX_RETRIES:
+                raise
+            llm_retries.add(1, {"stage": stage, "model": name})
+            await asyncio.sleep(retry_delay(attempt))
+
+
+@functools.cache
+def _retrying_gemini_class() -> type:
+    """ADK Gemini model whose calls are retried on quota errors (ADK imported lazily)."""
+    from google.adk.models import Gemini
+
+    class RetryingGemini(Gemini):
+        async def generate_content_async(self, llm_request: Any, stream: bool = False) -> AsyncIterator[Any]:
+            parent = super().generate_content_async
+            async for response in retry_llm_stream(
+                lambda: parent(llm_request, stream),
+                _request_bytes(llm_request),
+                stage="adk",
+                name=self.model,
+            ):
+                yield response
+
+    return RetryingGemini
+
+
+def retrying_adk_model(model: str = DEFAULT_MODEL) -> Any:
+    """
+    ADK model for `LlmAgent(model=...)`: the agent's model calls get the same
+    ResourceExhausted/429 backoff-retry as `generate_content`.
+
+    :param model: The Gemini model name
+    :return: The ADK model instance
+    """
+    return _retrying_gemini_class()(model=model)
+
+
+def _record_latency(name: str, stage: str, latency_ms: float) -> None:
+    """Record the latency of a model call (metric and in-process summary)."""
+    llm_latency.record(latency_ms, {"model": name, "stage": stage})
+    _latencies.setdefault(name, deque(maxlen=1000)).append(latency_ms)
+
+
+def _record_usage(span: Any, response: Any, name: str, stage: str) -> None:
+    """Copy the token counts of a response to the span and the token counter."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    counts = {
+        "prompt": getattr(usage, "prompt_token_count", 0) or 0,
+        "output": getattr(usage, "candidates_token_count", 0) or 0,
+        "cached": getattr(usage, "cached_content_token_count", 0) or 0,
+    }
+    span.set_attributes(
+        {
+            "llm.tokens.prompt": counts["prompt"],
+            "llm.tokens.output": counts["output"],
+            "llm.tokens.cached": counts["cached"],
+            "llm.tokens.total": getattr(usage, "total_token_count", 0) or 0,
+            "llm.cache_hit": counts["cached"] > 0,
+        }
+    )
+    for token_type, count in counts.items():
+        if count:
+            llm_tokens.add(count, {"stage": stage, "model": name, "type": token_type})
@@ -0,0 +1,166 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.utils.telemetry import rag_retrievals
+
+
+def normalize_query(query: str) -> str:
+    """Cache key of a query: NFC, case-folded, whitespace collapsed, edge punctuation removed."""
+    text = " ".join(unicodedata.normalize("NFC", query).casefold().split())
+    return text.strip(" ?!.,;:")
+
+
+class RetrievalCache:
+    """
+    TTL + LRU cache of retrieval results keyed by normalized query.
+
+    Concurrent lookups of the same key share one in-flight fetch, and the
+    whole cache is dropped when the corpus version changes.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1024,
+        corpus_version: Callable[[], str] | None = None,
+        version_check_seconds: float = 300,
+    ) -> None:
+        """
+        :param ttl_seconds: Lifetime of a cached result
+        :param max_entries: Least recently used entries are evicted beyond this
+        :param corpus_version: Blocking callable returning the corpus version (run in a thread)
+        :param version_check_seconds: Minimum interval between two version checks
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.corpus_version = corpus_version
+        self.version_check_seconds = version_check_seconds
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._version: str | None = None
+        self._version_checked_at = float("-inf")
+        self._version_task: asyncio.Task | None = None
+        # Bumped by invalidate(): fetches started before are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_env(cls, corpus_version: Callable[[], str] | None = None) -> "RetrievalCache":
+        """Build a cache configured by RAG_CACHE_TTL_SECONDS, RAG_CACHE_MAX_ENTRIES and RAG_CACHE_VERSION_CHECK_SECONDS."""
+        return cls(
+            ttl_seconds=float(os.getenv("RAG_CACHE_TTL_SECONDS", "3600")),
+            max_entries=int(os.getenv("RAG_CACHE_MAX_ENTRIES", "1024")),
+            corpus_version=corpus_version,
+            version_check_seconds=float(os.getenv("RAG_CACHE_VERSION_CHECK_SECONDS", "300")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self) -> None:
+        """Drop every cached result."""
+        self._entries.clear()
+        self._generation += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    def _schedule_version_check(self) -> None:
+        """
+        Start a corpus version check in the background when one is due: lookups
+        are served from the current generation meanwhile, and a version change
+        clears the cache once the check completes.
+        """
+        if self.corpus_version is None:
+            return
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_seconds:
+            return
+        # Set before the check runs so that concurrent lookups do not start another
+        self._version_checked_at = now
+        self._version_task = asyncio.ensure_future(self._check_version())
+
+    async def _check_version(self) -> None:
+        try:
+            version = await asyncio.to_thread(self.corpus_version)
+        except Exception as e:
+            logging.warning(f"Could not read the RAG corpus version: {e}")
+            return
+        if self._version is not None and version != self._version:
+            logging.info(f"RAG corpus version changed ({self._version} -> {version}), cache cleared")
+            self.invalidate()
+        self._version = version
+
+    async def get_or_fetch(self, query: str, fetch: Callable[[], Awaitable[Any]], scope: str = "") -> Any:
+        """
+        Return the cached result for a query, or fetch it once.
+
+        :param query: The query text (normalized for the key)
+        :param fetch: Coroutine function performing the retrieval
+        :param scope: Retrieval settings that are part of the key (corpora, top k...)
+        :return: The retrieval result
+        """
+        self._schedule_version_check()
+        key = f"{scope}\x00{normalize_query(query)}"
+
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            rag_retrievals.add(1, {"result": "hit"})
+            return entry[1]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            rag_retrievals.add(1, {"result": "coalesced"})
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        rag_retrievals.add(1, {"result": "miss"})
+        # The fetch runs in its own task: cancelling the first caller does not fail the others
+        task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        generation = self._generation
+        try:
+            result = await fetch()
+            if generation != self._generation:
+                return result
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return result
+        finally:
+            self._inflight.pop(key, None)
@@ -0,0 +1,156 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import codecs
+import json
+import logging
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi import HTTPException
+from starlette.types import ASGIApp, Message
+
+_END_OF_STREAM: Message = {"type": "adn.end_of_stream"}
+
+
+async def iter_asgi_sse_events(
+    app: ASGIApp,
+    path: str,
+    payload: dict[str, Any],
+    max_buffered_chunks: int = 16,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    POST a JSON payload to an SSE endpoint of an in-process ASGI app and yield
+    each decoded `data:` event as soon as it is produced.
+
+    Unlike TestClient, nothing is buffered beyond the current partial chunk:
+    body chunks go through a bounded queue, so when the consumer stops reading
+    the producing endpoint blocks on `send` (backpressure).
+
+    :param app: The ASGI application serving the endpoint
+    :param path: The endpoint path (e.g. "/run_sse")
+    :param payload: The JSON body of the request
+    :param max_buffered_chunks: Maximum number of body chunks held in memory
+    :return: An async iterator over the decoded SSE events
+    """
+    body = json.dumps(payload).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 80),
+    }
+    queue: asyncio.Queue[Message] = asyncio.Queue(maxsize=max_buffered_chunks)
+    disconnected = asyncio.Event()
+    request_sent = False
+
+    async def receive() -> Message:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        await queue.put(message)
+
+    async def run_app() -> None:
+        try:
+            await app(scope, receive, send)
+        finally:
+            await queue.put(_END_OF_STREAM)
+
+    task = asyncio.create_task(run_app())
+    buffer = ""
+    # A multi-byte character (accented French text) may be split across chunks
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    status_code = 200
+    error_body = b""
+    try:
+        while True:
+            message = await queue.get()
+            if message is _END_OF_STREAM:
+                break
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                continue
+            if message["type"] != "http.response.body":
+                continue
+
+            chunk = message.get("body", b"")
+            if status_code >= 400:
+                error_body += chunk
+            else:
+                buffer += decoder.decode(chunk)
+                # SSE events are separated by a blank line
+                while "\n\n" in buffer:
+                    raw_event, buffer = buffer.split("\n\n", 1)
+                    event = _decode_sse_event(raw_event)
+                    if event is not None:
+                        yield event
+
+            if not message.get("more_body", False):
+                break
+
+        if status_code >= 400:
+            raise HTTPException(
+                status_code=status_code,
+                detail=f"Agent error: {error_body.decode('utf-8', 'replace')[:500]}",
+            )
+        buffer += decoder.decode(b"", final=True)
+        if buffer.strip():
+            event = _decode_sse_event(buffer)
+            if event is not None:
+                yield event
+    finally:
+        disconnected.set()
+        if not task.done():
+            task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.warning(f"In-process SSE request to {path} failed: {e}")
+
+
+def _decode_sse_event(raw_event: str) -> dict[str, Any] | None:
+    """
+    Decode the `data:` lines of a single SSE event.
+
+    :param raw_event: The raw event text, without the trailing blank line
+    :return: The decoded JSON event, or None if it carries no valid data
+    """
+    data = "\n".join(
+        line[5:].lstrip() for line in raw_event.splitlines() if line.startswith("data:")
+    )
+    if not data:
+        return None
+    try:
+        return json.loads(data)
+    except json.JSONDecodeError:
+        return None
@@ -0,0 +1,89 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from opentelemetry import metrics, trace
+from opentelemetry.trace import Span
+
+# Proxies: they resolve to the providers installed by the server (or a test)
+tracer = trace.get_tracer("adn.pipeline")
+meter = metrics.get_meter("adn.pipeline")
+
+stage_duration = meter.create_histogram(
+    "adn.pipeline.stage.duration",
+    unit="ms",
+    description="Duration of the clinical pipeline stages (phases, table reads, LLM calls)",
+)
+llm_tokens = meter.create_counter(
+    "adn.llm.tokens",
+    unit="{token}",
+    description="Tokens consumed by LLM calls, by stage and token type",
+)
+llm_latency = meter.create_histogram(
+    "adn.llm.latency",
+    unit="ms",
+    description="Latency of the model calls (without admission wait), by model and stage",
+)
+llm_queue_depth = meter.create_up_down_counter(
+    "adn.llm.queue.depth",
+    unit="{request}",
+    description="LLM calls waiting for admission, by priority",
+)
+llm_queue_wait = meter.create_histogram(
+    "adn.llm.queue.wait",
+    unit="ms",
+    description="Time spent by LLM calls waiting for admission",
+)
+llm_retries = meter.create_counter(
+    "adn.llm.retries",
+    unit="{retry}",
+    description="LLM calls retried after a quota error",
+)
+
+rag_retrievals = meter.create_counter(
+    "adn.rag.retrievals",
+    unit="{retrieval}",
+    description="RAG retrievals by cache result (hit, miss, coalesced)",
+)
+
+
+@contextmanager
+def phase_span(stage: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Trace a pipeline stage and record its duration in the stage histogram.
+
+    :param stage: The stage name (e.g. "synthesizer.critique")
+    :param attributes: Additional span attributes
+    :return: The active span, for attributes known only at the end
+    """
+    start = time.perf_counter()
+    status = "ok"
+    with tracer.start_as_current_span(
+        f"adn.{stage}", attributes={"adn.stage": stage, **attributes}
+    ) as span:
+        try:
+            yield span
+        except Exception:
+            # The span itself records the exception and its error status
+            status = "error"
+            raise
+        finally:
+            stage_duration.record(
+                (time.perf_counter() - start) * 1000,
+                {"stage": stage, "status": status},
+            )
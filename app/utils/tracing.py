@@ -14,14 +14,92 @@
 
 import json
 import logging
-from collections.abc import Sequence
+import os
+import queue
+import threading
+import time
+from collections.abc import Mapping, Sequence
 from typing import Any
 
 import google.cloud.storage as storage
 from google.cloud import logging as google_cloud_logging
+from opentelemetry import trace as trace_api
 from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
 from opentelemetry.sdk.trace import ReadableSpan
-from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.sdk.metrics.export import MetricReader, PeriodicExportingMetricReader
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.sdk.util import ns_to_iso_str
+
+_STOP_UPLOADS = object()
+
+# Cloud Logging entries are limited to 256 KB
+MAX_ATTRIBUTES_BYTES = 255 * 1024
+# Room kept for the GCS references added when attributes are offloaded
+ATTRIBUTES_REFERENCE_BYTES = 1024
+
+
+def _json_attributes(attributes: Mapping[str, Any] | None) -> dict[str, Any]:
+    """Copy span attributes into JSON-compatible values (tuples become lists)."""
+    if not attributes:
+        return {}
+    return {
+        key: list(value) if isinstance(value, tuple) else value
+        for key, value in attributes.items()
+    }
+
+
+def span_to_dict(span: ReadableSpan) -> dict[str, Any]:
+    """
+    Build the same structure as `ReadableSpan.to_json()` directly as a dict,
+    without the JSON encode/decode round trip.
+
+    :param span: The span to convert
+    :return: The span data dictionary
+    """
+    context = span.get_span_context()
+    status = {"status_code": str(span.status.status_code.name)}
+    if span.status.description:
+        status["description"] = span.status.description
+
+    return {
+        "name": span.name,
+        "context": {
+            "trace_id": f"0x{trace_api.format_trace_id(context.trace_id)}",
+            "span_id": f"0x{trace_api.format_span_id(context.span_id)}",
+            "trace_state": repr(context.trace_state),
+        },
+        "kind": str(span.kind),
+        "parent_id": (
+            f"0x{trace_api.format_span_id(span.parent.span_id)}" if span.parent else None
+        ),
+        "start_time": ns_to_iso_str(span.start_time) if span.start_time else None,
+        "end_time": ns_to_iso_str(span.end_time) if span.end_time else None,
+        "status": status,
+        "attributes": _json_attributes(span.attributes),
+        "events": [
+            {
+                "name": event.name,
+                "timestamp": ns_to_iso_str(event.timestamp),
+                "attributes": _json_attributes(event.attributes),
+            }
+            for event in span.events
+        ],
+        "links": [
+            {
+                "context": {
+                    "trace_id": f"0x{trace_api.format_trace_id(link.context.trace_id)}",
+                    "span_id": f"0x{trace_api.format_span_id(link.context.span_id)}",
+                    "trace_state": repr(link.context.trace_state),
+                },
+                "attributes": _json_attributes(link.attributes),
+            }
+            for link in span.links
+        ],
+        "resource": {
+            "attributes": _json_attributes(span.resource.attributes),
+            "schema_url": span.resource.schema_url,
+        },
+    }
 
 
 class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
@@ -31,6 +109,10 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
 
     This class helps bypass the 256 character limit of Cloud Trace for attribute values
     by leveraging Cloud Logging (which has a 256KB limit) and Cloud Storage for larger payloads.
+
+    All spans of an export call are written in a single Cloud Logging batch, and
+    large payloads are uploaded to GCS by a background thread so that exports
+    never wait on Cloud Storage.
     """
 
     def __init__(
@@ -39,6 +121,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         storage_client: storage.Client | None = None,
         bucket_name: str | None = None,
         debug: bool = False,
+        max_pending_uploads: int = 64,
         **kwargs: Any,
     ) -> None:
         """
@@ -48,6 +131,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param storage_client: Google Cloud Storage client
         :param bucket_name: Name of the GCS bucket to store large payloads
         :param debug: Enable debug mode for additional logging
+        :param max_pending_uploads: Maximum number of payloads waiting for upload to GCS
         :param kwargs: Additional arguments to pass to the parent class
         """
         super().__init__(**kwargs)
@@ -61,6 +145,10 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             bucket_name or f"{self.project_id}-adn-agent-logs"
         )
         self.bucket = self.storage_client.bucket(self.bucket_name)
+        self._bucket_exists: bool | None = None
+        self._uploads: queue.Queue = queue.Queue(maxsize=max_pending_uploads)
+        self._upload_thread: threading.Thread | None = None
+        self._upload_thread_lock = threading.Lock()
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """
@@ -69,83 +157,338 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param spans: A sequence of spans to export
         :return: The result of the export operation
         """
-        for span in spans:
-            span_context = span.get_span_context()
-            trace_id = format(span_context.trace_id, "x")
-            span_id = format(span_context.span_id, "x")
-            span_dict = json.loads(span.to_json())
+        # Log the span data to Google Cloud Logging in a single API call
+        with self.logger.batch() as batch:
+            for span in spans:
+                span_context = span.get_span_context()
+                trace_id = format(span_context.trace_id, "x")
+                span_id = format(span_context.span_id, "x")
+                span_dict = span_to_dict(span)
 
-            span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
-            span_dict["span_id"] = span_id
+                span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
+                span_dict["span_id"] = span_id
 
-            span_dict = self._process_large_attributes(
-                span_dict=span_dict, span_id=span_id
-            )
+                span_dict = self._process_large_attributes(
+                    span_dict=span_dict, span_id=span_id
+                )
 
-            if self.debug:
-                print(span_dict)
+                if self.debug:
+                    print(span_dict)
 
-            # Log the span data to Google Cloud Logging
-            self.logger.log_struct(
-                span_dict,
-                labels={
-                    "type": "agent_telemetry",
-                    "service_name": "adn-agent",
-                },
-                severity="INFO",
-            )
+                batch.log_struct(
+                    span_dict,
+                    labels={
+                        "type": "agent_telemetry",
+                        "service_name": "adn-agent",
+                    },
+                    severity="INFO",
+                )
         # Export spans to Google Cloud Trace using the parent class method
         return super().export(spans)
 
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """
+        Wait for the pending GCS uploads.
+
+        :param timeout_millis: Maximum time to wait in milliseconds
+        :return: True if all the uploads completed in time
+        """
+        deadline = time.monotonic() + timeout_millis / 1000
+        with self._uploads.all_tasks_done:
+            while self._uploads.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._uploads.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self) -> None:
+        """Flush the pending GCS uploads and stop the upload thread."""
+        self.force_flush()
+        if self._upload_thread is not None:
+            self._uploads.put(_STOP_UPLOADS)
+            self._upload_thread.join(timeout=5)
+        super().shutdown()
+
+    def bucket_exists(self) -> bool:
+        """
+        Check (once) whether the GCS bucket for large payloads exists.
+
+        :return: True if the bucket exists
+        """
+        if self._bucket_exists is None:
+            self._bucket_exists = self.bucket.exists()
+            if not self._bucket_exists:
+                logging.warning(
+                    f"Bucket {self.bucket_name} not found. "
+                    "Unable to store span attributes in GCS."
+                )
+        return self._bucket_exists
+
     def store_in_gcs(self, content: str, span_id: str) -> str:
         """
-        Initiate storing large content in Google Cloud Storage/
+        Schedule storing large content in Google Cloud Storage.
+
+        The upload runs on a background thread; the returned URI is known
+        upfront since the blob name only depends on the span ID.
 
         :param content: The content to store
         :param span_id: The ID of the span
         :return: The  GCS URI of the stored content
         """
-        if not self.storage_client.bucket(self.bucket_name).exists():
-            logging.warning(
-                f"Bucket {self.bucket_name} not found. "
-                "Unable to store span attributes in GCS."
-            )
+        if not self.bucket_exists():
             return "GCS bucket not found"
 
         blob_name = f"spans/{span_id}.json"
-        blob = self.bucket.blob(blob_name)
-
-        blob.upload_from_string(content, "application/json")
+        self._start_upload_thread()
+        try:
+            self._uploads.put_nowait((blob_name, content))
+        except queue.Full:
+            logging.warning(
+                f"GCS upload queue full, dropping span attributes of {span_id}"
+            )
+            return "GCS upload queue full"
         return f"gs://{self.bucket_name}/{blob_name}"
 
+    def _start_upload_thread(self) -> None:
+        """Start the background GCS upload thread on first use."""
+        if self._upload_thread is not None:
+            return
+        with self._upload_thread_lock:
+            if self._upload_thread is None:
+                self._upload_thread = threading.Thread(
+                    target=self._upload_worker, name="span-gcs-uploads", daemon=True
+                )
+                self._upload_thread.start()
+
+    def _upload_worker(self) -> None:
+        """Upload the queued payloads to GCS until shutdown."""
+        while True:
+            item = self._uploads.get()
+            try:
+                if item is _STOP_UPLOADS:
+                    return
+                blob_name, content = item
+                self.bucket.blob(blob_name).upload_from_string(
+                    content, "application/json"
+                )
+            except Exception as e:
+                logging.warning(f"Failed to upload span attributes to GCS: {e}")
+            finally:
+                self._uploads.task_done()
+
     def _process_large_attributes(self, span_dict: dict, span_id: str) -> dict:
         """
         Process large attribute values by storing them in GCS if they exceed the size
         limit of Google Cloud Logging.
 
+        Each attribute is JSON-encoded at most once: sizes are accumulated until
+        the limit is crossed, and only the largest attributes are moved to GCS
+        (as a payload assembled from the already encoded fragments).
+
         :param span_dict: The span data dictionary
-        :param trace_id: The trace ID
         :param span_id: The span ID
         :return: The updated span dictionary
         """
         attributes = span_dict["attributes"]
-        if len(json.dumps(attributes).encode()) > 255 * 1024:  # 250 KB
-            # Separate large payload from other attributes
-            attributes_payload = dict(attributes.items())
-            attributes_retain = dict(attributes.items())
-
-            # Store large payload in GCS
-            gcs_uri = self.store_in_gcs(json.dumps(attributes_payload), span_id)
-            attributes_retain["uri_payload"] = gcs_uri
-            attributes_retain["url_payload"] = (
-                f"https://storage.mtls.cloud.google.com/"
-                f"{self.bucket_name}/spans/{span_id}.json"
-            )
+        fragments: dict[str, str] = {}
+        total_size = 2  # enclosing braces
+        for key, value in attributes.items():
+            # ensure_ascii (the default) makes the string length the byte length
+            fragment = f"{json.dumps(key)}: {json.dumps(value, default=str)}"
+            fragments[key] = fragment
+            total_size += len(fragment) + 2  # ", " separator
+            if total_size > MAX_ATTRIBUTES_BYTES:
+                break
+        else:
+            return span_dict
 
-            span_dict["attributes"] = attributes_retain
-            logging.info(
-                "Length of payload span above 250 KB, storing attributes in GCS "
-                "to avoid large log entry errors"
-            )
+        # Above the limit: size the remaining attributes, then offload the
+        # largest ones until the retained attributes fit in the log entry
+        for key, value in attributes.items():
+            if key not in fragments:
+                fragment = f"{json.dumps(key)}: {json.dumps(value, default=str)}"
+                fragments[key] = fragment
+                total_size += len(fragment) + 2
+
+        offloaded: list[str] = []
+        for key in sorted(fragments, key=lambda k: len(fragments[k]), reverse=True):
+            if total_size <= MAX_ATTRIBUTES_BYTES - ATTRIBUTES_REFERENCE_BYTES:
+                break
+            offloaded.append(key)
+            total_size -= len(fragments[key]) + 2
+
+        # Store large payload in GCS
+        payload = "{" + ", ".join(fragments[key] for key in offloaded) + "}"
+        gcs_uri = self.store_in_gcs(payload, span_id)
+
+        offloaded_keys = set(offloaded)
+        attributes_retain = {
+            key: value for key, value in attributes.items() if key not in offloaded_keys
+        }
+        attributes_retain["offloaded_attributes"] = offloaded
+        attributes_retain["uri_payload"] = gcs_uri
+        attributes_retain["url_payload"] = (
+            f"https://storage.mtls.cloud.google.com/"
+            f"{self.bucket_name}/spans/{span_id}.json"
+        )
+
+        span_dict["attributes"] = attributes_retain
+        logging.info(
+            f"Length of payload span above 250 KB, storing {len(offloaded)} "
+            "attributes in GCS to avoid large log entry errors"
+        )
 
         return span_dict
+
+
+class JsonlFileSpanExporter(SpanExporter):
+    """
+    Offline span sink: appends one JSON line per span to a local file,
+    rotated by size like logging.handlers.RotatingFileHandler.
+
+    Each export call is encoded in memory and written with a single buffered
+    write, so it can stay enabled during load tests.
+    """
+
+    def __init__(
+        self,
+        path: str = "traces/spans.jsonl",
+        max_bytes: int = 50 * 1024 * 1024,
+        backup_count: int = 5,
+    ) -> None:
+        """
+        :param path: Path of the JSONL file
+        :param max_bytes: Size after which the file is rotated (0 disables rotation)
+        :param backup_count: Number of rotated files kept (path.1 ... path.N)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        """
+        Append the spans to the JSONL file.
+
+        :param spans: A sequence of spans to export
+        :return: The result of the export operation
+        """
+        data = b"".join(
+            json.dumps(
+                span_to_dict(span), separators=(",", ":"), ensure_ascii=False, default=str
+            ).encode()
+            + b"\n"
+            for span in spans
+        )
+        try:
+            with self._lock:
+                if self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+                    self._rotate()
+                self._file.write(data)
+                self._file.flush()
+                self._size += len(data)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Failed to write spans to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Flush the file buffer."""
+        with self._lock:
+            self._file.flush()
+        return True
+
+    def shutdown(self) -> None:
+        """Close the file."""
+        with self._lock:
+            self._file.close()
+
+    def _rotate(self) -> None:
+        """Shift path -> path.1 -> ... -> path.N and reopen an empty file."""
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+            self._file = open(self.path, "ab")
+        else:
+            self._file = open(self.path, "wb")
+        self._size = 0
+
+
+TRACE_EXPORTERS = ("cloud", "otlp", "jsonl", "none")
+
+
+def get_trace_exporter_kind() -> str:
+    """
+    Return the telemetry backend selected through TRACE_EXPORTER
+    (cloud, otlp, jsonl or none; defaults to cloud).
+    """
+    kind = os.getenv("TRACE_EXPORTER", "cloud").strip().lower()
+    if kind not in TRACE_EXPORTERS:
+        logging.warning(f"Unknown TRACE_EXPORTER '{kind}', falling back to 'cloud'")
+        return "cloud"
+    return kind
+
+
+def create_span_exporter(kind: str | None = None) -> SpanExporter | None:
+    """
+    Build the span exporter for the selected telemetry backend.
+
+    - cloud: Cloud Trace + Cloud Logging (large payloads in GCS)
+    - otlp: OTLP/HTTP to a collector (OTEL_EXPORTER_OTLP_ENDPOINT, default localhost:4318)
+    - jsonl: rotating local file (TRACE_JSONL_PATH, TRACE_JSONL_MAX_BYTES,
+      TRACE_JSONL_BACKUP_COUNT)
+    - none: no export
+
+    :param kind: The backend, or None to read TRACE_EXPORTER
+    :return: The span exporter, or None when tracing export is disabled
+    """
+    kind = kind or get_trace_exporter_kind()
+    if kind == "cloud":
+        return CloudTraceLoggingSpanExporter()
+    if kind == "otlp":
+        # Only needed for local collectors: imported on demand
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    if kind == "jsonl":
+        return JsonlFileSpanExporter(
+            path=os.getenv("TRACE_JSONL_PATH", "traces/spans.jsonl"),
+            max_bytes=int(os.getenv("TRACE_JSONL_MAX_BYTES", str(50 * 1024 * 1024))),
+            backup_count=int(os.getenv("TRACE_JSONL_BACKUP_COUNT", "5")),
+        )
+    return None
+
+
+def create_metric_reader(
+    kind: str | None = None, project_id: str | None = None
+) -> MetricReader | None:
+    """
+    Build the metric reader matching the selected telemetry backend.
+
+    Only cloud (Cloud Monitoring) and otlp export metrics; with jsonl or none
+    the instruments are still recorded but not exported.
+
+    :param kind: The backend, or None to read TRACE_EXPORTER
+    :param project_id: The project for Cloud Monitoring
+    :return: The metric reader, or None when metrics are not exported
+    """
+    kind = kind or get_trace_exporter_kind()
+    if kind == "cloud":
+        from opentelemetry.exporter.cloud_monitoring import CloudMonitoringMetricsExporter
+
+        exporter = CloudMonitoringMetricsExporter(project_id=project_id)
+    elif kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+
+        exporter = OTLPMetricExporter()
+    else:
+        return None
+    return PeriodicExportingMetricReader(exporter, export_interval_millis=60000)
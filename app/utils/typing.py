@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import uuid
-from typing import (Literal, Optional, Dict, Any)
+from typing import (Literal, Optional, Dict, Any, List)
 
 from google.adk.events.event import Event
 from google.genai.types import Content
@@ -57,3 +57,5 @@ class SendMessageRequest(BaseModel):
 class GetStateRequest(BaseModel):
     user_id: Optional[str] = None
     session_id: Optional[str] = None
+    # State keys to return (None: whole state, []: session metadata only)
+    fields: Optional[List[str]] = None
@@ -1,14 +1,19 @@
 # generate_emergency_calls.py
-import vertexai
-from vertexai.generative_models import GenerativeModel
+import sys
 import json
 import os
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.utils.llm import PRIORITY_BATCH, generate_content, get_model, llm_priority
 
 # Configuration
 GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
-vertexai.init(project=GCP_PROJECT_ID, location="europe-west1")
 MODEL_NAME = "gemini-2.0-flash"
-model = GenerativeModel(MODEL_NAME)
+# Modèle partagé (europe-west1 par défaut, voir GCP_REGION)
+model = get_model(MODEL_NAME, project_id=GCP_PROJECT_ID)
 
 # Scénarios d'urgence
 scenarios = [
@@ -55,13 +60,17 @@ CONSIGNES:
 GÉNÈRE LE JSON COMPLET:"""
 
     try:
-        response = model.generate_content(
-            prompt,
-            generation_config={
-                "temperature": 0.8,
-                "max_output_tokens": 2048,
-            }
-        )
+        # Passe par le planificateur LLM, après les appels interactifs
+        with llm_priority(PRIORITY_BATCH):
+            response = generate_content(
+                model,
+                prompt,
+                stage="generator.transcript",
+                generation_config={
+                    "temperature": 0.8,
+                    "max_output_tokens": 2048,
+                }
+            )
         
         # Extraire JSON
         text = response.text
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Entraînement et benchmark du classifieur local ARM face au LLM
+
+1. Étiquette les transcripts de scripts/appel_urgneces_generator.py avec le LLM
+   (étiquettes et latences mises en cache)
+2. Entraîne le classifieur local sur une partie des transcripts
+3. Mesure sur le reste : latence, accord avec le LLM, part des appels traités
+   localement selon le seuil de confiance
+4. Réentraîne sur tous les transcripts et enregistre le modèle (ARM_LOCAL_MODEL)
+
+Usage:
+    uv run python scripts/benchmark_arm_classifier.py --dataset emergency_calls_dataset.json \
+        --sortie arm_local_model.npz [--seuil 0.8]
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.agents.ARM.classifier_agent import ARMClassifierAgent
+from app.agents.ARM.local_classifier import ClassifieurLocal, texte_transcript
+from app.utils.llm import PRIORITY_BATCH, llm_priority
+
+SEUILS = [0.5, 0.6, 0.7, 0.8, 0.9, 0.95]
+
+
+async def etiqueter_avec_llm(textes, concurrence):
+    """Classification LLM de chaque transcript, avec sa latence"""
+    agent = ARMClassifierAgent()
+    agent.classifieur_local = None
+    semaphore = asyncio.Semaphore(concurrence)
+
+    async def etiqueter(texte):
+        async with semaphore:
+            debut = time.perf_counter()
+            resultat = await agent.classifier_avec_llm(texte)
+            return {
+                "classifications": resultat["classifications"],
+                "latence_ms": (time.perf_counter() - debut) * 1000,
+            }
+
+    with llm_priority(PRIORITY_BATCH):
+        return await asyncio.gather(*(etiqueter(t) for t in textes))
+
+
+def charger_etiquettes(chemin, textes, concurrence):
+    """Étiquettes LLM depuis le cache, ou calculées puis mises en cache"""
+    if Path(chemin).exists():
+        cache = json.loads(Path(chemin).read_text(encoding="utf-8"))
+        if len(cache) == len(textes):
+            print(f"📦 Étiquettes LLM lues depuis {chemin}")
+            return cache
+        print(f"⚠️ {chemin} ne correspond pas au dataset, nouvel étiquetage")
+    print(f"🤖 Étiquetage de {len(textes)} transcripts par le LLM...")
+    etiquettes = asyncio.run(etiqueter_avec_llm(textes, concurrence))
+    Path(chemin).write_text(json.dumps(etiquettes, ensure_ascii=False, indent=2), encoding="utf-8")
+    return etiquettes
+
+
+def evaluer(modele, textes, etiquettes, seuils):
+    """Latences (ms) et accord avec le LLM du classifieur local"""
+    predictions, latences = [], []
+    for texte in textes:
+        debut = time.perf_counter()
+        predictions.append(modele.predire(texte))
+        latences.append((time.perf_counter() - debut) * 1000)
+
+    exact = [set(p["classifications"]) == set(e) for p, e in zip(predictions, etiquettes)]
+    top1 = [p["classifications"][0] in e for p, e in zip(predictions, etiquettes)]
+    par_seuil = []
+    for seuil in seuils:
+        locaux = [i for i, p in enumerate(predictions) if p["confidence"] >= seuil]
+        par_seuil.append({
+            "seuil": seuil,
+            "local": len(locaux) / max(len(predictions), 1),
+            "accord_top1": float(np.mean([top1[i] for i in locaux])) if locaux else float("nan"),
+        })
+    return {
+        "latences": np.array(latences),
+        "accord_exact": float(np.mean(exact)) if exact else float("nan"),
+        "accord_top1": float(np.mean(top1)) if top1 else float("nan"),
+        "par_seuil": par_seuil,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du classifieur local ARM")
+    parser.add_argument("--dataset", default="emergency_calls_dataset.json",
+                        help="Transcripts générés par scripts/appel_urgneces_generator.py")
+    parser.add_argument("--etiquettes", default="arm_llm_labels.json", help="Cache des étiquettes LLM")
+    parser.add_argument("--sortie", default="arm_local_model.npz", help="Modèle entraîné sur tout le dataset")
+    parser.add_argument("--seuil", type=float, default=0.8, help="Seuil de confiance (ARM_LOCAL_THRESHOLD)")
+    parser.add_argument("--part-test", type=float, default=0.3, help="Part des transcripts gardée pour le test")
+    parser.add_argument("--concurrence", type=int, default=4, help="Appels LLM simultanés pour l'étiquetage")
+    parser.add_argument("--graine", type=int, default=0)
+    args = parser.parse_args()
+
+    if not Path(args.dataset).exists():
+        print(f"❌ Le dataset '{args.dataset}' n'existe pas (lancer d'abord scripts/appel_urgneces_generator.py)")
+        sys.exit(1)
+
+    appels = json.loads(Path(args.dataset).read_text(encoding="utf-8"))
+    textes = [texte_transcript(appel) for appel in appels]
+    etiquetage = charger_etiquettes(args.etiquettes, textes, args.concurrence)
+    etiquettes = [e["classifications"] for e in etiquetage]
+    latences_llm = np.array([e["latence_ms"] for e in etiquetage if e.get("latence_ms") is not None])
+
+    ordre = list(range(len(textes)))
+    random.Random(args.graine).shuffle(ordre)
+    n_test = max(1, int(len(ordre) * args.part_test))
+    test, entrainement = ordre[:n_test], ordre[n_test:]
+    print(f"\n📚 Entraînement sur {len(entrainement)} transcripts, test sur {len(test)}")
+
+    debut = time.perf_counter()
+    modele = ClassifieurLocal.entrainer(
+        [textes[i] for i in entrainement], [etiquettes[i] for i in entrainement], ARMClassifierAgent.PATHOLOGIES
+    )
+    print(f"   Entraîné en {time.perf_counter() - debut:.2f}s ({len(modele.vocabulaire)} termes)")
+
+    resultats = evaluer(modele, [textes[i] for i in test], [etiquettes[i] for i in test], SEUILS)
+    latences = resultats["latences"]
+
+    print("\n⏱️  LATENCE PAR TRANSCRIPT")
+    print(f"   Local : p50 {np.percentile(latences, 50):.3f} ms, p99 {np.percentile(latences, 99):.3f} ms")
+    if len(latences_llm):
+        print(f"   LLM   : p50 {np.percentile(latences_llm, 50):.0f} ms, p99 {np.percentile(latences_llm, 99):.0f} ms")
+
+    print("\n🎯 ACCORD AVEC LE LLM (jeu de test)")
+    print(f"   Ensemble identique : {resultats['accord_exact']:.1%}")
+    print(f"   Pathologie principale retenue par le LLM : {resultats['accord_top1']:.1%}")
+    print("\n   Seuil   Traités localement   Accord (top 1) sur ceux-ci")
+    for ligne in resultats["par_seuil"]:
+        marque = "  ◀" if abs(ligne["seuil"] - args.seuil) < 1e-9 else ""
+        print(f"   {ligne['seuil']:.2f}    {ligne['local']:>8.1%}             {ligne['accord_top1']:>6.1%}{marque}")
+
+    modele_final = ClassifieurLocal.entrainer(textes, etiquettes, ARMClassifierAgent.PATHOLOGIES)
+    modele_final.sauvegarder(args.sortie)
+    print(f"\n✅ Modèle entraîné sur les {len(textes)} transcripts enregistré dans {args.sortie}")
+    print(f"   (ARM_LOCAL_MODEL={args.sortie}, ARM_LOCAL_THRESHOLD={args.seuil})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Construction de l'index local des guidelines (fiches SFMU nettoyées par scripts/clean.py)
+
+Index BM25, plus embeddings denses optionnels (Vertex AI), persisté dans un dossier
+chargé par l'Agent Expert (GUIDELINE_INDEX_DIR). La source est lue depuis le corpus
+JSONL par section (corpus_sections.jsonl) s'il existe, sinon depuis les fiches .txt.
+
+Usage:
+    uv run python scripts/build_guideline_index.py --source fiches_medicales_clean \
+        --output guideline_index [--dense] [--query "douleur thoracique"]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.utils.guideline_index import (
+    DEFAULT_EMBEDDING_MODEL,
+    GuidelineIndex,
+    load_passages,
+    vertex_embedder,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construction de l'index local des guidelines")
+    parser.add_argument("--source", default="fiches_medicales_clean", help="Dossier des fiches nettoyées ou fichier JSONL des sections")
+    parser.add_argument("--output", default="guideline_index", help="Dossier de l'index")
+    parser.add_argument("--dense", action="store_true", help="Ajouter les embeddings denses (Vertex AI)")
+    parser.add_argument("--embedding-model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--query", help="Requête de test après construction")
+    parser.add_argument("--section-type", action="append",
+                        help="Limiter la requête de test à un type de section (ex: arm_priorite), répétable")
+    args = parser.parse_args()
+
+    if not Path(args.source).exists():
+        print(f"❌ Le dossier '{args.source}' n'existe pas (lancer d'abord scripts/clean.py)")
+        sys.exit(1)
+
+    debut = time.perf_counter()
+    passages = load_passages(args.source)
+    print(f"📄 {len(passages)} passages lus depuis {args.source}")
+
+    embedder = vertex_embedder(args.embedding_model) if args.dense else None
+    index = GuidelineIndex.build(
+        passages, embedder=embedder, embedding_model=args.embedding_model if args.dense else None
+    )
+    index.save(args.output)
+    print(f"✅ Index écrit dans {args.output}/ ({len(index.vocabulary)} termes, "
+          f"{time.perf_counter() - debut:.1f}s)")
+
+    if args.query:
+        index = GuidelineIndex.load(args.output, embedder=embedder)
+        debut = time.perf_counter()
+        where = {"section_type": args.section_type} if args.section_type else None
+        resultats = index.search(args.query, k=5, where=where)
+        print(f"\n🔍 \"{args.query}\" ({(time.perf_counter() - debut) * 1000:.1f} ms)")
+        for passage in resultats:
+            print(f"   {passage['score']:.3f}  {passage['title']} - {passage['section']}")
+
+
+if __name__ == "__main__":
+    main()
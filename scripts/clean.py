@@ -6,7 +6,49 @@ Supprime les éléments de navigation, les répétitions et garde seulement le c
 
 import os
 import re
+import json
+import hashlib
+import argparse
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# Version des règles de nettoyage : à incrémenter quand la logique change,
+# pour forcer le retraitement des fichiers déjà nettoyés
+VERSION_NETTOYAGE = 2
+
+# Manifeste des empreintes des fichiers sources, dans le dossier de sortie
+NOM_MANIFESTE = "_manifeste_nettoyage.json"
+
+# Corpus structuré : une ligne JSON par section de fiche, dans le dossier de sortie
+NOM_CORPUS_JSONL = "corpus_sections.jsonl"
+
+# Types de section du corpus JSONL et leur intitulé dans les fiches formatées
+TYPES_SECTIONS = {
+    'introduction': "INTRODUCTION",
+    'arm_priorite': "ASSISTANT DE RÉGULATION MÉDICALE (ARM) - Niveau de priorité",
+    'arm_savoir': "ASSISTANT DE RÉGULATION MÉDICALE (ARM) - Éléments à rechercher",
+    'arm_conseils': "ASSISTANT DE RÉGULATION MÉDICALE (ARM) - Conseils en attendant les secours",
+    'arm_adaptation': "ASSISTANT DE RÉGULATION MÉDICALE (ARM) - Adaptation si régulation différée",
+    'medecin_regulateur': "MÉDECIN RÉGULATEUR",
+}
+
+
+def empreinte_fichier(chemin):
+    """
+    Empreinte SHA-256 du contenu d'un fichier, lue par blocs
+    
+    Args:
+        chemin: Chemin du fichier
+        
+    Returns:
+        L'empreinte hexadécimale
+    """
+    h = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1 << 16), b''):
+            h.update(bloc)
+    return h.hexdigest()
+
 
 class NettoyeurFichiersMedicaux:
     def __init__(self, dossier_source="guide_medical_textes", dossier_sortie="fiches_medicales_clean"):
@@ -26,6 +68,7 @@ class NettoyeurFichiersMedicaux:
         # Compteurs
         self.fichiers_traites = 0
         self.fichiers_ignores = 0
+        self.fichiers_inchanges = 0
         
         # Éléments à supprimer (navigation du site)
         self.elements_inutiles = [
@@ -60,6 +103,17 @@ class NettoyeurFichiersMedicaux:
             "Tout déplier | Tout replier",
             "Date de mise à jour :"
         ]
+        
+        # Une seule alternation compilée au lieu de tester chaque élément sur chaque ligne
+        # (les plus longs d'abord, pour que le moteur s'arrête au premier motif trouvé)
+        self.motif_navigation = re.compile("|".join(
+            re.escape(elem) for elem in sorted(self.elements_inutiles, key=len, reverse=True)
+        ))
+        
+        # Empreinte des règles : un changement de filtres invalide le manifeste
+        self.empreinte_regles = hashlib.sha256(
+            json.dumps([VERSION_NETTOYAGE, self.elements_inutiles]).encode('utf-8')
+        ).hexdigest()
     
     def nettoyer_texte(self, contenu):
         """
@@ -71,15 +125,26 @@ class NettoyeurFichiersMedicaux:
         Returns:
             Le texte nettoyé
         """
-        lignes = contenu.split('\n')
-        lignes_propres = []
+        return '\n'.join(self.nettoyer_lignes(contenu.split('\n')))
+    
+    def nettoyer_lignes(self, lignes):
+        """
+        Nettoie un flux de lignes (générateur : le fichier n'est jamais chargé en entier)
         
+        Args:
+            lignes: Itérable de lignes, fin de ligne comprise ou non (ex: un fichier ouvert)
+            
+        Returns:
+            Les lignes conservées, sans fin de ligne
+        """
         # Variables pour tracker où on est dans le fichier
         dans_header = True
         dans_contenu = False
         contenu_medical_commence = False
+        derniere_vide = False
         
         for ligne in lignes:
+            ligne = ligne.rstrip('\n')
             ligne_strip = ligne.strip()
             
             # Détecter le début du contenu médical
@@ -95,17 +160,18 @@ class NettoyeurFichiersMedicaux:
             # Si on est dans le header, garder certaines infos
             if dans_header:
                 if ligne.startswith("TITRE:") or ligne.startswith("URL:") or ligne.startswith("CATÉGORIE:"):
-                    lignes_propres.append(ligne)
+                    derniere_vide = not ligne_strip
+                    yield ligne
                 continue
             
             # Si on est dans le contenu
             if dans_contenu:
                 # Ignorer les lignes vides multiples
-                if not ligne_strip and lignes_propres and not lignes_propres[-1].strip():
+                if not ligne_strip and derniere_vide:
                     continue
                 
                 # Ignorer les éléments de navigation
-                if any(elem in ligne for elem in self.elements_inutiles):
+                if self.motif_navigation.search(ligne):
                     continue
                 
                 # Ignorer les lignes de séparation excessives
@@ -121,22 +187,22 @@ class NettoyeurFichiersMedicaux:
                 
                 # Si le contenu médical a commencé, garder la ligne
                 if contenu_medical_commence:
-                    lignes_propres.append(ligne)
-        
-        return '\n'.join(lignes_propres)
+                    derniere_vide = not ligne_strip
+                    yield ligne
     
     def extraire_contenu_medical(self, contenu):
         """
         Extrait uniquement le contenu médical structuré
         
         Args:
-            contenu: Le texte complet du fichier
+            contenu: Le texte complet du fichier, ou un itérable de lignes
             
         Returns:
             Dictionnaire avec le contenu médical structuré
         """
         sections = {
             'titre': '',
+            'url': '',
             'categorie': '',
             'introduction': '',
             'arm': {
@@ -149,7 +215,7 @@ class NettoyeurFichiersMedicaux:
             'autres': []
         }
         
-        lignes = contenu.split('\n')
+        lignes = contenu.split('\n') if isinstance(contenu, str) else contenu
         section_actuelle = None
         sous_section_arm = None
         buffer = []
@@ -162,6 +228,11 @@ class NettoyeurFichiersMedicaux:
                 sections['titre'] = ligne.replace("TITRE:", "").strip()
                 continue
             
+            # Extraire l'URL de la fiche
+            if ligne.startswith("URL:"):
+                sections['url'] = ligne.replace("URL:", "").strip()
+                continue
+            
             # Extraire la catégorie
             if ligne.startswith("CATÉGORIE:"):
                 sections['categorie'] = ligne.replace("CATÉGORIE:", "").strip()
@@ -265,6 +336,41 @@ class NettoyeurFichiersMedicaux:
         
         return '\n'.join(output)
     
+    def enregistrements_sections(self, sections, fiche):
+        """
+        Découpe une fiche structurée en enregistrements du corpus JSONL, un par section non vide
+        
+        Args:
+            sections: Dictionnaire renvoyé par extraire_contenu_medical
+            fiche: Chemin relatif de la fiche sans extension, base des identifiants
+            
+        Returns:
+            Liste d'enregistrements {id, fiche, titre, categorie, url, section_type, section, texte}
+        """
+        textes = {
+            'introduction': sections['introduction'],
+            'arm_priorite': sections['arm']['priorite'],
+            'arm_savoir': sections['arm']['savoir'],
+            'arm_conseils': sections['arm']['conseils'],
+            'arm_adaptation': sections['arm']['adaptation'],
+            'medecin_regulateur': sections['medecin_regulateur'],
+        }
+        return [
+            {
+                # Identifiant stable : ne dépend que du chemin de la fiche et du type de section
+                'id': f"{fiche}#{section_type}",
+                'fiche': fiche,
+                'titre': sections['titre'],
+                'categorie': sections['categorie'],
+                'url': sections['url'],
+                'section_type': section_type,
+                'section': TYPES_SECTIONS[section_type],
+                'texte': texte,
+            }
+            for section_type, texte in textes.items()
+            if texte
+        ]
+    
     def traiter_fichier(self, chemin_fichier):
         """
         Traite un fichier individuel
@@ -273,88 +379,190 @@ class NettoyeurFichiersMedicaux:
             chemin_fichier: Chemin complet du fichier à traiter
             
         Returns:
-            True si le fichier a été traité avec succès
+            Les enregistrements JSONL des sections du fichier, ou None en cas d'erreur
         """
         try:
-            # Lire le fichier
+            # Lire, nettoyer et structurer le fichier ligne par ligne
             with open(chemin_fichier, 'r', encoding='utf-8') as f:
-                contenu = f.read()
-            
-            # Nettoyer le contenu
-            contenu_nettoye = self.nettoyer_texte(contenu)
-            
-            # Extraire et structurer le contenu médical
-            sections = self.extraire_contenu_medical(contenu_nettoye)
+                sections = self.extraire_contenu_medical(self.nettoyer_lignes(f))
             
             # Formater proprement
             contenu_final = self.formater_fiche_propre(sections)
             
             # Déterminer le nom du fichier de sortie
             nom_fichier = os.path.basename(chemin_fichier)
-            
-            # Créer la structure de dossiers dans la sortie
-            chemin_relatif = os.path.relpath(chemin_fichier, self.dossier_source)
-            dossier_parent = os.path.dirname(chemin_relatif)
-            
-            if dossier_parent:
-                dossier_sortie_complet = os.path.join(self.dossier_sortie, dossier_parent)
-                os.makedirs(dossier_sortie_complet, exist_ok=True)
-            else:
-                dossier_sortie_complet = self.dossier_sortie
+            chemin_sortie = self.chemin_sortie(chemin_fichier)
+            os.makedirs(os.path.dirname(chemin_sortie), exist_ok=True)
             
             # Sauvegarder le fichier nettoyé
-            chemin_sortie = os.path.join(dossier_sortie_complet, nom_fichier)
             with open(chemin_sortie, 'w', encoding='utf-8') as f:
                 f.write(contenu_final)
             
             print(f"✅ Nettoyé: {nom_fichier}")
-            return True
+            fiche = os.path.splitext(os.path.relpath(chemin_fichier, self.dossier_source))[0]
+            return self.enregistrements_sections(sections, fiche.replace(os.sep, '/'))
             
         except Exception as e:
             print(f"❌ Erreur sur {chemin_fichier}: {e}")
-            return False
+            return None
     
-    def nettoyer_tous_les_fichiers(self):
+    def chemin_sortie(self, chemin_fichier):
+        """Chemin du fichier nettoyé (même arborescence que la source)"""
+        chemin_relatif = os.path.relpath(chemin_fichier, self.dossier_source)
+        return os.path.join(self.dossier_sortie, chemin_relatif)
+    
+    def _traiter_si_modifie(self, tache):
         """
-        Nettoie tous les fichiers du dossier source
+        Tâche d'un processus du pool : calcule l'empreinte et ne retraite que si elle a changé
+        
+        Args:
+            tache: (chemin du fichier, entrée du manifeste ou None)
+            
+        Returns:
+            (chemin relatif, entrée du manifeste, statut) avec statut "traite", "inchange" ou "erreur"
         """
-        print(f"\n🧹 NETTOYAGE DES FICHIERS MÉDICAUX")
-        print(f"{'=' * 60}")
-        print(f"📂 Dossier source: {self.dossier_source}")
-        print(f"📂 Dossier sortie: {self.dossier_sortie}")
-        print(f"{'=' * 60}\n")
+        chemin_fichier, entree_connue = tache
+        chemin_relatif = os.path.relpath(chemin_fichier, self.dossier_source)
+        try:
+            empreinte = empreinte_fichier(chemin_fichier)
+        except OSError as e:
+            print(f"❌ Erreur sur {chemin_fichier}: {e}")
+            return chemin_relatif, None, "erreur"
+        
+        if (entree_connue and entree_connue['empreinte'] == empreinte
+                and os.path.exists(self.chemin_sortie(chemin_fichier))):
+            return chemin_relatif, entree_connue, "inchange"
         
-        # Parcourir tous les fichiers
+        enregistrements = self.traiter_fichier(chemin_fichier)
+        if enregistrements is None:
+            return chemin_relatif, None, "erreur"
+        return chemin_relatif, {'empreinte': empreinte, 'sections': enregistrements}, "traite"
+    
+    def lister_fichiers(self):
+        """Liste les fichiers .txt à nettoyer (hors fichiers système)"""
+        fichiers = []
         for root, dirs, files in os.walk(self.dossier_source):
             # Ignorer les fichiers système
             files = [f for f in files if not f.startswith('_')]
             
-            for fichier in files:
+            for fichier in sorted(files):
                 if fichier.endswith('.txt'):
-                    chemin_complet = os.path.join(root, fichier)
-                    
-                    if self.traiter_fichier(chemin_complet):
-                        self.fichiers_traites += 1
-                    else:
-                        self.fichiers_ignores += 1
+                    fichiers.append(os.path.join(root, fichier))
+        return fichiers
+    
+    def charger_manifeste(self):
+        """Empreinte et sections des fichiers sources déjà nettoyés avec les règles actuelles"""
+        chemin = os.path.join(self.dossier_sortie, NOM_MANIFESTE)
+        if not os.path.exists(chemin):
+            return {}
+        try:
+            with open(chemin, 'r', encoding='utf-8') as f:
+                manifeste = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifeste.get('regles') != self.empreinte_regles:
+            return {}
+        return manifeste.get('fichiers', {})
+    
+    def sauvegarder_manifeste(self, fichiers):
+        chemin = os.path.join(self.dossier_sortie, NOM_MANIFESTE)
+        with open(chemin + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({
+                'regles': self.empreinte_regles,
+                'date': datetime.now().isoformat(),
+                'fichiers': fichiers
+            }, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(chemin + '.tmp', chemin)
+    
+    def ecrire_corpus_jsonl(self, fichiers):
+        """
+        Écrit le corpus JSONL de toutes les fiches, dans l'ordre des chemins
+        (les sections des fichiers inchangés viennent du manifeste, sans relecture)
+        
+        Args:
+            fichiers: Entrées du manifeste par chemin relatif
+            
+        Returns:
+            Le nombre de sections écrites
+        """
+        chemin = os.path.join(self.dossier_sortie, NOM_CORPUS_JSONL)
+        nb_sections = 0
+        with open(chemin + '.tmp', 'w', encoding='utf-8') as f:
+            for chemin_relatif in sorted(fichiers):
+                for enregistrement in fichiers[chemin_relatif]['sections']:
+                    f.write(json.dumps(enregistrement, ensure_ascii=False) + '\n')
+                    nb_sections += 1
+        os.replace(chemin + '.tmp', chemin)
+        return nb_sections
+    
+    def nettoyer_tous_les_fichiers(self, workers=None, forcer=False):
+        """
+        Nettoie tous les fichiers du dossier source, en parallèle
+        
+        Args:
+            workers: Nombre de processus (par défaut : nombre de CPU)
+            forcer: Retraiter même les fichiers dont le contenu n'a pas changé
+        """
+        print(f"\n🧹 NETTOYAGE DES FICHIERS MÉDICAUX")
+        print(f"{'=' * 60}")
+        print(f"📂 Dossier source: {self.dossier_source}")
+        print(f"📂 Dossier sortie: {self.dossier_sortie}")
+        print(f"{'=' * 60}\n")
+        
+        fichiers = self.lister_fichiers()
+        manifeste = {} if forcer else self.charger_manifeste()
+        taches = [
+            (chemin, manifeste.get(os.path.relpath(chemin, self.dossier_source)))
+            for chemin in fichiers
+        ]
+        
+        nouveau_manifeste = {}
+        if workers == 1:
+            resultats = map(self._traiter_si_modifie, taches)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            resultats = executor.map(self._traiter_si_modifie, taches, chunksize=16)
+        try:
+            for chemin_relatif, entree, statut in resultats:
+                if statut == "traite":
+                    self.fichiers_traites += 1
+                elif statut == "inchange":
+                    self.fichiers_inchanges += 1
+                else:
+                    self.fichiers_ignores += 1
+                # Un fichier en erreur n'est pas enregistré : il sera retenté au prochain passage
+                if statut != "erreur":
+                    nouveau_manifeste[chemin_relatif] = entree
+        finally:
+            if workers != 1:
+                executor.shutdown()
+        
+        self.sauvegarder_manifeste(nouveau_manifeste)
+        nb_sections = self.ecrire_corpus_jsonl(nouveau_manifeste)
         
         # Rapport final
         print(f"\n{'=' * 60}")
         print(f"📊 RAPPORT DE NETTOYAGE")
         print(f"{'=' * 60}")
         print(f"✅ Fichiers nettoyés: {self.fichiers_traites}")
+        print(f"⏭️  Fichiers inchangés: {self.fichiers_inchanges}")
         print(f"⚠️  Fichiers ignorés: {self.fichiers_ignores}")
         print(f"📁 Fichiers propres dans: {self.dossier_sortie}/")
+        print(f"🧾 Corpus JSONL: {nb_sections} sections dans {os.path.join(self.dossier_sortie, NOM_CORPUS_JSONL)}")
         print(f"{'=' * 60}\n")
 
 
 def main():
     """Fonction principale"""
-    import sys
-    
-    # Vérifier les arguments
-    dossier_source = sys.argv[1] if len(sys.argv) > 1 else "guide_medical_textes"
-    dossier_sortie = sys.argv[2] if len(sys.argv) > 2 else "fiches_medicales_clean"
+    parser = argparse.ArgumentParser(description="Nettoyage des fiches du Guide de Régulation Médicale")
+    parser.add_argument("dossier_source", nargs="?", default="guide_medical_textes")
+    parser.add_argument("dossier_sortie", nargs="?", default="fiches_medicales_clean")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (défaut : nombre de CPU)")
+    parser.add_argument("--force", action="store_true", help="Retraiter aussi les fichiers inchangés")
+    parser.add_argument("--yes", "-y", action="store_true", help="Ne pas demander de confirmation")
+    args = parser.parse_args()
+    dossier_source = args.dossier_source
+    dossier_sortie = args.dossier_sortie
     
     print("🏥 NETTOYEUR DE FICHES MÉDICALES")
     print("=" * 60)
@@ -363,6 +571,7 @@ def main():
     print("  2. Supprimer la navigation et éléments inutiles")
     print("  3. Structurer le contenu médical")
     print("  4. Sauvegarder les fichiers propres")
+    print(f"  5. Écrire le corpus JSONL par section ({NOM_CORPUS_JSONL})")
     print("=" * 60)
     
     # Vérifier que le dossier source existe
@@ -372,11 +581,12 @@ def main():
         return
     
     # Demander confirmation
-    input("\n▶️  Appuyez sur Entrée pour nettoyer les fichiers...")
+    if not args.yes:
+        input("\n▶️  Appuyez sur Entrée pour nettoyer les fichiers...")
     
     # Lancer le nettoyage
     nettoyeur = NettoyeurFichiersMedicaux(dossier_source, dossier_sortie)
-    nettoyeur.nettoyer_tous_les_fichiers()
+    nettoyeur.nettoyer_tous_les_fichiers(workers=args.workers, forcer=args.force)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Évaluation du mode fusionné de l'Agent Synthétiseur (phases 3+4 en un appel)
+
+Pour chaque patient (mock local, CSV MIMIC-III ou fichier JSON), compare :
+- mode séparé : calculer_scores_cliniques + detecter_degradation_silencieuse
+- mode fusionné : calculer_scores_et_degradation
+sur les tokens d'entrée, la latence et la concordance des sorties.
+
+Les données patient sont lues localement (aucun accès Cloud SQL / Secret Manager) ;
+seuls les appels Gemini de l'évaluation passent par Vertex AI.
+
+Usage:
+    uv run python scripts/eval_fused_synthesizer.py --output eval_fused.json
+    uv run python scripts/eval_fused_synthesizer.py --data-dir "data/MIMIC 3 DATASET" --patients 10006 10011
+    uv run python scripts/eval_fused_synthesizer.py --fichier patients.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.agents.collector.agent import AgentCollecteur
+from app.agents.synthesizer.agent import AgentSynthetiseur
+from app.agents.synthesizer.schemas import registre
+from app.utils.llm import PRIORITY_BATCH, llm_priority
+
+# Patients mock (clé/valeur plat) : sepsis, insuffisance respiratoire, patient stable
+MOCK_PATIENTS = [
+    {"id": "MOCK_SEPSIS", "age": 67, "sexe": "M", "motif": "Fièvre et confusion",
+     "FC": 125, "TA": "85/50", "FR": 26, "SpO2": 92, "Température": 39.1, "Conscience": "confus",
+     "antécédents": "Diabète type 2"},
+    {"id": "MOCK_RESPI", "age": 78, "sexe": "F", "motif": "Dyspnée aggravée",
+     "FC": 104, "TA": "14/8", "FR": 30, "SpO2": 86, "Température": 37.8, "Conscience": "A",
+     "antécédents": "BPCO"},
+    {"id": "MOCK_STABLE", "age": 45, "sexe": "F", "motif": "Douleur abdominale",
+     "FC": 82, "TA": "125/78", "FR": 16, "SpO2": 98, "Température": 36.9, "Conscience": "A"},
+]
+
+# Les spans LLM (app.utils.llm) portent les tokens consommés par appel
+span_exporter = InMemorySpanExporter()
+tracer_provider = TracerProvider()
+tracer_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+trace.set_tracer_provider(tracer_provider)
+
+
+def mesurer(fonction, *args):
+    """Exécute une fonction et retourne (résultat, durée en s, tokens d'entrée, nb d'appels LLM)"""
+    span_exporter.clear()
+    debut = time.perf_counter()
+    resultat = fonction(*args)
+    duree = time.perf_counter() - debut
+    spans_llm = [s for s in span_exporter.get_finished_spans() if "llm.model" in (s.attributes or {})]
+    tokens = sum(s.attributes.get("llm.tokens.prompt", 0) for s in spans_llm)
+    return resultat, duree, tokens, len(spans_llm)
+
+
+def comparer(separe: tuple, fusionne: tuple) -> dict:
+    """Concordance entre les sorties des deux modes"""
+    scores_sep, degradation_sep = separe
+    scores_fus, degradation_fus = fusionne
+    noms_sep = {s.get("score_name", "").upper() for s in scores_sep.get("applicable_scores", [])}
+    noms_fus = {s.get("score_name", "").upper() for s in scores_fus.get("applicable_scores", [])}
+    union = noms_sep | noms_fus
+    return {
+        "scores_separe": sorted(noms_sep),
+        "scores_fusionne": sorted(noms_fus),
+        "jaccard_scores": round(len(noms_sep & noms_fus) / len(union), 2) if union else 1.0,
+        "meme_trajectoire": degradation_sep.get("trajectory") == degradation_fus.get("trajectory"),
+        "meme_severite": degradation_sep.get("severity") == degradation_fus.get("severity"),
+        "meme_detection": (
+            degradation_sep.get("silent_deterioration_detected")
+            == degradation_fus.get("silent_deterioration_detected")
+        ),
+    }
+
+
+def charger_patients(args) -> list:
+    """Données patient normalisées : CSV MIMIC-III, fichier JSON ou patients mock"""
+    if args.data_dir:
+        collecteur = AgentCollecteur(data_dir=args.data_dir)
+        return [collecteur.collecter_donnees_patient(subject_id=s) for s in args.patients]
+    if args.fichier:
+        with open(args.fichier, "r", encoding="utf-8") as f:
+            donnees = json.load(f)
+        entrees = donnees if isinstance(donnees, list) else [donnees]
+    else:
+        entrees = MOCK_PATIENTS
+    patients = []
+    for entree in entrees:
+        normalise = registre.normaliser(entree, demander_mapping=None)
+        if normalise is None:
+            print(f"⚠️ Entrée ignorée (structure non reconnue) : {list(entree)[:5]}")
+            continue
+        patients.append(normalise)
+    return patients
+
+
+def evaluer_patient(synthetiseur: AgentSynthetiseur, data: dict) -> dict:
+
+    separe, duree_sep, tokens_sep, appels_sep = mesurer(
+        lambda d: (synthetiseur.calculer_scores_cliniques(d), synthetiseur.detecter_degradation_silencieuse(d)),
+        data,
+    )
+    fusionne, duree_fus, tokens_fus, appels_fus = mesurer(
+        synthetiseur.calculer_scores_et_degradation, data
+    )
+
+    return {
+        "patient_id": data["patient_normalized"].get("id"),
+        "separe": {"duree_s": round(duree_sep, 2), "tokens_entree": tokens_sep, "appels": appels_sep},
+        "fusionne": {"duree_s": round(duree_fus, 2), "tokens_entree": tokens_fus, "appels": appels_fus},
+        "concordance": comparer(separe, fusionne),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Évaluation du mode fusionné du synthétiseur")
+    parser.add_argument("--data-dir", help="Dossier des CSV MIMIC-III (avec --patients)")
+    parser.add_argument("--patients", type=int, nargs="+", default=[], help="subject_id MIMIC-III")
+    parser.add_argument("--fichier", help="Fichier JSON de patients (liste d'entrées, tout schéma reconnu)")
+    parser.add_argument("--project-id", default=os.getenv("GCP_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT"))
+    parser.add_argument("--output", help="Fichier JSON des résultats détaillés")
+    args = parser.parse_args()
+
+    if args.data_dir and not args.patients:
+        parser.error("--data-dir nécessite --patients")
+
+    patients = charger_patients(args)
+    synthetiseur = AgentSynthetiseur(project_id=args.project_id)
+
+    resultats = []
+    with llm_priority(PRIORITY_BATCH):
+        for data in patients:
+            print(f"🔄 Patient {data['patient_normalized'].get('id')}...")
+            resultat = evaluer_patient(synthetiseur, data)
+            resultats.append(resultat)
+            c = resultat["concordance"]
+            print(
+                f"   tokens {resultat['separe']['tokens_entree']} → {resultat['fusionne']['tokens_entree']}, "
+                f"durée {resultat['separe']['duree_s']}s → {resultat['fusionne']['duree_s']}s, "
+                f"jaccard scores {c['jaccard_scores']}, trajectoire {'=' if c['meme_trajectoire'] else '≠'}"
+            )
+
+    tokens_sep = sum(r["separe"]["tokens_entree"] for r in resultats)
+    tokens_fus = sum(r["fusionne"]["tokens_entree"] for r in resultats)
+    print("\n" + "=" * 60)
+    print(f"Tokens d'entrée : {tokens_sep} (séparé) → {tokens_fus} (fusionné)")
+    if tokens_sep:
+        print(f"Réduction : {100 * (1 - tokens_fus / tokens_sep):.0f}%")
+    print(
+        "Trajectoire concordante : "
+        f"{sum(r['concordance']['meme_trajectoire'] for r in resultats)}/{len(resultats)}"
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(resultats, f, indent=2, ensure_ascii=False)
+        print(f"Résultats détaillés : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
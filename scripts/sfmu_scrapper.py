@@ -1,73 +1,133 @@
 #!/usr/bin/env python3
 """
-Scraper simple avec Selenium pour le Guide de Régulation Médicale
-Clique sur chaque fiche et récupère le texte visible
+Scraper du Guide de Régulation Médicale
+Récupère le texte visible de chaque fiche, en parallèle
+
+Deux modes:
+  - selenium: navigateurs headless (pages rendues en JavaScript)
+  - http: téléchargement direct des pages (HTML statique), sans navigateur
+
+Dans les deux modes, les requêtes conditionnelles (ETag / Last-Modified) et
+l'empreinte du texte permettent de ne pas réécrire les fiches inchangées.
 """
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import time
 import os
 import re
+import json
+import hashlib
+import argparse
+import threading
+import urllib.error
+from abc import ABC, abstractmethod
+import urllib.request
 from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = "https://www.guide-regulation-medicale.fr/index.php?module=Fiche&action=ListView"
+
+# Cache des validateurs HTTP et empreintes, dans le dossier de sortie
+NOM_CACHE = "_CACHE_HTTP.json"
+
+USER_AGENT = "Mozilla/5.0 (compatible; adn-guide-scraper)"
+
+# Balises dont le texte n'est pas visible
+BALISES_INVISIBLES = {'script', 'style', 'head', 'noscript', 'template', 'svg'}
+
+# Balises qui provoquent un retour à la ligne dans le texte visible
+BALISES_BLOC = {
+    'p', 'div', 'br', 'li', 'ul', 'ol', 'tr', 'table', 'section', 'article', 'header',
+    'footer', 'nav', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'dt', 'dd', 'blockquote', 'pre', 'hr'
+}
+
+
+class ExtracteurTexte(HTMLParser):
+    """Texte visible d'une page HTML, un bloc par ligne (équivalent simplifié de body.text)"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.morceaux = []
+        self.profondeur_invisible = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BALISES_INVISIBLES:
+            self.profondeur_invisible += 1
+        elif tag in BALISES_BLOC:
+            self.morceaux.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in BALISES_INVISIBLES:
+            self.profondeur_invisible = max(0, self.profondeur_invisible - 1)
+        elif tag in BALISES_BLOC:
+            self.morceaux.append('\n')
+
+    def handle_data(self, data):
+        if not self.profondeur_invisible:
+            self.morceaux.append(data)
+
+    def texte(self):
+        lignes = (re.sub(r'[ \t\r\f\v]+', ' ', ligne).strip() for ligne in ''.join(self.morceaux).split('\n'))
+        return '\n'.join(ligne for ligne in lignes if ligne)
 
-class SimpleSeleniumScraper:
-    def __init__(self, output_dir="guide_medical_textes"):
+
+class ExtracteurLiens(HTMLParser):
+    """Liens vers les fiches (href contenant FrontDetailView) d'une page de liste"""
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.fiches = []
+        self._lien = None
+
+    def handle_starttag(self, tag, attrs):
+        href = dict(attrs).get('href') or ''
+        if tag == 'a' and 'FrontDetailView' in href:
+            self._lien = {'url': urljoin(self.base_url, href), 'morceaux': []}
+
+    def handle_data(self, data):
+        if self._lien is not None:
+            self._lien['morceaux'].append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._lien is not None:
+            titre = re.sub(r'\s+', ' ', ''.join(self._lien['morceaux'])).strip()
+            if titre:
+                self.fiches.append({'titre': titre, 'url': self._lien['url']})
+            self._lien = None
+
+
+class ScraperBase(ABC):
+    """Logique commune aux deux modes : fichiers, catégories, cache HTTP, parallélisme, rapport"""
+
+    def __init__(self, output_dir="guide_medical_textes", base_url=BASE_URL, workers=4, timeout=20):
         """
-        Initialise le scraper avec Selenium
-        
         Args:
             output_dir: Dossier où sauvegarder les textes
+            base_url: Page listant les fiches
+            workers: Nombre de fiches traitées en parallèle
+            timeout: Délai maximal d'attente d'une page, en secondes
         """
         self.output_dir = output_dir
-        self.base_url = "https://www.guide-regulation-medicale.fr/index.php?module=Fiche&action=ListView"
-        
+        self.base_url = base_url
+        self.workers = max(1, workers)
+        self.timeout = timeout
+
         print("🚀 Démarrage du scraper...")
         print(f"📁 Les fichiers seront sauvegardés dans: {output_dir}/")
-        
+
         # Créer le dossier principal
         os.makedirs(output_dir, exist_ok=True)
-        
-        # Configuration du navigateur
-        self.setup_driver()
-        
-        # Compteurs
+
+        # Compteurs (mis à jour par plusieurs threads)
         self.total_fiches = 0
         self.fiches_scrapees = 0
+        self.fiches_inchangees = 0
         self.erreurs = 0
-    
-    def setup_driver(self):
-        """Configure le navigateur Chrome/Firefox"""
-        try:
-            # Essayer Chrome d'abord
-            options = webdriver.ChromeOptions()
-            options.add_argument('--headless')  # Mode sans fenêtre
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--window-size=1920,1080')
-            options.add_experimental_option('excludeSwitches', ['enable-logging'])
-            
-            self.driver = webdriver.Chrome(options=options)
-            print("✅ Chrome configuré en mode headless")
-        except:
-            try:
-                # Si Chrome ne marche pas, essayer Firefox
-                options = webdriver.FirefoxOptions()
-                options.add_argument('--headless')
-                self.driver = webdriver.Firefox(options=options)
-                print("✅ Firefox configuré en mode headless")
-            except Exception as e:
-                print("❌ Erreur: Impossible de lancer le navigateur")
-                print("Installez Chrome ou Firefox et leurs drivers:")
-                print("  pip install selenium")
-                print("  Chrome: télécharger chromedriver")
-                print("  Firefox: télécharger geckodriver")
-                raise e
-    
+        self._verrou = threading.Lock()
+
+        self.cache = self.charger_cache()
+
     def nettoyer_nom_fichier(self, texte):
         """Nettoie un texte pour en faire un nom de fichier valide"""
         # Enlever les caractères spéciaux
@@ -77,7 +137,7 @@ class SimpleSeleniumScraper:
         # Limiter la longueur
         texte = texte[:100]
         return texte.strip()
-    
+
     def creer_dossier_categorie(self, titre):
         """Crée un sous-dossier basé sur la catégorie du titre"""
         # Déterminer la catégorie basée sur des mots-clés
@@ -93,9 +153,9 @@ class SimpleSeleniumScraper:
             'urgences': ['urgence', 'SMUR', 'SAMU', 'régulation'],
             'divers': []  # Catégorie par défaut
         }
-        
+
         titre_lower = titre.lower()
-        
+
         for categorie, mots_cles in categories.items():
             if categorie == 'divers':
                 continue
@@ -104,100 +164,93 @@ class SimpleSeleniumScraper:
                     path = os.path.join(self.output_dir, categorie)
                     os.makedirs(path, exist_ok=True)
                     return categorie
-        
+
         # Si aucune catégorie trouvée, mettre dans divers
         path = os.path.join(self.output_dir, 'divers')
         os.makedirs(path, exist_ok=True)
         return 'divers'
-    
-    def scraper_toutes_les_fiches(self):
-        """Parcourt et scrape toutes les fiches du site"""
-        print(f"\n📋 Chargement de la page principale...")
-        print(f"URL: {self.base_url}")
-        
-        # Aller sur la page de liste
-        self.driver.get(self.base_url)
-        time.sleep(3)  # Attendre le chargement
-        
-        # Trouver tous les liens des fiches
-        print("\n🔍 Recherche des fiches...")
+
+    def chemin_fiche(self, fiche, numero):
+        """Catégorie et chemin du fichier texte d'une fiche"""
+        categorie = self.creer_dossier_categorie(fiche['titre'])
+        nom_fichier = f"{numero:03d}_{self.nettoyer_nom_fichier(fiche['titre'])}.txt"
+        return categorie, os.path.join(self.output_dir, categorie, nom_fichier)
+
+    # --- Cache HTTP ---
+
+    def charger_cache(self):
+        """Validateurs (ETag, Last-Modified) et empreinte du texte de chaque fiche déjà récupérée"""
+        chemin = os.path.join(self.output_dir, NOM_CACHE)
+        if not os.path.exists(chemin):
+            return {}
         try:
-            # Attendre que la page se charge
-            WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.TAG_NAME, "a"))
-            )
-            
-            # Récupérer tous les liens
-            liens = self.driver.find_elements(By.XPATH, "//a[contains(@href, 'FrontDetailView')]")
-            
-            # Stocker les infos des fiches
-            fiches = []
-            for lien in liens:
-                titre = lien.text.strip()
-                url = lien.get_attribute('href')
-                if titre and url:
-                    fiches.append({
-                        'titre': titre,
-                        'url': url
-                    })
-            
-            self.total_fiches = len(fiches)
-            print(f"✅ {self.total_fiches} fiches trouvées!")
-            
-            # Créer un fichier index
-            index_path = os.path.join(self.output_dir, '_INDEX.txt')
-            with open(index_path, 'w', encoding='utf-8') as f:
-                f.write(f"INDEX DES FICHES - Guide de Régulation Médicale\n")
-                f.write(f"Généré le: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"Total: {self.total_fiches} fiches\n")
-                f.write("=" * 80 + "\n\n")
-                
-                for i, fiche in enumerate(fiches, 1):
-                    f.write(f"{i:3d}. {fiche['titre']}\n")
-            
-            # Scraper chaque fiche
-            for i, fiche in enumerate(fiches, 1):
-                self.scraper_une_fiche(fiche, i)
-                
-        except TimeoutException:
-            print("❌ Timeout: La page met trop de temps à charger")
-        except Exception as e:
-            print(f"❌ Erreur lors de la récupération des liens: {e}")
-    
-    def scraper_une_fiche(self, fiche, numero):
-        """Scrape une fiche individuelle"""
+            with open(chemin, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def sauvegarder_cache(self):
+        chemin = os.path.join(self.output_dir, NOM_CACHE)
+        with self._verrou:
+            contenu = json.dumps(self.cache, indent=2, ensure_ascii=False, sort_keys=True)
+        with open(chemin + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(contenu)
+        os.replace(chemin + '.tmp', chemin)
+
+    def entree_cache(self, url):
+        """Entrée du cache d'une fiche, si son fichier texte existe toujours"""
+        entree = self.cache.get(url)
+        if entree and os.path.exists(entree.get('fichier', '')):
+            return entree
+        return None
+
+    def requete_conditionnelle(self, url, methode='GET'):
+        """
+        Requête conditionnelle d'une page (If-None-Match / If-Modified-Since)
+
+        Args:
+            url: URL de la page
+            methode: 'GET', ou 'HEAD' pour ne lire que les validateurs (ETag, Last-Modified)
+
+        Returns:
+            (statut, html, en-têtes) ; html vaut None si la page n'a pas changé (304) ou en HEAD
+        """
+        en_tetes = {'User-Agent': USER_AGENT}
+        entree = self.entree_cache(url)
+        if entree:
+            if entree.get('etag'):
+                en_tetes['If-None-Match'] = entree['etag']
+            if entree.get('last_modified'):
+                en_tetes['If-Modified-Since'] = entree['last_modified']
+        requete = urllib.request.Request(url, headers=en_tetes, method=methode)
+        try:
+            with urllib.request.urlopen(requete, timeout=self.timeout) as reponse:
+                if methode == 'HEAD':
+                    return reponse.status, None, reponse.headers
+                charset = reponse.headers.get_content_charset() or 'utf-8'
+                return reponse.status, reponse.read().decode(charset, errors='replace'), reponse.headers
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return 304, None, e.headers
+            raise
+
+    # --- Sauvegarde ---
+
+    def sauvegarder_fiche(self, fiche, numero, texte_complet, en_tetes=None):
+        """
+        Écrit le fichier texte d'une fiche, sauf si son texte n'a pas changé
+
+        Returns:
+            True si le fichier a été écrit, False si la fiche est inchangée
+        """
         titre = fiche['titre']
         url = fiche['url']
-        
-        print(f"\n📄 [{numero}/{self.total_fiches}] {titre[:50]}...")
-        
-        try:
-            # Aller sur la page de la fiche
-            self.driver.get(url)
-            time.sleep(2)  # Attendre le chargement
-            
-            # Attendre que le contenu se charge
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            
-            # Récupérer tout le texte visible de la page
-            body = self.driver.find_element(By.TAG_NAME, "body")
-            texte_complet = body.text
-            
-            if not texte_complet or len(texte_complet) < 50:
-                print(f"   ⚠️ Peu ou pas de contenu trouvé")
-                self.erreurs += 1
-                return
-            
-            # Déterminer la catégorie et créer le dossier
-            categorie = self.creer_dossier_categorie(titre)
-            
-            # Créer le nom du fichier
-            nom_fichier = f"{numero:03d}_{self.nettoyer_nom_fichier(titre)}.txt"
-            chemin_fichier = os.path.join(self.output_dir, categorie, nom_fichier)
-            
-            # Sauvegarder le texte
+        empreinte = hashlib.sha256(texte_complet.encode('utf-8')).hexdigest()
+        categorie, chemin_fichier = self.chemin_fiche(fiche, numero)
+
+        entree = self.entree_cache(url)
+        ecrit = not (entree and entree.get('empreinte') == empreinte and entree.get('fichier') == chemin_fichier)
+        if ecrit:
             with open(chemin_fichier, 'w', encoding='utf-8') as f:
                 # En-tête du fichier
                 f.write("=" * 80 + "\n")
@@ -210,30 +263,78 @@ class SimpleSeleniumScraper:
                 f.write("\n" + "=" * 80 + "\n")
                 f.write("CONTENU:\n")
                 f.write("=" * 80 + "\n\n")
-                
+
                 # Le contenu
                 f.write(texte_complet)
-                
+
                 # Pied de page
                 f.write("\n\n" + "=" * 80 + "\n")
                 f.write("FIN DU DOCUMENT\n")
                 f.write("=" * 80 + "\n")
-            
-            self.fiches_scrapees += 1
-            print(f"   ✅ Sauvegardé dans: {categorie}/{nom_fichier}")
-            print(f"   📊 {len(texte_complet)} caractères récupérés")
-            
-        except TimeoutException:
-            print(f"   ❌ Timeout sur cette fiche")
-            self.erreurs += 1
+
+        en_tetes = en_tetes or {}
+        with self._verrou:
+            self.cache[url] = {
+                'fichier': chemin_fichier,
+                'empreinte': empreinte,
+                'etag': en_tetes.get('ETag'),
+                'last_modified': en_tetes.get('Last-Modified'),
+            }
+        return ecrit
+
+    def compter(self, compteur):
+        with self._verrou:
+            setattr(self, compteur, getattr(self, compteur) + 1)
+
+    def ecrire_index(self, fiches):
+        """Crée le fichier index des fiches"""
+        index_path = os.path.join(self.output_dir, '_INDEX.txt')
+        with open(index_path, 'w', encoding='utf-8') as f:
+            f.write(f"INDEX DES FICHES - Guide de Régulation Médicale\n")
+            f.write(f"Généré le: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"Total: {self.total_fiches} fiches\n")
+            f.write("=" * 80 + "\n\n")
+
+            for i, fiche in enumerate(fiches, 1):
+                f.write(f"{i:3d}. {fiche['titre']}\n")
+
+    # --- Parcours ---
+
+    @abstractmethod
+    def lister_fiches(self):
+        """Liste des fiches {titre, url} de la page principale (à définir par chaque mode)"""
+
+    @abstractmethod
+    def scraper_une_fiche(self, fiche, numero):
+        """Scrape une fiche individuelle (à définir par chaque mode)"""
+
+    def scraper_toutes_les_fiches(self):
+        """Parcourt et scrape toutes les fiches du site, avec un pool de workers"""
+        print(f"\n📋 Chargement de la page principale...")
+        print(f"URL: {self.base_url}")
+
+        print("\n🔍 Recherche des fiches...")
+        try:
+            fiches = self.lister_fiches()
         except Exception as e:
-            print(f"   ❌ Erreur: {e}")
-            self.erreurs += 1
-    
+            print(f"❌ Erreur lors de la récupération des liens: {e}")
+            return
+
+        self.total_fiches = len(fiches)
+        print(f"✅ {self.total_fiches} fiches trouvées!")
+        self.ecrire_index(fiches)
+
+        # Scraper les fiches en parallèle (le numéro reste celui de l'ordre de la liste)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                list(executor.map(self.scraper_une_fiche, fiches, range(1, len(fiches) + 1)))
+        finally:
+            self.sauvegarder_cache()
+
     def generer_rapport(self):
         """Génère un rapport final du scraping"""
         rapport_path = os.path.join(self.output_dir, '_RAPPORT.txt')
-        
+
         with open(rapport_path, 'w', encoding='utf-8') as f:
             f.write("RAPPORT DE SCRAPING\n")
             f.write("=" * 80 + "\n\n")
@@ -243,9 +344,10 @@ class SimpleSeleniumScraper:
             f.write("-" * 40 + "\n")
             f.write(f"Fiches trouvées: {self.total_fiches}\n")
             f.write(f"Fiches récupérées avec succès: {self.fiches_scrapees}\n")
+            f.write(f"Fiches inchangées: {self.fiches_inchangees}\n")
             f.write(f"Erreurs: {self.erreurs}\n")
-            f.write(f"Taux de réussite: {(self.fiches_scrapees/max(self.total_fiches,1))*100:.1f}%\n\n")
-            
+            f.write(f"Taux de réussite: {((self.fiches_scrapees + self.fiches_inchangees)/max(self.total_fiches,1))*100:.1f}%\n\n")
+
             # Lister les catégories et leur contenu
             f.write("ORGANISATION DES FICHIERS:\n")
             f.write("-" * 40 + "\n")
@@ -256,63 +358,279 @@ class SimpleSeleniumScraper:
                 if os.path.isdir(path):
                     nb_fichiers = len([f for f in os.listdir(path) if f.endswith('.txt')])
                     f.write(f"  {categorie}/: {nb_fichiers} fiches\n")
-        
+
         print(f"\n📊 Rapport sauvegardé: {rapport_path}")
-    
+
+    def fermer(self):
+        """Libère les ressources du mode (navigateurs...)"""
+
     def run(self):
         """Lance le scraping complet"""
         try:
             print("\n" + "=" * 80)
             print("DÉBUT DU SCRAPING")
             print("=" * 80)
-            
+
             # Scraper toutes les fiches
             self.scraper_toutes_les_fiches()
-            
+
             # Générer le rapport
             self.generer_rapport()
-            
+
             print("\n" + "=" * 80)
             print("SCRAPING TERMINÉ!")
             print("=" * 80)
             print(f"\n✅ Succès: {self.fiches_scrapees}/{self.total_fiches} fiches")
+            print(f"⏭️  Inchangées: {self.fiches_inchangees}")
             print(f"❌ Erreurs: {self.erreurs}")
             print(f"📁 Fichiers sauvés dans: {self.output_dir}/")
-            
+
         except KeyboardInterrupt:
             print("\n\n⚠️ Scraping interrompu par l'utilisateur")
         except Exception as e:
             print(f"\n❌ Erreur fatale: {e}")
         finally:
-            # Fermer le navigateur
-            if hasattr(self, 'driver'):
-                self.driver.quit()
-                print("\n🔒 Navigateur fermé")
+            self.fermer()
+
+
+class ScraperHTTP(ScraperBase):
+    """Téléchargement direct des pages de fiches, quand leur HTML est statique"""
+
+    def lister_fiches(self):
+        _, html, _ = self.requete_conditionnelle(self.base_url)
+        extracteur = ExtracteurLiens(self.base_url)
+        extracteur.feed(html)
+        return extracteur.fiches
+
+    def scraper_une_fiche(self, fiche, numero):
+        """Scrape une fiche individuelle"""
+        titre = fiche['titre']
+        try:
+            statut, html, en_tetes = self.requete_conditionnelle(fiche['url'])
+            if statut == 304:
+                print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ⏭️ inchangée (304)")
+                self.compter('fiches_inchangees')
+                return
+
+            extracteur = ExtracteurTexte()
+            extracteur.feed(html)
+            texte_complet = extracteur.texte()
+
+            if not texte_complet or len(texte_complet) < 50:
+                print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ⚠️ Peu ou pas de contenu trouvé")
+                self.compter('erreurs')
+                return
+
+            if self.sauvegarder_fiche(fiche, numero, texte_complet, en_tetes):
+                print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ✅ {len(texte_complet)} caractères")
+                self.compter('fiches_scrapees')
+            else:
+                print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ⏭️ contenu identique")
+                self.compter('fiches_inchangees')
+
+        except Exception as e:
+            print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ❌ Erreur: {e}")
+            self.compter('erreurs')
+
+
+class SimpleSeleniumScraper(ScraperBase):
+    """Pool de navigateurs headless, pour les pages rendues en JavaScript"""
+
+    def __init__(self, output_dir="guide_medical_textes", base_url=BASE_URL, workers=4, timeout=20,
+                 verifier_http=True):
+        """
+        Initialise le scraper avec Selenium
+
+        Args:
+            output_dir: Dossier où sauvegarder les textes
+            base_url: Page listant les fiches
+            workers: Nombre de navigateurs en parallèle
+            timeout: Délai maximal d'attente d'une page, en secondes
+            verifier_http: Sauter sans les rendre les fiches que le serveur déclare inchangées (304)
+        """
+        super().__init__(output_dir, base_url, workers, timeout)
+        self.verifier_http = verifier_http
+        self._navigateurs = []
+        self._local = threading.local()
+
+        # Configuration du navigateur principal (page de liste)
+        self.setup_driver()
+
+    def creer_driver(self):
+        """Lance un navigateur Chrome/Firefox headless"""
+        # Import tardif : le mode http n'a pas besoin de selenium
+        from selenium import webdriver
+
+        try:
+            # Essayer Chrome d'abord
+            options = webdriver.ChromeOptions()
+            options.add_argument('--headless')  # Mode sans fenêtre
+            options.add_argument('--no-sandbox')
+            options.add_argument('--disable-dev-shm-usage')
+            options.add_argument('--disable-gpu')
+            options.add_argument('--window-size=1920,1080')
+            options.add_experimental_option('excludeSwitches', ['enable-logging'])
+
+            driver = webdriver.Chrome(options=options)
+            print("✅ Chrome configuré en mode headless")
+        except Exception:
+            try:
+                # Si Chrome ne marche pas, essayer Firefox
+                options = webdriver.FirefoxOptions()
+                options.add_argument('--headless')
+                driver = webdriver.Firefox(options=options)
+                print("✅ Firefox configuré en mode headless")
+            except Exception as e:
+                print("❌ Erreur: Impossible de lancer le navigateur")
+                print("Installez Chrome ou Firefox et leurs drivers:")
+                print("  pip install selenium")
+                print("  Chrome: télécharger chromedriver")
+                print("  Firefox: télécharger geckodriver")
+                raise e
+
+        with self._verrou:
+            self._navigateurs.append(driver)
+        return driver
+
+    def setup_driver(self):
+        """Configure le navigateur principal"""
+        self.driver = self.creer_driver()
+
+    def driver_du_thread(self):
+        """Navigateur propre au thread du pool (créé à la première fiche du thread)"""
+        if getattr(self._local, 'driver', None) is None:
+            self._local.driver = self.creer_driver()
+        return self._local.driver
+
+    def attendre_page(self, driver):
+        """Attend la fin du chargement du document plutôt qu'un délai fixe"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
+        attente = WebDriverWait(driver, self.timeout)
+        attente.until(lambda d: d.execute_script("return document.readyState") == "complete")
+        attente.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+
+    def lister_fiches(self):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
+        # Aller sur la page de liste et attendre l'apparition des liens de fiches
+        self.driver.get(self.base_url)
+        xpath = "//a[contains(@href, 'FrontDetailView')]"
+        WebDriverWait(self.driver, self.timeout).until(
+            EC.presence_of_all_elements_located((By.XPATH, xpath))
+        )
+
+        # Stocker les infos des fiches
+        fiches = []
+        for lien in self.driver.find_elements(By.XPATH, xpath):
+            titre = lien.text.strip()
+            url = lien.get_attribute('href')
+            if titre and url:
+                fiches.append({
+                    'titre': titre,
+                    'url': url
+                })
+        return fiches
+
+    def scraper_une_fiche(self, fiche, numero):
+        """Scrape une fiche individuelle"""
+        from selenium.webdriver.common.by import By
+        from selenium.common.exceptions import TimeoutException
+
+        titre = fiche['titre']
+        url = fiche['url']
+
+        try:
+            en_tetes = None
+            if self.verifier_http:
+                try:
+                    # HEAD : la page est rendue par le navigateur, seuls les validateurs sont utiles
+                    statut, _, en_tetes = self.requete_conditionnelle(url, methode='HEAD')
+                    if statut == 304:
+                        print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ⏭️ inchangée (304)")
+                        self.compter('fiches_inchangees')
+                        return
+                except Exception as e:
+                    # Pas de vérification possible (serveur, cookies...) : rendre la page quand même
+                    print(f"   ⚠️ Vérification HTTP impossible pour {titre[:50]}: {e}")
+
+            # Aller sur la page de la fiche et attendre son chargement
+            driver = self.driver_du_thread()
+            driver.get(url)
+            self.attendre_page(driver)
+
+            # Récupérer tout le texte visible de la page
+            texte_complet = driver.find_element(By.TAG_NAME, "body").text
+
+            if not texte_complet or len(texte_complet) < 50:
+                print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ⚠️ Peu ou pas de contenu trouvé")
+                self.compter('erreurs')
+                return
+
+            if self.sauvegarder_fiche(fiche, numero, texte_complet, en_tetes):
+                print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ✅ {len(texte_complet)} caractères")
+                self.compter('fiches_scrapees')
+            else:
+                print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ⏭️ contenu identique")
+                self.compter('fiches_inchangees')
+
+        except TimeoutException:
+            print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ❌ Timeout sur cette fiche")
+            self.compter('erreurs')
+        except Exception as e:
+            print(f"📄 [{numero}/{self.total_fiches}] {titre[:50]}: ❌ Erreur: {e}")
+            self.compter('erreurs')
+
+    def fermer(self):
+        # Fermer tous les navigateurs
+        for driver in self._navigateurs:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        if self._navigateurs:
+            print(f"\n🔒 {len(self._navigateurs)} navigateur(s) fermé(s)")
+        self._navigateurs = []
 
 
 def main():
     """Fonction principale"""
-    import sys
-    
-    # Vérifier si un dossier de sortie est spécifié
-    output_dir = sys.argv[1] if len(sys.argv) > 1 else "guide_medical_textes"
-    
+    parser = argparse.ArgumentParser(description="Scraper du Guide de Régulation Médicale")
+    parser.add_argument("output_dir", nargs="?", default="guide_medical_textes")
+    parser.add_argument("--mode", choices=["selenium", "http"], default="selenium",
+                        help="selenium: navigateurs headless ; http: téléchargement direct (HTML statique)")
+    parser.add_argument("--workers", type=int, default=4, help="Fiches traitées en parallèle")
+    parser.add_argument("--timeout", type=int, default=20, help="Attente maximale d'une page (secondes)")
+    parser.add_argument("--base-url", default=BASE_URL, help="Page listant les fiches")
+    parser.add_argument("--yes", "-y", action="store_true", help="Ne pas demander de confirmation")
+    args = parser.parse_args()
+
     print("🏥 SCRAPER - Guide de Régulation Médicale")
     print("=" * 80)
     print("Ce script va:")
-    print("  1. Ouvrir un navigateur en mode invisible")
-    print("  2. Aller sur chaque fiche médicale")
+    if args.mode == "selenium":
+        print(f"  1. Ouvrir {args.workers} navigateur(s) en mode invisible")
+    else:
+        print("  1. Télécharger directement les pages (sans navigateur)")
+    print("  2. Aller sur chaque fiche médicale (en sautant les fiches inchangées)")
     print("  3. Récupérer tout le texte visible")
     print("  4. Organiser les fichiers par catégorie")
     print("=" * 80)
-    
+
     # Demander confirmation
-    reponse = input("\n▶️  Appuyez sur Entrée pour commencer (ou Ctrl+C pour annuler)...")
-    
+    if not args.yes:
+        input("\n▶️  Appuyez sur Entrée pour commencer (ou Ctrl+C pour annuler)...")
+
     # Lancer le scraper
-    scraper = SimpleSeleniumScraper(output_dir=output_dir)
+    classe = SimpleSeleniumScraper if args.mode == "selenium" else ScraperHTTP
+    scraper = classe(output_dir=args.output_dir, base_url=args.base_url, workers=args.workers,
+                     timeout=args.timeout)
     scraper.run()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,98 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cold start benchmark: imports app.server in a fresh interpreter with
+`python -X importtime` and reports the slowest modules.
+
+The budget can be tuned with STARTUP_IMPORT_BUDGET_SECONDS.
+"""
+
+import logging
+import os
+import subprocess
+import sys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET_SECONDS", "15"))
+
+
+def run_python(code: str, *args: str) -> subprocess.CompletedProcess[str]:
+    """Run a snippet in a fresh interpreter in lazy startup mode."""
+    env = os.environ.copy()
+    env["STARTUP_MODE"] = "lazy"
+    env.setdefault("TRACE_EXPORTER", "none")
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=300,
+    )
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, str]]:
+    """
+    Parse `-X importtime` lines ("import time: self | cumulative | name").
+
+    :return: (cumulative microseconds, module) pairs
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        entries.append((int(cumulative), name.strip()))
+    return entries
+
+
+def test_server_import_time() -> None:
+    """Importing app.server must stay within the cold start budget."""
+    result = run_python("import app.server", "-X", "importtime")
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    entries = parse_importtime(result.stderr)
+    total = max(cumulative for cumulative, _ in entries) / 1e6
+    top_level = sorted(
+        (entry for entry in entries if "." not in entry[1]), reverse=True
+    )[:10]
+    logger.info(f"app.server import: {total:.2f}s")
+    for cumulative, name in top_level:
+        logger.info(f"  {cumulative / 1e6:7.3f}s {name}")
+
+    assert total < IMPORT_BUDGET_SECONDS
+
+
+def test_lazy_startup_defers_agents() -> None:
+    """The agents are not built (nor imported) when the server module is imported."""
+    result = run_python(
+        "import sys, app.server\n"
+        "from app.routes import orchestrator_routes\n"
+        "print(orchestrator_routes._orchestrateur is None,"
+        " 'app.agents.orchestrator.agent' in sys.modules)"
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.strip().splitlines()[-1] == "True False"
+
+
+def test_package_import_does_not_load_root_agent() -> None:
+    """`import app` stays cheap; root_agent is resolved on first access."""
+    result = run_python(
+        "import sys, app\n"
+        "print('app.agents.clinical_agent.agent' in sys.modules)"
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,130 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Throughput comparison of the in-memory and database-backed ADK session stores.
+
+Each simulated conversation creates a session, appends a few events and reads
+the session back, as /start_session + /send_message + /get_state would.
+
+Usage:
+    uv run python tests/load_test/session_store_benchmark.py \
+        --sessions 200 --events 10 --concurrency 20 \
+        --db-url sqlite:///tests/load_test/.results/sessions.db
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService
+from google.adk.sessions.database_session_service import DatabaseSessionService
+from google.genai import types
+from sqlalchemy.engine import make_url
+
+from app.utils.sessions import get_session_db_kwargs
+
+APP_NAME = "clinical_agent"
+
+
+async def simulate_conversation(
+    service: BaseSessionService, user_id: str, events_per_session: int
+) -> None:
+    """Create a session, append events and read it back."""
+    session = await service.create_session(app_name=APP_NAME, user_id=user_id)
+    for i in range(events_per_session):
+        event = Event(
+            author="user" if i % 2 == 0 else "root_agent_clinique",
+            invocation_id=f"e-{uuid.uuid4().hex[:8]}",
+            content=types.Content(
+                role="user" if i % 2 == 0 else "model",
+                parts=[types.Part(text=f"Message {i} " + "x" * 512)],
+            ),
+        )
+        await service.append_event(session, event)
+    await service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session.id)
+
+
+async def run_benchmark(
+    name: str,
+    service: BaseSessionService,
+    sessions: int,
+    events_per_session: int,
+    concurrency: int,
+) -> None:
+    """Run the simulated conversations with bounded concurrency and print throughput."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await simulate_conversation(service, f"user_{i}", events_per_session)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    operations = sessions * (events_per_session + 2)
+    print(
+        f"{name:<12} {sessions / elapsed:8.1f} sessions/s "
+        f"{operations / elapsed:9.1f} ops/s "
+        f"p50={latencies[len(latencies) // 2] * 1000:7.1f}ms "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--events", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--db-url",
+        default=os.getenv(
+            "SESSION_SERVICE_URI", "sqlite:///tests/load_test/.results/sessions.db"
+        ),
+    )
+    args = parser.parse_args()
+
+    url = make_url(args.db_url)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        # SQLite creates the file but not its directory
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+
+    services: list[tuple[str, BaseSessionService]] = [
+        ("in-memory", InMemorySessionService()),
+        (
+            "database",
+            DatabaseSessionService(
+                db_url=args.db_url, **get_session_db_kwargs(args.db_url)
+            ),
+        ),
+    ]
+    print(
+        f"{args.sessions} sessions x {args.events} events, "
+        f"concurrency {args.concurrency}, database: {args.db_url.split('@')[-1]}"
+    )
+    for name, service in services:
+        asyncio.run(
+            run_benchmark(name, service, args.sessions, args.events, args.concurrency)
+        )
+
+
+if __name__ == "__main__":
+    main()
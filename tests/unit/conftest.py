@@ -0,0 +1,35 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def modele_arm(tmp_path: Path) -> str:
+    """Path of a local ARM classifier trained on a few drug-intoxication and bleeding transcripts."""
+    from app.agents.ARM.classifier_agent import ARMClassifierAgent
+    from app.agents.ARM.local_classifier import ClassifieurLocal
+
+    textes = [
+        "il a avalé toute la boîte de somnifères",
+        "elle a pris tous ses comprimés, une boîte entière",
+        "il saigne beaucoup de la jambe, du sang partout",
+        "coupure profonde à la main, ça saigne beaucoup",
+    ]
+    etiquettes = [["INTOXICATION MÉDICAMENTEUSE"]] * 2 + [["HÉMORRAGIE EXTÉRIORISÉE"]] * 2
+    chemin = str(tmp_path / "modele.npz")
+    ClassifieurLocal.entrainer(textes, etiquettes, ARMClassifierAgent.PATHOLOGIES).sauvegarder(chemin)
+    return chemin
@@ -0,0 +1,111 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import re
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted
+
+from app.agents.ARM import classifier_agent
+from app.agents.ARM.classifier_agent import ARMClassifierAgent
+from app.agents.ARM.local_classifier import ClassifieurLocal
+from app.utils import llm
+from app.utils.llm import LlmScheduler
+
+
+class BatchModel:
+    """Classifies by keyword; forgets transcripts containing "oubli" in batch answers."""
+
+    _model_name = "gemini-2.0-flash"
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.batch_sizes: list[int] = []
+
+    async def generate_content_async(self, prompt: str, **kwargs: object) -> SimpleNamespace:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if "generation_config" not in kwargs:
+            return SimpleNamespace(text="PROBLÈME RESPIRATOIRE\n", usage_metadata=None)
+        blocks = re.findall(r"\[(T\d+)\]\n(.*)", prompt)
+        self.batch_sizes.append(len(blocks))
+        if any("panne" in text for _, text in blocks):
+            raise ResourceExhausted("429 quota")
+        results = [
+            {
+                "id": ident,
+                "classifications": ["INTOXICATION MÉDICAMENTEUSE"] if "boîte" in text else ["ARRÊT CARDIAQUE"],
+                "confidence": 0.9,
+            }
+            for ident, text in blocks
+            if "oubli" not in text
+        ]
+        return SimpleNamespace(text=json.dumps({"resultats": results}), usage_metadata=None)
+
+
+@pytest.fixture
+def agent(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> ARMClassifierAgent:
+    monkeypatch.setattr(llm, "scheduler", LlmScheduler(0, 0))
+    monkeypatch.setattr(classifier_agent, "get_model", lambda *args, **kwargs: BatchModel())
+    return ARMClassifierAgent(
+        config={"taille_lot": 3, "lots_simultanes": 2, "modele_local": str(tmp_path / "absent.npz")}
+    )
+
+
+def test_process_batch_packs_transcripts_and_keeps_their_order(agent: ARMClassifierAgent) -> None:
+    transcripts = [f"Appel {i} : il ne respire plus" for i in range(7)]
+    transcripts[4] = "Elle a avalé une boîte de somnifères"
+    transcripts[5] = "Appel oubli dans la réponse"
+
+    results = asyncio.run(agent.process_batch(transcripts))
+
+    assert len(results) == 7
+    assert results[0] == {"classifications": ["ARRÊT CARDIAQUE"], "confidence": 0.9, "source": "llm"}
+    assert results[4]["classifications"] == ["INTOXICATION MÉDICAMENTEUSE"]
+    # Missing from its batch answer: classified on its own
+    assert results[5] == {"classifications": ["PROBLÈME RESPIRATOIRE"], "confidence": 0.5, "source": "llm"}
+    assert agent.model.batch_sizes == [3, 3, 1]
+    assert agent.model.max_in_flight <= 2
+
+
+def test_failed_batch_does_not_discard_the_other_batches(
+    agent: ARMClassifierAgent, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(llm, "retry_delay", lambda attempt: 0)
+    transcripts = ["il ne respire plus"] * 3 + ["Appel en panne de quota"] + ["il ne respire plus"] * 2
+
+    results = asyncio.run(agent.process_batch(transcripts))
+
+    assert [r["source"] for r in results] == ["llm"] * 3 + ["erreur"] * 3
+    assert results[3]["classifications"] == ["MALAISE"]
+    assert results[3]["confidence"] == 0.0
+
+
+def test_confident_local_predictions_skip_the_llm(agent: ARMClassifierAgent, modele_arm: str) -> None:
+    agent.classifieur_local = ClassifieurLocal.charger(modele_arm)
+    agent.seuil_local = 0.6
+
+    results = asyncio.run(agent.process_batch(["Il a avalé une boîte de comprimés", "Appel 1 : je ne sais pas"]))
+
+    assert results[0]["source"] == "local"
+    assert results[0]["classifications"] == ["INTOXICATION MÉDICAMENTEUSE"]
+    assert results[1]["source"] == "llm"
+    assert agent.model.batch_sizes == [1]
@@ -0,0 +1,87 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents.ARM import classifier_agent
+from app.agents.ARM.classifier_agent import ARMClassifierAgent
+from app.agents.ARM.streaming import ClassificationEnContinu, fragments_depuis_texte
+from app.utils import llm
+from app.utils.llm import LlmScheduler
+
+
+class FakeModel:
+    _model_name = "gemini-2.0-flash"
+
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+
+    async def generate_content_async(self, prompt: str, **kwargs: object) -> SimpleNamespace:
+        self.prompts.append(prompt)
+        return SimpleNamespace(text="MALAISE\n", usage_metadata=None)
+
+
+@pytest.fixture
+def agent(monkeypatch: pytest.MonkeyPatch, modele_arm: str) -> ARMClassifierAgent:
+    monkeypatch.setattr(llm, "scheduler", LlmScheduler(0, 0))
+    monkeypatch.setattr(classifier_agent, "get_model", lambda *args, **kwargs: FakeModel())
+    return ARMClassifierAgent(config={"modele_local": modele_arm, "seuil_local": 0.6})
+
+
+def test_incremental_updates_match_the_whole_transcript(agent: ARMClassifierAgent) -> None:
+    session = ClassificationEnContinu(agent.classifieur_local, seuil=0.6)
+    session.ajouter_fragment("Allô, mon fils a avalé")
+    # Interim speech results replace each other until the final one arrives
+    session.ajouter_fragment("toute la boîte de", final=False)
+    etat = session.ajouter_fragment("toute la boîte de somnifères")
+
+    attendu = agent.classifieur_local.predire("Allô, mon fils a avalé toute la boîte de somnifères")
+    assert session.transcript == "Allô, mon fils a avalé toute la boîte de somnifères"
+    assert etat["probabilites"] == pytest.approx(attendu["probabilites"])
+
+
+def test_classification_is_proposed_before_the_call_ends(agent: ARMClassifierAgent, tmp_path: Path) -> None:
+    appel = tmp_path / "appel.txt"
+    appel.write_text(
+        "Allô les secours, c'est pour mon fils de seize ans\n"
+        "il a avalé toute la boîte de somnifères, une boîte de comprimés\n"
+        "il est dans sa chambre, je ne sais pas quoi faire, il est allongé sur le lit\n"
+        "oui je suis à côté de lui, l'adresse est dix rue des lilas\n",
+        encoding="utf-8",
+    )
+
+    async def rejouer() -> list[dict]:
+        return [e async for e in agent.classifier_en_continu(fragments_depuis_texte(str(appel), mots_par_fragment=5))]
+
+    evenements = asyncio.run(rejouer())
+
+    propositions = [e for e in evenements if e["type"] == "proposition"]
+    assert propositions and propositions[0]["classifications"][0] == "INTOXICATION MÉDICAMENTEUSE"
+    assert propositions[0]["fragment"] < evenements[-1]["fragment"]
+    assert evenements[-1]["type"] == "finale" and evenements[-1]["source"] == "local"
+    assert agent.model.prompts == []
+
+    # Not confident at the end of the call: the final classification goes to the LLM
+    async def rejouer_vague() -> list[dict]:
+        async def fragments():
+            yield {"texte": "bonjour, je vous appelle pour mon voisin", "final": True}
+        return [e async for e in agent.classifier_en_continu(fragments())]
+
+    finale = asyncio.run(rejouer_vague())[-1]
+    assert finale == {"type": "finale", "fragment": 1, "classifications": ["MALAISE"], "confidence": 0.5, "source": "llm"}
+    assert len(agent.model.prompts) == 1
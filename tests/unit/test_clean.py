@@ -0,0 +1,82 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from pathlib import Path
+
+from scripts.clean import NettoyeurFichiersMedicaux
+
+FICHE_BRUTE = """TITRE: Douleur thoracique
+URL: https://www.sfmu.org/fr/douleur-thoracique
+CATÉGORIE: CARDIO-VASCULAIRE
+CONTENU:
+Accès à la version ebook
+SOMMAIRE
+Tout déplier | Tout replier
+Introduction
+Toute douleur thoracique est un SCA jusqu'à preuve du contraire.
+ARM
+déterminer le niveau de priorité
+P0 si douleur thoracique avec malaise
+Date de mise à jour : 01/01/2024
+chercher à savoir
+Antécédents coronariens
+FIN DU DOCUMENT
+Annuaire
+"""
+
+
+def test_filtre_navigation_et_structure(tmp_path: Path) -> None:
+    nettoyeur = NettoyeurFichiersMedicaux(str(tmp_path), str(tmp_path / "sortie"))
+    texte = nettoyeur.nettoyer_texte(FICHE_BRUTE)
+
+    assert "SOMMAIRE" not in texte
+    assert "Date de mise à jour" not in texte
+    assert "Annuaire" not in texte
+    sections = nettoyeur.extraire_contenu_medical(nettoyeur.nettoyer_lignes(FICHE_BRUTE.splitlines()))
+    assert sections["titre"] == "Douleur thoracique"
+    assert sections["arm"]["priorite"] == "P0 si douleur thoracique avec malaise"
+    assert sections["arm"]["savoir"] == "Antécédents coronariens"
+
+
+def test_seuls_les_fichiers_modifies_sont_retraites(tmp_path: Path) -> None:
+    source = tmp_path / "source"
+    (source / "CARDIO").mkdir(parents=True)
+    (source / "CARDIO" / "douleur.txt").write_text(FICHE_BRUTE, encoding="utf-8")
+    (source / "CARDIO" / "syncope.txt").write_text(FICHE_BRUTE.replace("Douleur thoracique", "Syncope"), encoding="utf-8")
+
+    premier = NettoyeurFichiersMedicaux(str(source), str(tmp_path / "sortie"))
+    premier.nettoyer_tous_les_fichiers(workers=2)
+    assert premier.fichiers_traites == 2
+    assert (tmp_path / "sortie" / "CARDIO" / "syncope.txt").read_text(encoding="utf-8").startswith("# SYNCOPE")
+
+    (source / "CARDIO" / "douleur.txt").write_text(FICHE_BRUTE.replace("P0", "P1"), encoding="utf-8")
+    second = NettoyeurFichiersMedicaux(str(source), str(tmp_path / "sortie"))
+    second.nettoyer_tous_les_fichiers(workers=2)
+    assert (second.fichiers_traites, second.fichiers_inchanges) == (1, 1)
+    assert "P1 si douleur" in (tmp_path / "sortie" / "CARDIO" / "douleur.txt").read_text(encoding="utf-8")
+    sections = [
+        json.loads(ligne)
+        for ligne in (tmp_path / "sortie" / "corpus_sections.jsonl").read_text(encoding="utf-8").splitlines()
+    ]
+    assert [s["id"] for s in sections] == [
+        "CARDIO/douleur#introduction",
+        "CARDIO/douleur#arm_priorite",
+        "CARDIO/douleur#arm_savoir",
+        "CARDIO/syncope#introduction",
+        "CARDIO/syncope#arm_priorite",
+        "CARDIO/syncope#arm_savoir",
+    ]
+    assert sections[1]["texte"] == "P1 si douleur thoracique avec malaise"
+    assert sections[3]["url"] == "https://www.sfmu.org/fr/douleur-thoracique"
@@ -0,0 +1,105 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from app.utils.clinical_scores import (
+    compute_clinical_scores,
+    compute_clinical_scores_batch,
+    merge_scores,
+)
+
+SEPTIC = {
+    "vitals_current": {
+        "heart_rate": {"value": 125.0, "unit": "bpm"},
+        "systolic_bp": {"value": 80.0, "unit": "mmHg"},
+        "respiratory_rate": {"value": 26.0, "unit": "insp/min"},
+        "temperature": {"value": 101.3, "unit": "?F"},
+        "spo2": {"value": 92.0, "unit": "%"},
+    },
+    "labs": [
+        {"itemid": 51301, "charttime": "2100-01-01 08:00:00", "valuenum": 9.0},
+        {"itemid": 51301, "charttime": "2100-01-01 14:00:00", "valuenum": 15.0},
+    ],
+}
+STABLE = {
+    "vitals_current": {
+        "heart_rate": {"value": 85.0},
+        "systolic_bp": {"value": 120.0},
+        "respiratory_rate": {"value": 16.0},
+        "temperature": {"value": 36.8, "unit": "?C"},
+    },
+    "labs": [],
+}
+
+
+def by_name(scores: list[dict]) -> dict[str, dict]:
+    return {score["score_name"]: score for score in scores}
+
+
+def test_scores_of_a_septic_patient() -> None:
+    scores = by_name(compute_clinical_scores({"patient_normalized": SEPTIC}))
+
+    assert scores["qSOFA"]["value"] == 2
+    assert scores["qSOFA"]["missing_components"] == ["altered_mentation"]
+    # 101.3 °F = 38.5 °C and the latest WBC (15 G/L) is used
+    assert scores["SIRS"]["value"] == 4
+    assert scores["NEWS2"]["value"] == 11
+    assert scores["NEWS2"]["risk_category"] == "HIGH"
+    assert scores["Shock index"]["value"] == 1.56
+
+
+def test_batch_matches_single_patient_and_skips_unknown_scores() -> None:
+    batch = compute_clinical_scores_batch([SEPTIC, STABLE, {"vitals_current": {}}])
+
+    assert batch[0] == compute_clinical_scores(SEPTIC)
+    stable = by_name(batch[1])
+    assert stable["qSOFA"]["value"] == 0
+    assert stable["NEWS2"]["value"] == 0
+    assert stable["Shock index"]["risk_category"] == "INTERMEDIATE"
+    assert batch[2] == []
+
+
+@pytest.mark.parametrize(
+    ("consciousness", "altered"),
+    [
+        ("Conscient, non confus", 0),
+        ("conscience non altérée", 0),
+        ("pas de confusion", 0),
+        ("A", 0),
+        ("AVPU: V", 1),
+        ("somnolent, non fébrile", 1),
+        ("désorienté", 1),
+    ],
+)
+def test_negated_or_avpu_consciousness(consciousness: str, altered: int) -> None:
+    patient = {**STABLE, "vitals_current": {**STABLE["vitals_current"], "consciousness": consciousness}}
+    scores = by_name(compute_clinical_scores(patient))
+
+    assert scores["qSOFA"]["value"] == altered
+    assert scores["NEWS2"]["value"] == 3 * altered
+
+
+def test_merge_drops_llm_values_for_deterministic_scores() -> None:
+    computed = compute_clinical_scores(SEPTIC)
+    reported = [
+        {"score_name": "qSOFA", "value": 3},
+        {"score_name": "News 2", "value": 4},
+        {"score_name": "CURB-65", "value": 2},
+    ]
+
+    merged = merge_scores(computed, reported)
+
+    assert by_name(merged)["qSOFA"]["value"] == 2
+    assert [score["score_name"] for score in merged[len(computed):]] == ["CURB-65"]
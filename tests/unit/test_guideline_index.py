@@ -0,0 +1,138 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from app.utils.guideline_index import GuidelineIndex, load_passages, load_passages_from_directory
+
+DOULEUR_THORACIQUE = """# DOULEUR THORACIQUE
+
+Catégorie: CARDIO-VASCULAIRE
+
+
+## INTRODUCTION
+
+Toute douleur thoracique est un syndrome coronarien aigu jusqu'à preuve du contraire.
+
+
+## ASSISTANT DE RÉGULATION MÉDICALE (ARM)
+
+
+### Niveau de priorité
+P0 si douleur thoracique avec sueurs, malaise ou détresse.
+
+### Conseils en attendant les secours
+Allonger le patient, ne pas le laisser marcher.
+"""
+
+SEPSIS = """# SEPSIS
+
+Catégorie: INFECTIOLOGIE
+
+
+## INTRODUCTION
+
+Le choc septique associe une infection, une hypotension et une hyperlactatémie.
+
+
+## MÉDECIN RÉGULATEUR
+
+Rechercher des marbrures, une confusion et une fièvre. Envoi SMUR si hypotension.
+"""
+
+
+def write_corpus(directory: Path) -> None:
+    (directory / "cardio").mkdir()
+    (directory / "cardio" / "douleur_thoracique.txt").write_text(DOULEUR_THORACIQUE, encoding="utf-8")
+    (directory / "sepsis.txt").write_text(SEPSIS, encoding="utf-8")
+
+
+def test_passages_follow_the_cleaned_fiche_sections(tmp_path: Path) -> None:
+    write_corpus(tmp_path)
+
+    passages = load_passages_from_directory(tmp_path)
+
+    assert [p["id"] for p in passages] == [
+        "cardio/douleur_thoracique.txt#introduction",
+        "cardio/douleur_thoracique.txt#assistant-regulation-medicale-arm-niveau-priorite",
+        "cardio/douleur_thoracique.txt#assistant-regulation-medicale-arm-conseil-attendant-secour",
+        "sepsis.txt#introduction",
+        "sepsis.txt#medecin-regulateur",
+    ]
+    assert passages[1]["section"] == "ASSISTANT DE RÉGULATION MÉDICALE (ARM) - Niveau de priorité"
+    assert {p["category"] for p in passages} == {"CARDIO-VASCULAIRE", "INFECTIOLOGIE"}
+    assert all(p["text"] for p in passages)
+
+
+def test_bm25_search_survives_a_save_and_memory_mapped_load(tmp_path: Path) -> None:
+    (tmp_path / "fiches").mkdir()
+    write_corpus(tmp_path / "fiches")
+    index = GuidelineIndex.build(load_passages_from_directory(tmp_path / "fiches"))
+    index.save(tmp_path / "index")
+
+    loaded = GuidelineIndex.load(tmp_path / "index")
+    results = loaded.search("hypotension et lactates élevés, choc septique", k=2)
+
+    assert isinstance(loaded.posting_docs, np.memmap)
+    assert results[0]["source"] == "sepsis.txt"
+    assert results == index.search("hypotension et lactates élevés, choc septique", k=2)
+    assert loaded.search("douleur", k=5, where={"category": "INFECTIOLOGIE"}) == []
+    assert loaded.search("zzz inconnu") == []
+
+
+def test_dense_vectors_are_fused_with_bm25(tmp_path: Path) -> None:
+    write_corpus(tmp_path)
+    passages = load_passages_from_directory(tmp_path)
+
+    def embedder(texts: list[str]) -> np.ndarray:
+        # Toy embedding: does the text talk about infection?
+        return np.array([[1.0, 0.0] if "infection" in t or "fièvre" in t else [0.0, 1.0] for t in texts])
+
+    GuidelineIndex.build(passages, embedder=embedder, embedding_model="toy").save(tmp_path / "index")
+    index = GuidelineIndex.load(tmp_path / "index", embedder=embedder)
+
+    results = index.search("fièvre", k=2)
+
+    assert isinstance(index.embeddings, np.memmap)
+    assert {p["source"] for p in results} == {"sepsis.txt"}
+
+
+def test_section_corpus_is_preferred_and_filterable_by_section_type(tmp_path: Path) -> None:
+    write_corpus(tmp_path)
+    records = [
+        {"id": "cardio/douleur_thoracique#arm_priorite", "fiche": "cardio/douleur_thoracique",
+         "titre": "Douleur thoracique", "categorie": "CARDIO-VASCULAIRE", "url": "",
+         "section_type": "arm_priorite", "section": "ASSISTANT DE RÉGULATION MÉDICALE (ARM) - Niveau de priorité",
+         "texte": "P0 si douleur thoracique avec sueurs, malaise ou détresse."},
+        {"id": "cardio/douleur_thoracique#introduction", "fiche": "cardio/douleur_thoracique",
+         "titre": "Douleur thoracique", "categorie": "CARDIO-VASCULAIRE", "url": "",
+         "section_type": "introduction", "section": "INTRODUCTION",
+         "texte": "Toute douleur thoracique est un syndrome coronarien aigu jusqu'à preuve du contraire."},
+    ]
+    (tmp_path / "corpus_sections.jsonl").write_text(
+        "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8"
+    )
+
+    passages = load_passages(tmp_path)
+    index = GuidelineIndex.build(passages)
+
+    assert [p["id"] for p in passages] == [r["id"] for r in records]
+    priorite = index.search("douleur thoracique", k=5, where={"section_type": "arm_priorite"})
+    both = index.search("douleur thoracique", k=5, where={"section_type": ["arm_priorite", "introduction"]})
+
+    assert [p["section_type"] for p in priorite] == ["arm_priorite"]
+    assert len(both) == 2
@@ -0,0 +1,224 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted
+
+from app.utils import llm
+from app.utils.llm import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    LlmQueueTimeout,
+    LlmScheduler,
+    generate_content,
+    generate_content_async,
+    llm_priority,
+    retry_llm_stream,
+)
+
+
+def test_scheduler_admits_interactive_calls_before_batch() -> None:
+    # 600 requests/minute: one admission every 0.1s once the burst is spent
+    scheduler = LlmScheduler(requests_per_minute=600, tokens_per_minute=0)
+    scheduler.requests.tokens = 0
+    admitted: list[str] = []
+
+    def call(name: str, priority: int) -> None:
+        scheduler.acquire(10, priority)
+        admitted.append(name)
+
+    threads = [
+        threading.Thread(target=call, args=(f"batch-{i}", PRIORITY_BATCH)) for i in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    while scheduler.depth < 3:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=call, args=("interactive", PRIORITY_INTERACTIVE))
+    interactive.start()
+    for thread in [*threads, interactive]:
+        thread.join()
+
+    # batch-0 was already first in line when the interactive call arrived
+    assert admitted.index("interactive") <= 1
+    assert [name for name in admitted if name.startswith("batch")] == [
+        "batch-0",
+        "batch-1",
+        "batch-2",
+    ]
+
+
+def test_scheduler_times_out_when_budget_is_exhausted() -> None:
+    scheduler = LlmScheduler(requests_per_minute=1, tokens_per_minute=0, queue_timeout=0.05)
+    scheduler.acquire(10)
+    with pytest.raises(LlmQueueTimeout):
+        scheduler.acquire(10)
+    assert scheduler.depth == 0
+
+
+def test_async_waiters_hold_no_thread_and_leave_the_queue_when_cancelled() -> None:
+    # 600 requests/minute: one admission every 0.1s once the burst is spent
+    scheduler = LlmScheduler(requests_per_minute=600, tokens_per_minute=0)
+    scheduler.requests.tokens = 0
+
+    async def run() -> list[int]:
+        threads_before = threading.active_count()
+        admitted: list[int] = []
+
+        async def call(i: int) -> None:
+            await scheduler.acquire_async(10)
+            admitted.append(i)
+
+        tasks = [asyncio.create_task(call(i)) for i in range(30)]
+        while scheduler.depth < 30:
+            await asyncio.sleep(0.001)
+        assert threading.active_count() == threads_before
+        for task in tasks[2:]:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert scheduler.depth == 0
+        return admitted
+
+    assert asyncio.run(run()) == [0, 1]
+
+
+def test_sync_callers_in_threads_and_async_waiters_share_the_queue() -> None:
+    # 600 requests/minute: one admission every 0.1s once the burst is spent
+    scheduler = LlmScheduler(requests_per_minute=600, tokens_per_minute=0, queue_timeout=3)
+    scheduler.requests.tokens = 0
+
+    async def run() -> list[str]:
+        admitted: list[str] = []
+
+        async def async_call() -> None:
+            await scheduler.acquire_async(10)
+            admitted.append("async")
+
+        def sync_call() -> None:
+            scheduler.acquire(10)
+            admitted.append("sync")
+
+        waiter = asyncio.create_task(async_call())
+        while scheduler.depth < 1:
+            await asyncio.sleep(0.001)
+        # Blocking callers run in a worker thread (as the /api/analyze route does)
+        await asyncio.gather(waiter, asyncio.to_thread(sync_call))
+        return admitted
+
+    start = time.perf_counter()
+    assert asyncio.run(run()) == ["async", "sync"]
+    assert time.perf_counter() - start < 1
+
+
+def test_generate_content_retries_quota_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(llm, "scheduler", LlmScheduler(0, 0))
+    monkeypatch.setattr(llm, "retry_delay", lambda attempt: 0)
+    calls = []
+
+    class QuotaLimitedModel:
+        def generate_content(self, prompt: str, **kwargs: object) -> SimpleNamespace:
+            calls.append(prompt)
+            if len(calls) < 3:
+                raise ResourceExhausted("429 quota")
+            return SimpleNamespace(text="{}", usage_metadata=None)
+
+    with llm_priority(PRIORITY_BATCH):
+        response = generate_content(QuotaLimitedModel(), "prompt", stage="test")
+
+    assert response.text == "{}"
+    assert len(calls) == 3
+
+
+def test_generate_content_async_does_not_block_the_event_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(llm, "scheduler", LlmScheduler(0, 0))
+    monkeypatch.setattr(llm, "retry_delay", lambda attempt: 0)
+    attempts = []
+
+    class SlowModel:
+        async def generate_content_async(self, prompt: str, **kwargs: object) -> SimpleNamespace:
+            attempts.append(prompt)
+            if prompt == "quota" and attempts.count(prompt) < 2:
+                raise ResourceExhausted("429 quota")
+            await asyncio.sleep(0.1)
+            return SimpleNamespace(text=prompt, usage_metadata=None)
+
+    async def run() -> list[str]:
+        responses = await asyncio.gather(
+            *(generate_content_async(SlowModel(), p, stage="test") for p in ("a", "b", "c", "quota"))
+        )
+        return [r.text for r in responses]
+
+    start = time.perf_counter()
+    assert asyncio.run(run()) == ["a", "b", "c", "quota"]
+    # Four concurrent 0.1s calls, not one after the other
+    assert time.perf_counter() - start < 0.35
+    assert attempts.count("quota") == 2
+
+
+def test_adk_model_calls_retry_quota_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(llm, "scheduler", LlmScheduler(0, 0))
+    monkeypatch.setattr(llm, "retry_delay", lambda attempt: 0)
+
+    class ClientError(Exception):
+        # google-genai reports quota rejections with the HTTP status as `code`
+        code = 429
+
+    calls = []
+
+    async def flaky_call():
+        calls.append("call")
+        if len(calls) < 3:
+            raise ClientError("RESOURCE_EXHAUSTED")
+        yield "partial"
+        yield "final"
+
+    async def interrupted_call():
+        calls.append("call")
+        yield "partial"
+        raise ClientError("RESOURCE_EXHAUSTED")
+
+    async def collect(call) -> list[str]:
+        return [r async for r in retry_llm_stream(call, 100, stage="adk", name="test")]
+
+    assert asyncio.run(collect(flaky_call)) == ["partial", "final"]
+    assert len(calls) == 3
+
+    # Output already streamed to the agent: the error is not retried
+    calls.clear()
+    with pytest.raises(ClientError):
+        asyncio.run(collect(interrupted_call))
+    assert len(calls) == 1
+
+
+def test_model_latency_stats_are_kept_per_model(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(llm, "scheduler", LlmScheduler(0, 0))
+    monkeypatch.setattr(llm, "_latencies", {})
+
+    class Model:
+        _model_name = "gemini-2.0-flash"
+
+        def generate_content(self, prompt: str, **kwargs: object) -> SimpleNamespace:
+            return SimpleNamespace(text="{}", usage_metadata=None)
+
+    for _ in range(3):
+        generate_content(Model(), "prompt", stage="test")
+
+    stats = llm.model_latency_stats()
+    assert list(stats) == ["gemini-2.0-flash"]
+    assert stats["gemini-2.0-flash"]["calls"] == 3
@@ -0,0 +1,167 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted
+
+
+@pytest.fixture
+def corpus(monkeypatch: pytest.MonkeyPatch) -> ModuleType:
+    # The module refuses to load without a project and a location
+    monkeypatch.setenv("GOOGLE_CLOUD_PROJECT", "test-project")
+    monkeypatch.setenv("GOOGLE_CLOUD_LOCATION", "europe-west1")
+    # Skipped where the Vertex AI / GCS client libraries are not installed
+    return pytest.importorskip("app.agents.rag.utils.prepare_corpus_and_data", exc_type=ImportError)
+
+
+def _source(uri: str, fingerprint: str = "v1") -> dict:
+    return {"uri": uri, "display_name": uri.rsplit("/", 1)[-1], "fingerprint": fingerprint, "size": 10,
+            "description": f"Document imported from GCS: {uri}"}
+
+
+def test_manifest_pending_and_record_many_across_reruns(corpus: ModuleType, tmp_path: Path) -> None:
+    path = str(tmp_path / "manifest.json")
+    sources = [_source("gs://b/a.txt"), _source("gs://b/b.txt")]
+
+    manifest = corpus.IngestManifest(path, "corpora/1")
+    assert manifest.pending(sources) == sources
+    manifest.record_many([(sources[0], "ragFiles/a"), (sources[1], "ragFiles/b")])
+
+    rerun = corpus.IngestManifest(path, "corpora/1")
+    assert rerun.pending(sources) == []
+    assert rerun.pending(sources, force=True) == sources
+    changed = _source("gs://b/b.txt", fingerprint="v2")
+    assert rerun.pending([sources[0], changed]) == [changed]
+    assert rerun.previous_rag_file(changed) == "ragFiles/b"
+    # A manifest written for another corpus is ignored
+    assert corpus.IngestManifest(path, "corpora/2").pending(sources) == sources
+
+
+def test_quota_backoff_retries_then_gives_up(corpus: ModuleType) -> None:
+    backoff = corpus.QuotaBackoff(max_retries=2, base_seconds=0)
+    calls = []
+
+    def flaky() -> str:
+        calls.append(1)
+        if len(calls) < 3:
+            raise ResourceExhausted("429 quota")
+        return "done"
+
+    assert backoff.call(flaky) == "done"
+    assert len(calls) == 3
+
+    def exhausted() -> None:
+        calls.append(1)
+        raise ResourceExhausted("429 quota")
+
+    calls.clear()
+    with pytest.raises(ResourceExhausted):
+        backoff.call(exhausted)
+    assert len(calls) == 3
+
+
+def test_ingest_sources_uploads_only_new_and_changed_local_files(
+    corpus: ModuleType, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    documents = tmp_path / "documents"
+    documents.mkdir()
+    (documents / "a.txt").write_text("protocole A", encoding="utf-8")
+    (documents / "b.txt").write_text("protocole B", encoding="utf-8")
+    (documents / "image.png").write_bytes(b"\x89PNG")
+    uploaded: list[str] = []
+    deleted: list[str] = []
+    ids = itertools.count()
+
+    def upload_file(**kwargs: object) -> SimpleNamespace:
+        uploaded.append(str(kwargs["display_name"]))
+        return SimpleNamespace(name=f"ragFiles/{next(ids)}")
+
+    monkeypatch.setattr(corpus.rag, "upload_file", upload_file)
+    monkeypatch.setattr(corpus.rag, "delete_file", lambda name: deleted.append(name))
+    manifest_path = str(tmp_path / "manifest.json")
+
+    first = corpus.ingest_sources(
+        "corpora/1", corpus.local_sources(str(documents)), corpus.IngestManifest(manifest_path, "corpora/1")
+    )
+    assert first == {"skipped": 0, "uploaded": 2, "failed": 0}
+    assert sorted(uploaded) == ["a.txt", "b.txt"]
+
+    (documents / "a.txt").write_text("protocole A, révisé", encoding="utf-8")
+    uploaded.clear()
+    manifest = corpus.IngestManifest(manifest_path, "corpora/1")
+    outdated = manifest.files[f"file://{documents / 'a.txt'}"]["rag_file"]
+    second = corpus.ingest_sources("corpora/1", corpus.local_sources(str(documents)), manifest)
+
+    assert second == {"skipped": 1, "uploaded": 1, "failed": 0}
+    assert uploaded == ["a.txt"]
+    assert deleted == [outdated]
+
+
+def test_bulk_import_replaces_uploaded_copies_and_records_imported_names(
+    corpus: ModuleType, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    ids = itertools.count()
+    # a.txt was ingested by upload before the switch to bulk import
+    files = {
+        "ragFiles/uploaded": SimpleNamespace(
+            name="ragFiles/uploaded", description="Document imported from GCS: gs://b/a.txt", gcs_source=None
+        )
+    }
+    batches: list[list[str]] = []
+
+    def import_files(**kwargs: object) -> SimpleNamespace:
+        paths = list(kwargs["paths"])
+        batches.append(paths)
+        for uri in paths:
+            name = f"ragFiles/{next(ids)}"
+            files[name] = SimpleNamespace(name=name, description="", gcs_source=SimpleNamespace(uris=[uri]))
+        return SimpleNamespace(imported_rag_files_count=len(paths), failed_rag_files_count=0)
+
+    monkeypatch.setattr(corpus.rag, "import_files", import_files)
+    monkeypatch.setattr(corpus.rag, "list_files", lambda corpus_name: list(files.values()))
+    monkeypatch.setattr(corpus.rag, "delete_file", lambda name: files.pop(name))
+    manifest = corpus.IngestManifest(str(tmp_path / "manifest.json"), "corpora/1")
+    sources = [_source("gs://b/a.txt"), _source("gs://b/b.txt")]
+
+    result = corpus.bulk_import_sources("corpora/1", sources, manifest, batch_size=1)
+
+    assert result == {"skipped": 0, "uploaded": 2, "failed": 0}
+    assert batches == [["gs://b/a.txt"], ["gs://b/b.txt"]]
+    assert sorted(files) == ["ragFiles/0", "ragFiles/1"]
+    assert manifest.previous_rag_file(sources[0]) == "ragFiles/0"
+    assert manifest.previous_rag_file(sources[1]) == "ragFiles/1"
+
+    # A changed file: its previously imported version is deleted before the import
+    changed = _source("gs://b/b.txt", fingerprint="v2")
+    corpus.bulk_import_sources("corpora/1", [sources[0], changed], manifest)
+    assert sorted(files) == ["ragFiles/0", "ragFiles/2"]
+    assert manifest.previous_rag_file(changed) == "ragFiles/2"
+
+
+def test_report_dry_run_counts_new_and_changed_files(corpus: ModuleType, tmp_path: Path) -> None:
+    manifest = corpus.IngestManifest(str(tmp_path / "manifest.json"), "corpora/1")
+    manifest.record_many([(_source("gs://b/a.txt"), "ragFiles/a"), (_source("gs://b/b.txt"), "ragFiles/b")])
+    sources = [_source("gs://b/a.txt"), _source("gs://b/b.txt", "v2")] + [
+        _source(f"gs://b/new-{i}.txt") for i in range(3)
+    ]
+
+    report = corpus.report_dry_run(sources, manifest, "import", batch_size=2)
+
+    assert report == {"new": 3, "changed": 1, "skipped": 1, "bytes": 40}
+    assert corpus._batches(list(range(5)), 2) == [[0, 1], [2, 3], [4]]
+    assert corpus._batches([1], 0) == [[1]]
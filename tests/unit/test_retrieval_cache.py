@@ -0,0 +1,100 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+from app.utils.retrieval_cache import RetrievalCache, normalize_query
+
+
+class CountingRetriever:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    async def __call__(self, query: str) -> list[str]:
+        self.calls.append(query)
+        await asyncio.sleep(0.01)
+        return [f"passage pour {query}"]
+
+
+def test_queries_are_normalized() -> None:
+    assert normalize_query("  Douleur   THORACIQUE ? ") == normalize_query("douleur thoracique")
+
+
+def test_concurrent_identical_questions_share_one_retrieval() -> None:
+    cache = RetrievalCache()
+    retriever = CountingRetriever()
+
+    async def ask(query: str) -> list[str]:
+        return await cache.get_or_fetch(query, lambda: retriever(query))
+
+    async def scenario() -> list[list[str]]:
+        results = await asyncio.gather(*(ask(q) for q in ["AVC ?", "avc", "AVC", "Brûlure"]))
+        results.append(await ask("avc"))
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert retriever.calls == ["AVC ?", "Brûlure"]
+    assert results[0] == results[1] == results[2] == results[4]
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 2, "coalesced": 2}
+
+
+def test_expired_entries_and_corpus_changes_trigger_a_new_retrieval() -> None:
+    version = {"value": "v1"}
+    cache = RetrievalCache(ttl_seconds=3600, corpus_version=lambda: version["value"], version_check_seconds=0)
+    retriever = CountingRetriever()
+
+    async def ask() -> list[str]:
+        return await cache.get_or_fetch("sepsis", lambda: retriever("sepsis"))
+
+    async def version_checked() -> None:
+        while not cache._version_task.done():
+            await asyncio.sleep(0.001)
+
+    async def scenario() -> None:
+        await ask()
+        await ask()
+        version["value"] = "v2"
+        # Served from the current generation while the version check runs
+        await ask()
+        assert len(retriever.calls) == 1
+        await version_checked()
+        await ask()
+        cache.ttl_seconds = 0
+        await ask()
+
+    asyncio.run(scenario())
+
+    assert len(retriever.calls) == 3
+
+
+def test_failed_retrievals_are_not_cached() -> None:
+    cache = RetrievalCache()
+    attempts = []
+
+    async def flaky() -> list[str]:
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("quota")
+        return ["ok"]
+
+    async def scenario() -> list[str]:
+        try:
+            await cache.get_or_fetch("q", flaky)
+        except RuntimeError:
+            pass
+        return await cache.get_or_fetch("q", flaky)
+
+    assert asyncio.run(scenario()) == ["ok"]
+    assert len(attempts) == 2
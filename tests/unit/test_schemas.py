@@ -0,0 +1,101 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app.agents.synthesizer.schemas import RegistreSchemas, empreinte_structure, registre
+from app.utils.clinical_scores import compute_clinical_scores
+
+FHIR_BUNDLE = {
+    "resourceType": "Bundle",
+    "entry": [
+        {"resource": {"resourceType": "Patient", "id": "p1", "gender": "female", "birthDate": "1950-03-01"}},
+        {"resource": {"resourceType": "Condition", "code": {"text": "Diabète de type 2"}}},
+        {"resource": {
+            "resourceType": "Observation",
+            "effectiveDateTime": "2024-01-03T09:30:00",
+            "code": {"coding": [{"system": "http://loinc.org", "code": "85354-9"}]},
+            "component": [
+                {"code": {"coding": [{"code": "8480-6"}]}, "valueQuantity": {"value": 85, "unit": "mm[Hg]"}},
+                {"code": {"coding": [{"code": "8462-4"}]}, "valueQuantity": {"value": 50, "unit": "mm[Hg]"}},
+            ],
+        }},
+        {"resource": {
+            "resourceType": "Observation",
+            "effectiveDateTime": "2024-01-03T09:30:00",
+            "code": {"coding": [{"code": "8867-4"}]},
+            "valueQuantity": {"value": 118, "unit": "/min"},
+        }},
+        {"resource": {
+            "resourceType": "Observation",
+            "effectiveDateTime": "2024-01-03T09:00:00",
+            "code": {"coding": [{"code": "2524-7", "display": "Lactate"}]},
+            "valueQuantity": {"value": 3.1, "unit": "mmol/L"},
+        }},
+    ],
+}
+
+
+def test_fhir_bundle_is_normalized_locally() -> None:
+    patient = registre.normaliser(FHIR_BUNDLE, demander_mapping=None)["patient_normalized"]
+
+    assert patient["id"] == "p1"
+    assert patient["sex"] == "femme"
+    assert patient["medical_history"]["known_conditions"] == ["Diabète de type 2"]
+    assert patient["vitals_current"]["systolic_bp"]["value"] == 85
+    assert patient["labs"][0]["itemid"] == 50813
+    scores = {score["score_name"]: score["value"] for score in compute_clinical_scores(patient)}
+    assert scores["Shock index"] == 1.39
+
+
+def test_flat_key_values_use_french_and_english_aliases() -> None:
+    data = {"Âge": 72, "Sexe": "F", "FC": 112, "TA": "95/60", "Fréquence respiratoire": 24, "lit": "B12"}
+
+    patient = registre.normaliser(data, demander_mapping=None)["patient_normalized"]
+
+    assert patient["age"] == 72
+    assert patient["sex"] == "femme"
+    assert patient["vitals_current"]["systolic_bp"] == {"value": "95"}
+    assert patient["vitals_current"]["respiratory_rate"] == {"value": 24}
+    assert patient["autres_donnees"] == {"lit": "B12"}
+
+
+def test_flat_blood_pressure_in_cmhg_is_converted() -> None:
+    patient = registre.normaliser({"TA": "12/8", "FC": 80}, demander_mapping=None)["patient_normalized"]
+
+    assert patient["vitals_current"]["systolic_bp"] == {"value": 120, "unit": "mmHg"}
+    assert patient["vitals_current"]["diastolic_bp"] == {"value": 80, "unit": "mmHg"}
+
+    patient = registre.normaliser({"TA": "13,5/7", "FC": 80}, demander_mapping=None)["patient_normalized"]
+    assert patient["vitals_current"]["systolic_bp"]["value"] == 135
+
+
+def test_learned_mapping_is_cached_by_structure() -> None:
+    demandes = []
+
+    def demander_mapping(squelette: dict, apercu: dict) -> dict:
+        demandes.append(squelette)
+        return {"pt.years": "age", "pt.obs.pulse_bpm": "vitals_current.heart_rate", "x": "inconnu.champ"}
+
+    registre_local = RegistreSchemas()
+    premier = {"pt": {"years": 54, "obs": {"pulse_bpm": 130}}, "note": "RAS"}
+    second = {"note": "douleur", "pt": {"obs": {"pulse_bpm": 90}, "years": 33}}
+
+    sortie = registre_local.normaliser(premier, demander_mapping)["patient_normalized"]
+    registre_local.normaliser(second, demander_mapping)
+
+    assert empreinte_structure(premier) == empreinte_structure(second)
+    assert len(demandes) == 1
+    assert demandes[0] == {"pt": {"years": "scalaire", "obs": {"pulse_bpm": "scalaire"}}, "note": "scalaire"}
+    assert sortie["age"] == 54
+    assert sortie["vitals_current"]["heart_rate"] == 130
+    assert sortie["autres_donnees"] == {"note": "RAS"}
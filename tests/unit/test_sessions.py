@@ -0,0 +1,123 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from sqlalchemy import create_engine, text
+
+from app.utils.sessions import (
+    SessionJanitor,
+    SessionStateReader,
+    compact_stored_contents,
+    find_superseded_tool_results,
+)
+
+
+def _tool_result(name: str, size: int = 5000) -> dict:
+    return {
+        "role": "user",
+        "parts": [
+            {"function_response": {"name": name, "response": {"result": "x" * size}}}
+        ],
+    }
+
+
+def test_find_superseded_tool_results_keeps_latest_per_tool() -> None:
+    names = ["collecteur_agent", "synthetiseur_agent", None, "synthetiseur_agent"]
+    assert find_superseded_tool_results(names) == {1}
+
+
+def test_compact_stored_contents_replaces_only_superseded_results() -> None:
+    contents = [
+        _tool_result("synthetiseur_agent"),
+        {"role": "model", "parts": [{"text": "Synthèse"}]},
+        _tool_result("expert_agent"),
+        _tool_result("synthetiseur_agent"),
+        None,
+    ]
+
+    assert compact_stored_contents(contents) == [0]
+
+    stub = contents[0]["parts"][0]["function_response"]["response"]
+    assert stub["compacted"] is True
+    assert "synthetiseur_agent" in stub["summary"]
+    assert contents[3]["parts"][0]["function_response"]["response"]["result"]
+    # Already compacted results are not rewritten again
+    assert compact_stored_contents(contents) == []
+
+
+def test_compact_stored_contents_keeps_small_results() -> None:
+    contents = [_tool_result("collecteur_agent", 10), _tool_result("collecteur_agent", 10)]
+    assert compact_stored_contents(contents) == []
+
+
+def test_session_state_reader_projects_state_keys() -> None:
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE sessions (app_name TEXT, user_id TEXT, id TEXT, state TEXT,"
+            " create_time DATETIME, update_time DATETIME)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE events (id TEXT, app_name TEXT, user_id TEXT, session_id TEXT,"
+            " timestamp DATETIME, content TEXT)"
+        ))
+        state = {"synthese_clinique": {"alertes": ["sepsis"]}, "donnees_patient": "x" * 100}
+        conn.execute(
+            text("INSERT INTO sessions VALUES ('app', 'u', 's', :state,"
+                 " '2025-01-01 10:00:00', '2025-01-01 11:00:00')"),
+            {"state": json.dumps(state)},
+        )
+        for i in range(3):
+            conn.execute(text(f"INSERT INTO events VALUES ('{i}', 'app', 'u', 's', NULL, '{{}}')"))
+
+    reader = SessionStateReader("sqlite://", engine=engine)
+    data = reader.read("app", "u", "s", ["synthese_clinique"], with_events_count=True)
+
+    assert data["state"] == {"synthese_clinique": {"alertes": ["sepsis"]}}
+    assert data["events_count"] == 3
+    assert data["last_update"] == 1735729200.0
+    assert reader.read("app", "u", "s", [])["state"] == {}
+    assert reader.read("app", "u", "missing") is None
+
+
+def test_compact_sessions_cuts_only_between_invocations() -> None:
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE events (id TEXT, app_name TEXT, user_id TEXT, session_id TEXT,"
+            " invocation_id TEXT, timestamp DATETIME, content TEXT)"
+        ))
+        # inv-2 holds a function_call / function_response pair straddling a
+        # plain 4-event cut: user turn, call, response, answer
+        events = [
+            ("e1", "inv-1", "user"), ("e2", "inv-1", "model"),
+            ("e3", "inv-2", "user"), ("e4", "inv-2", "function_call"),
+            ("e5", "inv-2", "function_response"), ("e6", "inv-2", "model"),
+            ("e7", "inv-3", "user"), ("e8", "inv-3", "model"),
+        ]
+        for minute, (event_id, invocation_id, kind) in enumerate(events):
+            conn.execute(
+                text("INSERT INTO events VALUES (:id, 'app', 'u', 's', :inv, :ts, :content)"),
+                {"id": event_id, "inv": invocation_id, "ts": f"2025-01-01 10:0{minute}:00",
+                 "content": json.dumps({"kind": kind})},
+            )
+
+    janitor = SessionJanitor("sqlite://", engine=engine, max_events_per_session=4)
+    assert janitor.compact_sessions() == 6
+
+    with engine.connect() as conn:
+        kept = conn.execute(text("SELECT id FROM events ORDER BY timestamp")).scalars().all()
+    # inv-2 does not fit next to inv-3: dropped whole rather than keeping e5 without e4
+    assert kept == ["e7", "e8"]
@@ -0,0 +1,93 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import os
+import threading
+from collections.abc import Iterator
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from scripts.sfmu_scrapper import ScraperHTTP
+
+LISTE = """<html><head><title>Guide</title></head><body>
+<a href="index.html">Accueil</a>
+<ul>
+  <li><a href="FrontDetailView-1.html">Douleur thoracique</a></li>
+  <li><a href="FrontDetailView-2.html">Convulsions de l'enfant</a></li>
+</ul>
+</body></html>"""
+
+FICHE = """<html><head><script>var menu = "SOMMAIRE";</script><style>p {{ color: red; }}</style></head>
+<body><h1>{titre}</h1>
+<h2>Introduction</h2><p>{texte}</p>
+<h2>ARM</h2><p>Déterminer le niveau de priorité : P0 si détresse vitale.</p>
+</body></html>"""
+
+
+class SiteStatique(SimpleHTTPRequestHandler):
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def site(tmp_path: Path) -> Iterator[tuple[Path, str]]:
+    racine = tmp_path / "site"
+    racine.mkdir()
+    (racine / "liste.html").write_text(LISTE, encoding="utf-8")
+    for numero, titre in ((1, "Douleur thoracique"), (2, "Convulsions de l'enfant")):
+        (racine / f"FrontDetailView-{numero}.html").write_text(
+            FICHE.format(titre=titre, texte=f"{titre} : recherche des signes de gravité par l'ARM."),
+            encoding="utf-8",
+        )
+    serveur = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(SiteStatique, directory=str(racine)))
+    thread = threading.Thread(target=serveur.serve_forever, daemon=True)
+    thread.start()
+    yield racine, f"http://127.0.0.1:{serveur.server_address[1]}/liste.html"
+    serveur.shutdown()
+    serveur.server_close()
+
+
+def test_les_fiches_statiques_sont_recuperees_en_parallele(site: tuple[Path, str], tmp_path: Path) -> None:
+    _, url = site
+    scraper = ScraperHTTP(output_dir=str(tmp_path / "textes"), base_url=url, workers=2)
+    scraper.run()
+
+    assert (scraper.total_fiches, scraper.fiches_scrapees, scraper.erreurs) == (2, 2, 0)
+    texte = (tmp_path / "textes" / "cardio" / "001_Douleur thoracique.txt").read_text(encoding="utf-8")
+    assert "TITRE: Douleur thoracique" in texte
+    assert "Introduction\nDouleur thoracique : recherche des signes de gravité par l'ARM." in texte
+    assert "SOMMAIRE" not in texte and "color" not in texte
+    assert (tmp_path / "textes" / "neurologie" / "002_Convulsions de l'enfant.txt").exists()
+
+
+def test_seules_les_fiches_modifiees_sont_retelechargees(site: tuple[Path, str], tmp_path: Path) -> None:
+    racine, url = site
+    ScraperHTTP(output_dir=str(tmp_path / "textes"), base_url=url, workers=2).run()
+
+    deuxieme = ScraperHTTP(output_dir=str(tmp_path / "textes"), base_url=url, workers=2)
+    deuxieme.run()
+    assert (deuxieme.fiches_scrapees, deuxieme.fiches_inchangees) == (0, 2)
+
+    fiche = racine / "FrontDetailView-2.html"
+    fiche.write_text(FICHE.format(titre="Convulsions de l'enfant", texte="Nouvelle version de la fiche."), encoding="utf-8")
+    os.utime(fiche, (fiche.stat().st_atime, fiche.stat().st_mtime + 100))
+
+    troisieme = ScraperHTTP(output_dir=str(tmp_path / "textes"), base_url=url, workers=2)
+    troisieme.run()
+    assert (troisieme.fiches_scrapees, troisieme.fiches_inchangees) == (1, 1)
+    texte = (tmp_path / "textes" / "neurologie" / "002_Convulsions de l'enfant.txt").read_text(encoding="utf-8")
+    assert "Nouvelle version de la fiche." in texte
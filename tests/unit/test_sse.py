@@ -0,0 +1,40 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+
+from app.utils.sse import iter_asgi_sse_events
+
+
+def test_multibyte_characters_split_across_chunks_are_decoded() -> None:
+    body = "".join(
+        f"data: {json.dumps({'text': text}, ensure_ascii=False)}\n\n"
+        for text in ["Fréquence cardiaque élevée", "Hémorragie extériorisée"]
+    ).encode()
+
+    async def app(scope: dict, receive: object, send: object) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        # 3-byte chunks cut through the 2-byte "é" sequences
+        for start in range(0, len(body), 3):
+            await send({"type": "http.response.body", "body": body[start:start + 3], "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def collect() -> list[dict]:
+        return [event async for event in iter_asgi_sse_events(app, "/run_sse", {})]
+
+    assert asyncio.run(collect()) == [
+        {"text": "Fréquence cardiaque élevée"},
+        {"text": "Hémorragie extériorisée"},
+    ]
@@ -0,0 +1,83 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents.synthesizer import agent as synthesizer
+from app.agents.synthesizer.agent import AgentSynthetiseur
+from app.utils import llm
+from app.utils.llm import LlmScheduler
+
+FUSED_RESPONSE = {
+    "applicable_scores": [
+        {
+            "score_name": "CURB-65",
+            "value": 2,
+            "interpretation": "Risque intermédiaire",
+            "components": [{"name": "fr", "value": "32"}],
+        }
+    ],
+    "deterioration_analysis": {
+        "silent_deterioration_detected": True,
+        "severity": "HIGH",
+        "trajectory": "RAPID_DETERIORATION",
+        "evidence": ["FC 125"],
+    },
+}
+
+
+class ScriptedModel:
+    _model_name = "gemini-2.0-flash"
+
+    def __init__(self, *responses: str) -> None:
+        self.responses = list(responses)
+        self.prompts: list[str] = []
+
+    def generate_content(self, prompt: str, **kwargs: object) -> SimpleNamespace:
+        self.prompts.append(prompt)
+        return SimpleNamespace(text=self.responses.pop(0), usage_metadata=None)
+
+
+@pytest.fixture
+def agent(monkeypatch: pytest.MonkeyPatch) -> AgentSynthetiseur:
+    monkeypatch.setattr(llm, "scheduler", LlmScheduler(0, 0))
+    monkeypatch.setattr(synthesizer, "get_model", lambda *args, **kwargs: None)
+    return AgentSynthetiseur(project_id="test", mode_fusionne=True)
+
+
+def test_fused_call_returns_both_phase_outputs(agent: AgentSynthetiseur) -> None:
+    agent.model = ScriptedModel(json.dumps(FUSED_RESPONSE))
+
+    scores, deterioration = agent.calculer_scores_et_degradation({"patient": 1})
+
+    assert len(agent.model.prompts) == 1
+    assert scores["applicable_scores"][0]["components"] == {"fr": "32"}
+    assert deterioration["trajectory"] == "RAPID_DETERIORATION"
+
+
+def test_fused_call_falls_back_to_split_calls(agent: AgentSynthetiseur) -> None:
+    agent.model = ScriptedModel(
+        "pas du JSON",
+        json.dumps({"applicable_scores": []}),
+        json.dumps({"trajectory": "STABLE"}),
+    )
+
+    scores, deterioration = agent.calculer_scores_et_degradation({"patient": 1})
+
+    assert len(agent.model.prompts) == 3
+    assert scores == {"applicable_scores": []}
+    assert deterioration == {"trajectory": "STABLE"}
@@ -0,0 +1,88 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+
+import pytest
+from opentelemetry import metrics, trace
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.utils.llm import generate_content
+from app.utils.telemetry import phase_span
+
+span_exporter = InMemorySpanExporter()
+metric_reader = InMemoryMetricReader()
+_tracer_provider = TracerProvider()
+_tracer_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+trace.set_tracer_provider(_tracer_provider)
+metrics.set_meter_provider(MeterProvider(metric_readers=[metric_reader]))
+
+
+class FakeModel:
+    _model_name = "projects/p/locations/europe-west1/publishers/google/models/gemini-2.0-flash"
+
+    def generate_content(self, prompt: str, **kwargs: object) -> SimpleNamespace:
+        return SimpleNamespace(
+            text="{}",
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=120,
+                candidates_token_count=30,
+                cached_content_token_count=100,
+                total_token_count=150,
+            ),
+        )
+
+
+@pytest.fixture(autouse=True)
+def clear_spans() -> None:
+    span_exporter.clear()
+
+
+def test_llm_call_span_carries_usage_and_stage_parent() -> None:
+    with phase_span("synthesizer.synthese"):
+        generate_content(FakeModel(), "é" * 10, stage="synthesizer.synthese")
+
+    llm_span, phase = span_exporter.get_finished_spans()
+    assert phase.name == "adn.synthesizer.synthese"
+    assert llm_span.parent.span_id == phase.context.span_id
+    assert llm_span.attributes["llm.model"] == "gemini-2.0-flash"
+    assert llm_span.attributes["llm.prompt_bytes"] == 20
+    assert llm_span.attributes["llm.tokens.prompt"] == 120
+    assert llm_span.attributes["llm.cache_hit"] is True
+
+
+def test_phase_durations_are_exported_as_histogram() -> None:
+    with pytest.raises(ValueError):
+        with phase_span("expert.validation"):
+            raise ValueError("boom")
+
+    data = metric_reader.get_metrics_data()
+    points = [
+        point
+        for resource_metrics in data.resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+        if metric.name == "adn.pipeline.stage.duration"
+        for point in metric.data.data_points
+    ]
+    assert any(
+        p.attributes == {"stage": "expert.validation", "status": "error"} and p.count == 1
+        for p in points
+    )
+    (span,) = span_exporter.get_finished_spans()
+    assert span.status.status_code == trace.StatusCode.ERROR
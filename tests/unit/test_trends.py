@@ -0,0 +1,81 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from app.agents.synthesizer.trends import analyser_tendances, pentes_glissantes
+
+
+def history(*points: tuple[str, float]) -> list[dict]:
+    return [{"charttime": f"2024-01-03 {time}:00", "value": value} for time, value in points]
+
+
+def test_sliding_slopes_match_least_squares() -> None:
+    t = np.array([0.0, 1.0, 2.5, 3.0, 7.0, 8.0])
+    v = np.array([80.0, 84.0, 90.0, 91.0, 110.0, 112.0])
+
+    slopes = pentes_glissantes(t, v, 3.0)
+
+    # The window ending at t=3 holds the first four points, the one ending at t=8 the last two
+    assert np.isclose(slopes[3], np.polyfit(t[:4], v[:4], 1)[0])
+    assert np.isclose(slopes[5], 2.0)
+    assert np.isnan(slopes[0])
+
+
+def test_falling_blood_pressure_is_a_rapid_deterioration() -> None:
+    patient = {
+        "vitals_history": {
+            "heart_rate": history(("06:30", 104.0), ("09:30", 125.0)),
+            "systolic_bp": history(("06:30", 98.0), ("09:30", 80.0)),
+        },
+        "labs": [
+            {"itemid": 50813, "charttime": "2024-01-02 22:00:00", "valuenum": 1.5},
+            {"itemid": 50813, "charttime": "2024-01-03 09:00:00", "valuenum": 3.8},
+        ],
+    }
+
+    result = analyser_tendances({"patient_normalized": patient})
+
+    deterioration = result["deterioration"]
+    assert not result["ambigu"]
+    assert deterioration["trajectory"] == "RAPID_DETERIORATION"
+    assert deterioration["risk_level"] == "CRITICAL"
+    assert deterioration["silent_deterioration_detected"] is True
+    assert any(sign.startswith("PAS") for sign in deterioration["warning_signs"])
+    assert any("Lactate" in evidence for evidence in deterioration["evidence"])
+
+
+def test_stable_series_need_no_model() -> None:
+    patient = {
+        "vitals_history": {
+            "heart_rate": history(("06:00", 78.0), ("08:00", 80.0), ("10:00", 79.0)),
+            "systolic_bp": history(("06:00", 122.0), ("08:00", 120.0), ("10:00", 121.0)),
+        }
+    }
+
+    result = analyser_tendances(patient)
+
+    assert not result["ambigu"]
+    assert result["deterioration"]["trajectory"] == "STABLE"
+    assert result["deterioration"]["risk_level"] == "LOW"
+
+
+def test_snapshot_without_history_is_ambiguous() -> None:
+    patient = {"vitals_current": {"heart_rate": {"value": 125.0, "charttime": "2024-01-03 09:30:00"}}}
+
+    result = analyser_tendances(patient)
+
+    assert result["ambigu"]
+    assert result["raisons_ambiguite"] == ["aucune série temporelle exploitable"]
+    assert result["deterioration"]["severity"] == "MEDIUM"